@@ -0,0 +1,53 @@
+"""
+ffmpeg finto per i benchmark: simula una codifica senza media reali.
+Il comportamento si configura con la variabile d'ambiente VCA_FAKE (JSON):
+  duration         secondi di media da "codificare" (default 60)
+  progress_blocks  blocchi di avanzamento emessi (default 10)
+  block_delay      secondi reali tra due blocchi (default 0)
+  output_size      byte dell'output scritto (default 1024)
+  fail_rate        probabilità di uscire con errore (default 0)
+"""
+import os
+import sys
+import json
+import time
+import random
+
+
+def main(argv):
+    config = json.loads(os.environ.get("VCA_FAKE", "{}"))
+    if "-version" in argv:
+        print("ffmpeg version fake-benchmark")
+        return 0
+    if "-encoders" in argv or "-hwaccels" in argv:
+        return 0
+    output_path = argv[-1]
+    if random.random() < config.get("fail_rate", 0):
+        print("Errore simulato dal benchmark", flush=True)
+        return 1
+
+    duration = config.get("duration", 60)
+    blocks = max(1, config.get("progress_blocks", 10))
+    delay = config.get("block_delay", 0)
+    output_size = config.get("output_size", 1024)
+    start = time.perf_counter()
+    for block in range(1, blocks + 1):
+        if delay:
+            time.sleep(delay)
+        out_time_us = int(duration * 1000000 * block / blocks)
+        # Velocità reale rispetto alla durata simulata, come la riporta ffmpeg
+        speed = out_time_us / 1000000 / max(time.perf_counter() - start, 1e-6)
+        print(
+            f"frame={block * 30}\nfps=30.00\nbitrate=1000.0kbits/s\n"
+            f"total_size={output_size * block // blocks}\nout_time_us={out_time_us}\n"
+            f"speed={speed:.2f}x\nprogress={'end' if block == blocks else 'continue'}",
+            flush=True,
+        )
+    if output_path != "-":
+        with open(output_path, "wb") as output_file:
+            output_file.write(b"\0" * output_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+ffprobe finto per i benchmark: risponde con un JSON plausibile per ogni file.
+Si configura con VCA_FAKE (JSON), come fake_ffmpeg:
+  duration         durata dichiarata in secondi (default 60)
+  bit_rate         bitrate totale in bit/s (default 5000000)
+  width, height    risoluzione (default 1920x1080)
+  video_codec      codec del flusso video (default hevc)
+  probe_fail_rate  probabilità di un probe fallito (default 0)
+"""
+import os
+import sys
+import json
+import random
+
+
+def main(argv):
+    config = json.loads(os.environ.get("VCA_FAKE", "{}"))
+    path = argv[-1]
+    if not os.path.exists(path) or random.random() < config.get("probe_fail_rate", 0):
+        print(f"{path}: No such file or directory", file=sys.stderr)
+        return 1
+    bit_rate = config.get("bit_rate", 5000000)
+    info = {
+        "format": {
+            "format_name": "mov,mp4,m4a,3gp,3g2,mj2",
+            "duration": str(config.get("duration", 60)),
+            "bit_rate": str(bit_rate),
+            "tags": {},
+        },
+        "streams": [
+            {
+                "index": 0,
+                "codec_type": "video",
+                "codec_name": config.get("video_codec", "hevc"),
+                "width": config.get("width", 1920),
+                "height": config.get("height", 1080),
+                "pix_fmt": "yuv420p",
+                "r_frame_rate": "30000/1001",
+                "bit_rate": str(bit_rate - 192000),
+            },
+            {
+                "index": 1,
+                "codec_type": "audio",
+                "codec_name": "ac3",
+                "channels": 6,
+                "sample_rate": "48000",
+                "bit_rate": "192000",
+            },
+        ],
+    }
+    print(json.dumps(info))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,385 @@
+"""
+Benchmark della parte Python del convertitore (scansione, probe, parsing
+dell'avanzamento, EventBus, orchestrazione del motore) con ffmpeg/ffprobe
+finti: non servono media reali né una GPU.
+
+    python -m benchmarks.run                       # tutti gli scenari
+    python -m benchmarks.run scan engine --files 100000
+    python -m benchmarks.run --save-baseline       # salva i risultati come riferimento
+    python -m benchmarks.run --compare             # esce con 1 se ci sono regressioni
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moduli.engine import ConversionEngine, ConversionOptions
+from moduli.events import EventBus
+from moduli.probe import run_ffprobe
+from moduli.progress import ProgressParser
+from moduli.scanner import VideoScanner
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+SCENARIOS = ("scan", "parse", "events", "probe", "engine")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def peak_rss_mb():
+    """Picco di memoria residente del processo (None dove non disponibile)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KB, macOS byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def make_launchers(directory):
+    """Crea eseguibili ffmpeg/ffprobe che avviano gli script finti con questo Python."""
+    paths = {}
+    for name in ("ffmpeg", "ffprobe"):
+        script = os.path.join(BENCH_DIR, f"fake_{name}.py")
+        if os.name == "nt":
+            path = os.path.join(directory, f"{name}.bat")
+            with open(path, "w") as launcher:
+                launcher.write(f'@"{sys.executable}" "{script}" %*\n')
+        else:
+            path = os.path.join(directory, name)
+            with open(path, "w") as launcher:
+                launcher.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+            os.chmod(path, 0o755)
+        paths[name] = path
+    return paths["ffmpeg"], paths["ffprobe"]
+
+
+def make_tree(root, files, per_dir=100, size=64):
+    """Albero sintetico di files video (per_dir per cartella, due livelli)."""
+    payload = b"\0" * size
+    created = 0
+    while created < files:
+        directory = os.path.join(
+            root, f"d{created // (per_dir * per_dir):04d}", f"s{created // per_dir:06d}"
+        )
+        os.makedirs(directory, exist_ok=True)
+        for _ in range(min(per_dir, files - created)):
+            extension = (".mp4", ".mkv", ".mov", ".txt")[created % 4]
+            with open(os.path.join(directory, f"video{created}{extension}"), "wb") as f:
+                f.write(payload)
+            created += 1
+    return root
+
+
+class NullLogger:
+    """Logger che conta solo gli errori (l'output rallenterebbe la misura)."""
+
+    def __init__(self):
+        self.errors = 0
+
+    def log(self, message, level="info"):
+        if level == "error":
+            self.errors += 1
+
+
+class TimedEngine(ConversionEngine):
+    """ConversionEngine che registra la latenza di ogni fase per job."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {"probe": [], "queue_wait": [], "encode": []}
+        self._enqueued = {}
+        probe = self.utls.probe
+
+        def timed_probe(path):
+            start = perf_counter()
+            result = probe(path)
+            self.timings["probe"].append(perf_counter() - start)
+            return result
+
+        self.utls.probe = timed_probe
+
+    def _job_changed(self, job):
+        self._enqueued.setdefault(id(job), perf_counter())
+        super()._job_changed(job)
+
+    def _run_job(self, job):
+        enqueued = self._enqueued.get(id(job))
+        if enqueued is not None:
+            self.timings["queue_wait"].append(perf_counter() - enqueued)
+        super()._run_job(job)
+
+    def convert_video(self, job):
+        start = perf_counter()
+        super().convert_video(job)
+        self.timings["encode"].append(perf_counter() - start)
+
+
+def bench_scan(args, workdir):
+    root = make_tree(os.path.join(workdir, "scan"), args.files)
+    scanner = VideoScanner()
+    start = perf_counter()
+    found = sum(1 for _ in scanner.scan(root))
+    elapsed = perf_counter() - start
+    return {
+        "files": args.files,
+        "found": found,
+        "files_per_sec": round(args.files / elapsed),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def bench_parse(args, workdir):
+    block = (
+        "frame=1200\nfps=29.97\nstream_0_0_q=28.0\nbitrate=1234.5kbits/s\n"
+        "total_size=1048576\nout_time_us=40040000\nout_time_ms=40040000\n"
+        "out_time=00:00:40.040000\ndup_frames=0\ndrop_frames=0\nspeed=1.98x\n"
+        "progress=continue\n"
+    ).splitlines(keepends=True)
+    blocks = args.blocks
+    parser = ProgressParser()
+    start = perf_counter()
+    records = 0
+    for _ in range(blocks):
+        for line in block:
+            if parser.feed(line) is not None:
+                records += 1
+    elapsed = perf_counter() - start
+    return {
+        "records": records,
+        "lines_per_sec": round(blocks * len(block) / elapsed),
+        "records_per_sec": round(records / elapsed),
+    }
+
+
+def bench_events(args, workdir):
+    """Molti thread pubblicano avanzamento; la "GUI" preleva a 15 Hz."""
+    bus = EventBus()
+    publishers = max(1, args.jobs)
+    per_publisher = args.events // publishers
+    done = threading.Event()
+    drained = []
+
+    def publisher(key):
+        for value in range(per_publisher):
+            bus.publish("job", value, key=key)
+
+    def consumer():
+        while not done.is_set():
+            drained.append(len(bus.drain()))
+            done.wait(1 / 15)
+        drained.append(len(bus.drain()))
+
+    reader = threading.Thread(target=consumer)
+    reader.start()
+    start = perf_counter()
+    threads = [threading.Thread(target=publisher, args=(k,)) for k in range(publishers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    done.set()
+    reader.join()
+    published = per_publisher * publishers
+    return {
+        "published": published,
+        "events_per_sec": round(published / elapsed),
+        "ui_updates": sum(drained),
+        "coalescing_ratio": round(published / max(1, sum(drained)), 1),
+    }
+
+
+def bench_probe(args, workdir, ffprobe_path):
+    root = make_tree(os.path.join(workdir, "probe"), args.probe_files)
+    paths = list(VideoScanner().scan(root))
+    latencies = []
+
+    def probe(path):
+        start = perf_counter()
+        run_ffprobe(ffprobe_path, path)
+        latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.probe_jobs)) as pool:
+        list(pool.map(probe, paths))
+    elapsed = perf_counter() - start
+    return {
+        "files": len(paths),
+        "probes_per_sec": round(len(paths) / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def bench_engine(args, workdir, ffmpeg_path, ffprobe_path):
+    root = make_tree(os.path.join(workdir, "engine"), args.engine_files)
+    options = ConversionOptions(
+        codec="libx264",
+        bitrate_max=0,
+        save_mediainfo=False,
+        overwrite=False,
+        if_big_del=False,
+        max_jobs=args.jobs,
+        probe_jobs=args.probe_jobs,
+        disk_jobs=args.jobs,  # Il disco non è la risorsa misurata qui
+    )
+    logger = NullLogger()
+    engine = TimedEngine(
+        ffmpeg_path, ffprobe_path, options, logger, events=EventBus()
+    )
+    start = perf_counter()
+    engine.run(root)
+    elapsed = perf_counter() - start
+    jobs, counters = engine.snapshot()
+    result = {
+        "files": counters["trovati"],
+        "completed": sum(1 for job in jobs if job.status == "completato"),
+        "errors": logger.errors,
+        "files_per_sec": round(counters["trovati"] / elapsed, 1),
+    }
+    for stage, values in engine.timings.items():
+        result[f"{stage}_p50_ms"] = round(percentile(values, 0.5) * 1000, 1)
+        result[f"{stage}_p95_ms"] = round(percentile(values, 0.95) * 1000, 1)
+    return result
+
+
+def run_scenario(name, args, workdir, ffmpeg_path, ffprobe_path):
+    if args.tracemalloc:
+        tracemalloc.start()
+    if name == "scan":
+        result = bench_scan(args, workdir)
+    elif name == "parse":
+        result = bench_parse(args, workdir)
+    elif name == "events":
+        result = bench_events(args, workdir)
+    elif name == "probe":
+        result = bench_probe(args, workdir, ffprobe_path)
+    else:
+        result = bench_engine(args, workdir, ffmpeg_path, ffprobe_path)
+    if args.tracemalloc:
+        result["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def baseline_key(name, args):
+    """I risultati sono confrontabili solo a parità di parametri."""
+    params = {
+        "scan": f"files={args.files}",
+        "parse": f"blocks={args.blocks}",
+        "events": f"events={args.events},jobs={args.jobs}",
+        "probe": f"files={args.probe_files},probe_jobs={args.probe_jobs}",
+        "engine": f"files={args.engine_files},jobs={args.jobs},probe_jobs={args.probe_jobs}",
+    }
+    return f"{name}[{params[name]}]"
+
+
+def compare(results, baselines, tolerance):
+    """Ritorna le regressioni: rate più basse o latenze/memoria più alte della soglia."""
+    regressions = []
+    for key, metrics in results.items():
+        reference = baselines.get(key)
+        if not reference:
+            continue
+        for metric, value in metrics.items():
+            base = reference.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+                continue
+            if not base or metric in ("files", "found", "records", "published", "completed"):
+                continue
+            if metric.endswith("_per_sec") or metric == "coalescing_ratio":
+                if value < base * (1 - tolerance):
+                    regressions.append(f"{key} {metric}: {value} < {base}")
+            elif metric.endswith(("_ms", "_mb")) or metric == "seconds":
+                if value > base * (1 + tolerance):
+                    regressions.append(f"{key} {metric}: {value} > {base}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", metavar="scenario", help=f"Scenari da eseguire: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--files", type=int, default=10000, help="File per la scansione")
+    parser.add_argument("--probe-files", type=int, default=500, help="File da analizzare")
+    parser.add_argument("--engine-files", type=int, default=200, help="File convertiti")
+    parser.add_argument("--blocks", type=int, default=100000, help="Blocchi di avanzamento")
+    parser.add_argument("--events", type=int, default=200000, help="Eventi pubblicati")
+    parser.add_argument("--jobs", type=int, default=4, help="Conversioni contemporanee")
+    parser.add_argument("--probe-jobs", type=int, default=4, help="Probe contemporanei")
+    parser.add_argument(
+        "--fake",
+        default="{}",
+        help='Configurazione JSON di ffmpeg/ffprobe finti, es. \'{"block_delay": 0.01}\'',
+    )
+    parser.add_argument("--workdir", help="Cartella per gli alberi sintetici (default temporanea)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Misura il picco di memoria Python")
+    parser.add_argument("--json", action="store_true", help="Risultati in JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Salva i risultati come riferimento")
+    parser.add_argument("--compare", action="store_true", help="Confronta con i riferimenti salvati")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Scarto ammesso (0.2 = 20%%)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    scenarios = args.scenarios or SCENARIOS
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"scenari sconosciuti: {', '.join(unknown)}")
+    os.environ["VCA_FAKE"] = json.dumps(json.loads(args.fake))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="vca_bench_")
+    results = {}
+    try:
+        ffmpeg_path, ffprobe_path = make_launchers(workdir)
+        for name in scenarios:
+            key = baseline_key(name, args)
+            results[key] = run_scenario(name, args, workdir, ffmpeg_path, ffprobe_path)
+            if not args.json:
+                metrics = " ".join(f"{k}={v}" for k, v in results[key].items())
+                print(f"{key}: {metrics}", flush=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    baselines = {}
+    if os.path.isfile(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as baseline_file:
+            baselines = json.load(baseline_file)
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        print(f"Riferimenti salvati in {BASELINE_PATH}", file=sys.stderr)
+    if args.compare:
+        regressions = compare(results, baselines, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSIONE {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,19 @@
-from moduli.gui import VideoConverterApp
+import sys
 
 if __name__ == "__main__":
-    VideoConverterApp()
+    timer = None
+    if "--startup-timing" in sys.argv:
+        # Tempi di avvio della GUI e import più lenti, stampati dopo la prima finestra
+        sys.argv.remove("--startup-timing")
+        from moduli.startup import StartupTimer
+
+        timer = StartupTimer().install()
+    if len(sys.argv) > 1:
+        # Modalità a riga di comando: nessun import di tkinter/PIL
+        from moduli.cli import main
+
+        sys.exit(main())
+    else:
+        from moduli.gui import VideoConverterApp
+
+        VideoConverterApp(timer=timer)
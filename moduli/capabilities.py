@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import subprocess
+import threading
+
+# Encoder proposti nella GUI (nomi accettati da "-c:v")
+CODEC_CHOICES = (
+    "libx264",  # Codifica video con H.264 (x264)
+    "libx265",  # Codifica video con HEVC (H.265)
+    "h264_nvenc",  # Codifica video H.264 usando GPU NVIDIA (accelerazione hardware)
+    "hevc_nvenc",  # Codifica video HEVC (H.265) usando GPU NVIDIA (accelerazione hardware)
+    "vp8",  # Codifica video con VP8
+    "vp9",  # Codifica video con VP9
+    "mpeg4",  # Codifica video con MPEG-4
+    "libaom-av1",  # Codifica video con AV1
+)
+
+# Ripiego quando un encoder manca o non si inizializza (sempre verso la CPU)
+FALLBACKS = {
+    "h264_nvenc": ("libx264", "mpeg4"),
+    "hevc_nvenc": ("libx265", "libx264", "mpeg4"),
+    "libx265": ("libx264", "mpeg4"),
+    "libaom-av1": ("libsvtav1", "libx264", "mpeg4"),
+    "vp9": ("libx264", "mpeg4"),
+    "vp8": ("libx264", "mpeg4"),
+    "libx264": ("mpeg4",),
+}
+
+# Encoder hardware: vengono provati con una codifica minima al rilevamento,
+# perché ffmpeg li elenca anche quando il driver o la GPU mancano
+HARDWARE_SUFFIXES = ("_nvenc", "_qsv", "_amf", "_vaapi", "_videotoolbox", "_mf")
+
+# Decodifica hardware da usare con ciascuna famiglia di encoder
+HWACCEL_FOR_SUFFIX = {"_nvenc": "cuda"}
+
+# Qualità costante di ciascun encoder, qualunque sia la modalità scelta: -cq
+# per NVENC, -crf per gli encoder CPU, il quantizzatore -q:v per mpeg4
+CQ_SUFFIXES = ("_nvenc",)
+QSCALE_ENCODERS = ("mpeg4",)
+# Con -crf da solo questi encoder restano sotto un bitrate di default
+UNCAPPED_CRF_ENCODERS = ("vp9", "libvpx-vp9", "libaom-av1")
+# -preset: i nomi di x264 valgono per x264/x265/NVENC; libsvtav1 vuole un
+# numero, gli altri encoder non hanno preset
+PRESET_ENCODERS = ("libx264", "libx265", "h264_nvenc", "hevc_nvenc")
+SVTAV1_PRESETS = {"fast": "8", "medium": "6", "slow": "4"}
+
+# Messaggi di ffmpeg che indicano un encoder assente dal sistema: registrati
+# nella cache su disco
+ENCODER_UNAVAILABLE_ERRORS = re.compile(
+    r"Unknown encoder|Cannot load|No capable devices found",
+    re.IGNORECASE,
+)
+# Encoder che non si apre per questo file (risoluzione, formato dei pixel) o
+# per un limite temporaneo: la cache si aggiorna solo se fallisce anche
+# la codifica di prova (vedi FFmpegCapabilities.verify)
+ENCODER_INIT_ERRORS = re.compile(
+    r"Error (?:while opening|initializing output stream)|Could not open encoder|"
+    r"OpenEncodeSessionEx failed",
+    re.IGNORECASE,
+)
+# Sessioni dell'encoder hardware esaurite: mai registrate, la prova
+# fallirebbe per lo stesso motivo
+ENCODER_BUSY_ERRORS = re.compile(r"OpenEncodeSessionEx failed", re.IGNORECASE)
+HWACCEL_INIT_ERRORS = re.compile(
+    r"Device creation failed|Failed setup for format cuda|"
+    r"No device available for decoder|hwaccel initialisation returned error",
+    re.IGNORECASE,
+)
+
+_ENCODER_LINE = re.compile(r"^\s*V[A-Z.]{5}\s+(\S+)\s+(.*)$")
+_CODEC_NAME = re.compile(r"\(codec (\S+)\)")
+
+
+def _run(command, creationflags=0, startupinfo=None, timeout=30):
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            errors="replace",
+            creationflags=creationflags,
+            startupinfo=startupinfo,
+            timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result
+
+
+def quality_mode(encoder):
+    """Modalità di qualità usata davvero dall'encoder: "cq", "crf" o "q"."""
+    if encoder.endswith(CQ_SUFFIXES):
+        return "cq"
+    if encoder in QSCALE_ENCODERS:
+        return "q"
+    return "crf"
+
+
+def quality_args(encoder, value, preset=None):
+    """
+    Opzioni di ffmpeg per codificare con l'encoder a qualità costante value
+    (scala CRF/CQ, più basso = migliore), più il preset se l'encoder lo accetta.
+    """
+    mode = quality_mode(encoder)
+    if mode == "q":
+        # Quantizzatore 2-31 di mpeg4: CRF 18 -> 2, 23 -> 4, 28 -> 6
+        args = ["-q:v", str(min(max(round((value - 13) / 2.5), 2), 31))]
+    else:
+        args = [f"-{mode}", str(value)]
+    if encoder in UNCAPPED_CRF_ENCODERS:
+        args += ["-b:v", "0"]
+    if preset and encoder in PRESET_ENCODERS:
+        args += ["-preset", preset]
+    elif preset and encoder == "libsvtav1":
+        args += ["-preset", SVTAV1_PRESETS.get(preset, "8")]
+    return args
+
+
+def parse_encoders(output):
+    """Ritorna {encoder video: codec} dall'output di "ffmpeg -encoders"."""
+    encoders = {}
+    lines = output.splitlines()
+    # La legenda in testa ha lo stesso formato: si parte dopo la riga "------"
+    for index, line in enumerate(lines):
+        if line.strip().startswith("---"):
+            lines = lines[index + 1 :]
+            break
+    for line in lines:
+        match = _ENCODER_LINE.match(line)
+        if not match:
+            continue
+        name, description = match.groups()
+        codec = _CODEC_NAME.search(description)
+        encoders[name] = codec.group(1) if codec else name
+    return encoders
+
+
+def parse_hwaccels(output):
+    """Ritorna i metodi elencati da "ffmpeg -hwaccels"."""
+    lines = [line.strip() for line in output.splitlines()]
+    if "Hardware acceleration methods:" in lines:
+        lines = lines[lines.index("Hardware acceleration methods:") + 1 :]
+    return [line for line in lines if line and " " not in line]
+
+
+class FFmpegCapabilities:
+    """
+    Encoder e hwaccel realmente utilizzabili con un certo binario ffmpeg.
+    Il rilevamento (ffmpeg -encoders/-hwaccels più una codifica di prova
+    per gli encoder hardware) viene eseguito una volta sola e salvato su
+    disco, legato a dimensione e mtime dell'eseguibile. Gli encoder che
+    durante un batch risultano assenti, o non superano più la codifica di
+    prova, vengono aggiunti alla cache.
+    """
+
+    def __init__(self, ffmpeg_path, cache_path=None):
+        self.creationflags = 0
+        self.startupinfo = None
+        if os.name == "nt":  # Solo per Windows
+            self.creationflags = subprocess.CREATE_NO_WINDOW
+            self.startupinfo = subprocess.STARTUPINFO()
+            self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        self.ffmpeg_path = ffmpeg_path
+        self.cache_path = cache_path
+        self.version = None
+        self.encoders = {}  # encoder -> codec
+        self.hwaccels = []
+        self.failed = set()  # Encoder/hwaccel che non si inizializzano
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def _binary_key(self):
+        try:
+            stat = os.stat(self.ffmpeg_path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(self.ffmpeg_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def load(self):
+        """Legge la cache o, se non valida per questo binario, rileva di nuovo."""
+        with self._lock:
+            if self.loaded:
+                return self
+            key = self._binary_key()
+            if key is None:
+                return self  # ffmpeg mancante: nessuna capacità
+            if not self._read_cache(key):
+                self._detect()
+                self._write_cache(key)
+            self.loaded = True
+        return self
+
+    def _read_cache(self, key):
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+        if data.get("key") != key:
+            return False
+        self.version = data.get("version")
+        self.encoders = data.get("encoders", {})
+        self.hwaccels = data.get("hwaccels", [])
+        self.failed = set(data.get("failed", []))
+        return True
+
+    def _write_cache(self, key=None):
+        if not self.cache_path:
+            return
+        data = {
+            "key": key or self._binary_key(),
+            "version": self.version,
+            "encoders": self.encoders,
+            "hwaccels": self.hwaccels,
+            "failed": sorted(self.failed),
+        }
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as cache_file:
+                json.dump(data, cache_file, indent=2)
+        except OSError:
+            pass
+
+    def _ffmpeg(self, *args, timeout=30):
+        return _run(
+            [self.ffmpeg_path, "-hide_banner", *args],
+            self.creationflags,
+            self.startupinfo,
+            timeout,
+        )
+
+    def _detect(self):
+        result = self._ffmpeg("-version")
+        if result and result.stdout:
+            self.version = result.stdout.splitlines()[0]
+        result = self._ffmpeg("-encoders")
+        self.encoders = parse_encoders(result.stdout) if result else {}
+        result = self._ffmpeg("-hwaccels")
+        self.hwaccels = parse_hwaccels(result.stdout) if result else []
+        self.failed = set()
+
+        # Solo gli encoder hardware che potrebbero servire vengono provati
+        candidates = set(CODEC_CHOICES)
+        for fallbacks in FALLBACKS.values():
+            candidates.update(fallbacks)
+        for encoder in sorted(candidates & set(self.encoders)):
+            if encoder.endswith(HARDWARE_SUFFIXES) and not self._test_encoder(encoder):
+                self.failed.add(encoder)
+
+    def _test_encoder(self, encoder):
+        """Codifica un fotogramma sintetico: True se l'encoder si inizializza."""
+        result = self._ffmpeg(
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "color=c=black:s=256x256:d=0.1",
+            "-frames:v",
+            "1",
+            "-c:v",
+            encoder,
+            "-f",
+            "null",
+            "-",
+        )
+        return result is not None and result.returncode == 0
+
+    def usable(self, encoder):
+        """True se encoder (o un codec, es. "vp9") è disponibile e funzionante."""
+        self.load()
+        if encoder in self.failed:
+            return False
+        if encoder in self.encoders:
+            return True
+        return any(
+            codec == encoder and name not in self.failed
+            for name, codec in self.encoders.items()
+        )
+
+    def available_choices(self, choices=CODEC_CHOICES):
+        self.load()
+        if not self.encoders:
+            return list(choices)  # Rilevamento fallito: non si filtra nulla
+        return [choice for choice in choices if self.usable(choice)]
+
+    def chain(self, encoder):
+        """Encoder da provare in ordine: quello richiesto e i suoi ripieghi usabili."""
+        self.load()
+        candidates = [encoder] + list(FALLBACKS.get(encoder, ("libx264", "mpeg4")))
+        if not self.encoders:
+            return candidates[:1]
+        chain = []
+        for candidate in candidates:
+            if candidate not in chain and self.usable(candidate):
+                chain.append(candidate)
+        return chain
+
+    def hwaccel_for(self, encoder):
+        """Metodo -hwaccel da usare con l'encoder, o None per la decodifica software."""
+        self.load()
+        for suffix, hwaccel in HWACCEL_FOR_SUFFIX.items():
+            if (
+                encoder.endswith(suffix)
+                and hwaccel in self.hwaccels
+                and f"hwaccel:{hwaccel}" not in self.failed
+            ):
+                return hwaccel
+        return None
+
+    def verify(self, encoder):
+        """
+        Ripete la codifica di prova dopo un errore d'inizializzazione: se
+        fallisce l'encoder viene registrato come non funzionante. True se funziona.
+        """
+        self.load()
+        if self._test_encoder(encoder):
+            return True
+        self.mark_failed(encoder)
+        return False
+
+    def mark_failed(self, name):
+        """Registra un encoder (o "hwaccel:<nome>") che non si è inizializzato."""
+        with self._lock:
+            if name in self.failed:
+                return
+            self.failed.add(name)
+            self._write_cache()
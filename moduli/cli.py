@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+
+from moduli.config_manager import ConfigManager
+from moduli.logs import (
+    LogAdapter,
+    get_logger,
+    log_formatter,
+    setup_file_log,
+    DEFAULT_LOG_MB,
+    DEFAULT_LOG_BACKUPS,
+)
+from moduli.probe_cache import ProbeCache
+from moduli.converted_index import ConvertedIndex
+from moduli.journal import JobJournal
+from moduli.capabilities import FFmpegCapabilities
+from moduli.quality_search import QualityCache
+from moduli.metrics import MetricsRecorder
+from moduli.eta import ThroughputModel
+from moduli.engine import (
+    ConversionEngine,
+    ConversionOptions,
+    FFMPEG_EXE,
+    FFPROBE_EXE,
+    find_executable,
+)
+
+
+def add_toggle(parser, name, help_text):
+    """Aggiunge la coppia --name/--no-name (default None = valore di config/GUI)."""
+    dest = name.replace("-", "_")
+    parser.add_argument(
+        f"--{name}", dest=dest, action="store_true", default=None, help=help_text
+    )
+    parser.add_argument(f"--no-{name}", dest=dest, action="store_false")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Video Converter senza interfaccia grafica."
+    )
+    parser.add_argument(
+        "--config", default="config.ini", help="File di configurazione (config.ini)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Converte i video di una cartella")
+    convert.add_argument("--input", help="Cartella dei video da convertire")
+    convert.add_argument(
+        "--resume",
+        action="store_true",
+        help="Riprende l'ultimo batch interrotto saltando i file già conclusi; i file falliti vengono ritentati",
+    )
+    convert.add_argument(
+        "--output", help="Cartella di output (default: accanto all'originale)"
+    )
+    convert.add_argument("--jobs", type=int, help="Conversioni contemporanee")
+    convert.add_argument("--probe-jobs", type=int, help="Analisi ffprobe contemporanee")
+    convert.add_argument(
+        "--segment-min",
+        type=int,
+        help="Codifica a segmenti paralleli i video più lunghi di N secondi (0 = mai)",
+    )
+    convert.add_argument(
+        "--segment-jobs", type=int, help="Segmenti codificati in parallelo per video"
+    )
+    convert.add_argument(
+        "--segment-length", type=int, help="Durata indicativa di un segmento (secondi)"
+    )
+    convert.add_argument(
+        "--hw-sessions",
+        type=int,
+        help="Job contemporanei per encoder hardware (0 = nessun limite)",
+    )
+    convert.add_argument(
+        "--disk-jobs",
+        type=int,
+        help="Job contemporanei per disco (0 = automatico, 1 sui dischi meccanici)",
+    )
+    convert.add_argument("--codec", help="Encoder video (es. libx264, h264_nvenc)")
+    quality = convert.add_mutually_exclusive_group()
+    quality.add_argument("--crf", type=int, help="Qualità in modalità CRF")
+    quality.add_argument("--cq", type=int, help="Qualità in modalità CQ")
+    add_toggle(
+        convert,
+        "auto-quality",
+        "Sceglie CRF/CQ per file codificando alcuni campioni (obiettivo di qualità)",
+    )
+    convert.add_argument(
+        "--quality-metric",
+        choices=("ssim", "psnr"),
+        help="Metrica della ricerca automatica",
+    )
+    convert.add_argument(
+        "--quality-target",
+        type=float,
+        help="Punteggio minimo (es. 0.98 per SSIM, 40 per PSNR in dB)",
+    )
+    convert.add_argument(
+        "--min-savings",
+        type=int,
+        help="Salta i file il cui risparmio previsto dai campioni è sotto N%% (0 = nessuna stima)",
+    )
+    add_toggle(
+        convert,
+        "stream-copy",
+        "Copia senza ricodifica i flussi già conformi (remux in MP4)",
+    )
+    convert.add_argument(
+        "--copy-bitrate-max",
+        type=int,
+        help="Bitrate video massimo (kbps) per copiare il video invece di ricodificarlo (default 2500, non oltre --bitrate-max)",
+    )
+    convert.add_argument(
+        "--bitrate-max",
+        type=int,
+        help="Salta i file sotto questo bitrate (kbps, 0 = nessun filtro)",
+    )
+    convert.add_argument(
+        "--mediainfo",
+        action="store_true",
+        default=None,
+        help="Salva il rapporto MediaInfo",
+    )
+    add_toggle(convert, "overwrite", "Sostituisce l'originale con il file convertito")
+    add_toggle(
+        convert, "delete-bigger", "Elimina l'output se è più grande dell'originale"
+    )
+    convert.add_argument(
+        "--ffmpeg-dir", help="Cartella con ffmpeg/ffprobe (default da config.ini)"
+    )
+    convert.add_argument(
+        "--metrics-file",
+        help="Metriche per job in JSON lines (default metrics.jsonl accanto a config.ini, \"\" = nessuna)",
+    )
+    convert.add_argument(
+        "--prometheus-file",
+        help="File .prom per il textfile collector di node_exporter",
+    )
+    convert.add_argument(
+        "--log-file",
+        help="Log rotante, con lo stderr di ffmpeg di ogni job (default videoconverter.log accanto a config.ini, \"\" = nessuno)",
+    )
+    convert.add_argument(
+        "--json", action="store_true", help="Avanzamento in JSON lines su stdout"
+    )
+    convert.add_argument(
+        "--interval", type=float, default=2.0, help="Secondi tra due aggiornamenti"
+    )
+    return parser
+
+
+class ProgressReporter:
+    """Stampa periodicamente l'avanzamento del motore su stdout (testo o JSON lines)."""
+
+    def __init__(self, engine, as_json=False, interval=2.0, stream=None):
+        self.engine = engine
+        self.as_json = as_json
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self._reported = 0  # Job conclusi già stampati (engine.finished_jobs)
+        self._done = threading.Event()
+
+    def emit(self, record):
+        if self.as_json:
+            print(json.dumps(record), file=self.stream, flush=True)
+        else:
+            print(
+                " ".join(f"{key}={value}" for key, value in record.items()),
+                file=self.stream,
+                flush=True,
+            )
+
+    def report(self):
+        finished, counters = self.engine.finished_since(self._reported)
+        self._reported += len(finished)
+        for job in finished:
+            self.emit(
+                {
+                    "event": "job",
+                    "input": job.input_path,
+                    "output": job.output_path,
+                    "status": job.status,
+                    "elapsed": round(job.elapsed, 2),
+                    "size_saved": job.size_saved,
+                }
+            )
+        progress, eta = self.engine.batch_progress()
+        self.emit(
+            dict(
+                event="progress",
+                percent=round(progress, 1),
+                eta=round(eta),
+                active=sum(
+                    1 for job in self.engine.active_jobs() if job.status == "in corso"
+                ),
+                **counters,
+            )
+        )
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.report()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def finish(self):
+        self._done.set()
+        self.report()
+
+
+def convert(args, config):
+    quality_mode = None
+    if args.cq is not None:
+        quality_mode = "cq"
+    elif args.crf is not None:
+        quality_mode = "crf"
+    options = ConversionOptions.from_config(
+        config,
+        codec=args.codec,
+        quality_mode=quality_mode,
+        quality_value=args.cq if args.cq is not None else args.crf,
+        bitrate_max=args.bitrate_max,
+        save_mediainfo=args.mediainfo,
+        overwrite=args.overwrite,
+        if_big_del=args.delete_bigger,
+        max_jobs=args.jobs,
+        probe_jobs=args.probe_jobs,
+        output_folder=args.output,
+        segment_min_duration=args.segment_min,
+        segment_jobs=args.segment_jobs,
+        segment_length=args.segment_length,
+        hw_sessions=args.hw_sessions,
+        disk_jobs=args.disk_jobs,
+        auto_quality=args.auto_quality,
+        quality_metric=args.quality_metric,
+        quality_target=args.quality_target,
+        min_savings=args.min_savings,
+        stream_copy=args.stream_copy,
+        copy_bitrate_max=args.copy_bitrate_max,
+    )
+    journal_path = config.data_path("batch_journal.jsonl")
+    if args.resume and not args.input:
+        args.input = JobJournal.unfinished_batch(journal_path)
+        if not args.input:
+            print("Nessun batch da riprendere.", file=sys.stderr)
+            return 2
+    if not args.input or not os.path.isdir(args.input):
+        print(f"Cartella non valida: {args.input}", file=sys.stderr)
+        return 2
+
+    ffmpeg_dir = args.ffmpeg_dir or config.get("Paths", "ffmpeg_dir", "ffmpeg_files/")
+    probe_cache = ProbeCache(
+        config.data_path("probe_cache.db"),
+        max_entries=config.getint("Settings", "probe_cache_size", 200000),
+    )
+    converted_index = ConvertedIndex(config.data_path("converted_index.db"))
+    quality_cache = QualityCache(config.data_path("quality_cache.db"))
+    throughput = ThroughputModel(config.data_path("throughput.json"))
+    metrics = MetricsRecorder(
+        args.metrics_file
+        if args.metrics_file is not None
+        else config.get("Settings", "metrics_file", config.data_path("metrics.jsonl")),
+        args.prometheus_file or config.get("Settings", "prometheus_file", ""),
+    )
+    # Messaggi su stderr; il file rotante riceve anche lo stderr di ffmpeg dei job
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(log_formatter())
+    get_logger("conversione").addHandler(console)
+    setup_file_log(
+        args.log_file
+        if args.log_file is not None
+        else config.get("Settings", "log_file", config.data_path("videoconverter.log")),
+        max_mb=config.getint("Settings", "log_max_mb", DEFAULT_LOG_MB),
+        backups=config.getint("Settings", "log_backups", DEFAULT_LOG_BACKUPS),
+    )
+    ffmpeg_path = find_executable(ffmpeg_dir, FFMPEG_EXE)
+    engine = ConversionEngine(
+        ffmpeg_path,
+        find_executable(ffmpeg_dir, FFPROBE_EXE),
+        options,
+        LogAdapter("conversione"),
+        probe_cache=probe_cache,
+        journal=JobJournal(journal_path),
+        converted_index=converted_index,
+        capabilities=FFmpegCapabilities(
+            ffmpeg_path, config.data_path("ffmpeg_capabilities.json")
+        ),
+        quality_cache=quality_cache,
+        metrics=metrics,
+        throughput=throughput,
+    )
+    reporter = ProgressReporter(engine, as_json=args.json, interval=args.interval)
+    reporter.start()
+    # Il batch gira in un thread separato così Ctrl+C arriva sempre al thread principale.
+    # La fine si attende su un Event: dopo un Ctrl+C durante join(), Thread.join
+    # può ritornare mentre il thread è ancora vivo
+    done = threading.Event()
+
+    def run_batch():
+        try:
+            engine.run(args.input, args.resume)
+        finally:
+            done.set()
+
+    threading.Thread(target=run_batch, daemon=True).start()
+    interrupted = False
+    while True:
+        try:
+            while not done.wait(0.5):
+                pass
+            break
+        except KeyboardInterrupt:
+            # Anche un secondo Ctrl+C ferma i job e continua ad attendere:
+            # cache e journal si chiudono solo a batch concluso
+            engine.stop()
+            if not interrupted:
+                interrupted = True
+                print(
+                    "Interruzione: attesa della chiusura dei job in corso...",
+                    file=sys.stderr,
+                )
+    reporter.finish()
+    probe_cache.close()
+    converted_index.close()
+    quality_cache.close()
+    metrics.close()
+
+    jobs, counters = engine.snapshot()
+    reporter.emit(
+        dict(
+            event="summary",
+            elapsed=round(engine.elapsed, 2),
+            size_saved=sum(engine.size_files),
+            errors=sum(1 for job in jobs if job.status == "errore"),
+            **dict(
+                counters,
+                # Il contatore del motore include annullati e saltati
+                completati=sum(1 for job in jobs if job.status == "completato"),
+                annullati=sum(1 for job in jobs if job.status == "annullato"),
+                saltati=sum(1 for job in jobs if job.status == "saltato"),
+            ),
+        )
+    )
+    if interrupted:
+        return 130
+    return 1 if any(job.status == "errore" for job in jobs) else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = ConfigManager(args.config)
+    if args.command == "convert":
+        return convert(args, config)
+    return 2
@@ -18,7 +18,7 @@ class ConfigManager:
                 "input_folder": "",
                 "output_folder": "",
             }
-            self.config["Settings"] = {"crf_value": "25"}
+            self.config["Settings"] = {"crf_value": "25", "max_jobs": "2"}
             with open(self.config_file, "w", encoding="utf-8") as configfile:
                 self.config.write(configfile)
         with open(self.config_file, "r", encoding="utf-8") as configfile:
@@ -27,6 +27,22 @@ class ConfigManager:
     def get(self, section, option, fallback=None):
         return self.config.get(section, option, fallback=fallback)
 
+    def getint(self, section, option, fallback=None):
+        try:
+            return self.config.getint(section, option, fallback=fallback)
+        except ValueError:
+            return fallback
+
+    def getboolean(self, section, option, fallback=False):
+        try:
+            return self.config.getboolean(section, option, fallback=fallback)
+        except ValueError:
+            return fallback
+
+    def data_path(self, filename):
+        """Percorso di un file di dati (cache, journal) accanto a config.ini."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_file)), filename)
+
     def update(self, section, option, value):
         self.config.set(section, option, value)
         with open(self.config_file, "w", encoding="utf-8") as configfile:
@@ -0,0 +1,103 @@
+import os
+import hashlib
+import sqlite3
+import threading
+
+# Tag scritto nei metadati del contenitore di ogni file convertito
+CONVERTED_TAG = "vca_converted"
+
+# Byte letti all'inizio e alla fine del file per l'impronta del contenuto
+FINGERPRINT_CHUNK = 65536
+
+
+def fingerprint(path, size=None):
+    """Impronta economica del contenuto: dimensione + primi e ultimi 64 KB."""
+    size = os.path.getsize(path) if size is None else size
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as video_file:
+        digest.update(video_file.read(FINGERPRINT_CHUNK))
+        if size > FINGERPRINT_CHUNK:
+            video_file.seek(max(size - FINGERPRINT_CHUNK, FINGERPRINT_CHUNK))
+            digest.update(video_file.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+class ConvertedIndex:
+    """
+    Indice (SQLite) dei file prodotti dal convertitore.
+    Il controllo veloce usa percorso, dimensione e mtime; se il file è stato
+    copiato o spostato si ricorre all'impronta, calcolata solo quando esiste
+    un file convertito della stessa dimensione.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS converted (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS converted_size ON converted(size)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def add(self, path):
+        """Registra un file appena convertito (nella sua posizione finale)."""
+        try:
+            stat = os.stat(path)
+            file_print = fingerprint(path, stat.st_size)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO converted VALUES (?, ?, ?, ?)",
+                (self._key(path), stat.st_size, stat.st_mtime_ns, file_print),
+            )
+            self._conn.commit()
+
+    def is_converted(self, path, stat=None):
+        """True se il file risulta già prodotto dal convertitore."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return False
+        key = self._key(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM converted WHERE path = ?", (key,)
+            ).fetchone()
+            if row == (stat.st_size, stat.st_mtime_ns):
+                return True
+            candidates = {
+                file_print
+                for (file_print,) in self._conn.execute(
+                    "SELECT fingerprint FROM converted WHERE size = ?", (stat.st_size,)
+                )
+            }
+        if not candidates:
+            return False
+        try:
+            if fingerprint(path, stat.st_size) not in candidates:
+                return False
+        except OSError:
+            return False
+        # Stesso contenuto in un'altra posizione: lo si registra per il prossimo giro
+        self.add(path)
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1048576
+TIMEOUT = 30  # Secondi senza dati prima di considerare la connessione caduta
+RETRIES = 5  # Tentativi (con ripresa) per ogni download o intervallo
+# Intervalli più piccoli non vengono scaricati in parallelo
+MIN_RANGE_SIZE = 4 * 1048576
+
+# Righe "hash  nome" dei file di checksum (SHA-256 o MD5, uno o più archivi)
+_CHECKSUM_LINE = re.compile(r"^([0-9a-fA-F]{64}|[0-9a-fA-F]{32})\b[ \t*]*(\S*)", re.M)
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+# Errori di rete dopo i quali il download viene ripreso (URLError, timeout e
+# connessioni chiuse sono tutti OSError)
+NETWORK_ERRORS = (OSError, http.client.HTTPException)
+
+
+class DownloadError(Exception):
+    """Download fallito dopo tutti i tentativi o archivio non valido."""
+
+
+def new_digest(checksum=None):
+    """Hash dello stesso algoritmo del checksum atteso (MD5 se di 32 cifre, altrimenti SHA-256)."""
+    return hashlib.md5() if checksum and len(checksum) == 32 else hashlib.sha256()
+
+
+def file_digest(path, checksum=None):
+    digest = new_digest(checksum)
+    with open(path, "rb") as archive:
+        while chunk := archive.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_cache_dir():
+    """Cartella della cache degli archivi scaricati, per utente."""
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else None
+    base = base or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "VideoConverterApp", "downloads")
+
+
+class ArchiveDownload:
+    """
+    Download di un archivio in un solo passaggio sulla rete, con ripresa
+    (HTTP Range) dopo le interruzioni, intervalli paralleli opzionali e
+    verifica del checksum. L'archivio verificato resta in cache_dir (anche una
+    cartella condivisa) e le installazioni successive non usano la rete.
+    """
+
+    def __init__(
+        self,
+        url,
+        cache_dir,
+        filename=None,
+        checksum_url=None,
+        checksum=None,
+        connections=1,
+        on_progress=None,
+        log=None,
+    ):
+        self.url = url
+        self.cache_dir = cache_dir
+        self.filename = filename or os.path.basename(url.split("?", 1)[0])
+        self.checksum_url = checksum_url
+        self.checksum = checksum.lower() if checksum else None
+        self.expected = None
+        self.connections = max(1, connections)
+        self.on_progress = on_progress
+        self.log = log or (lambda message, level="info": None)
+        self.path = os.path.join(cache_dir, self.filename)
+        self.part_path = self.path + ".part"
+        self.meta_path = self.part_path + ".json"
+        self.total = None
+        self.downloaded = 0
+        self._lock = threading.Lock()
+
+    def expected_checksum(self):
+        """Checksum atteso: quello fornito o quello pubblicato accanto all'archivio."""
+        if self.checksum or not self.checksum_url:
+            return self.checksum
+        try:
+            with urllib.request.urlopen(self.checksum_url, timeout=TIMEOUT) as response:
+                text = response.read(65536).decode("ascii", "replace")
+        except NETWORK_ERRORS as e:
+            self.log(f"Checksum non disponibile ({e}).", level="warning")
+            return None
+        lines = _CHECKSUM_LINE.findall(text)
+        # Un file può elencare più archivi: si usa la riga con questo nome
+        for checksum, name in lines:
+            if os.path.basename(name) == self.filename:
+                return checksum.lower()
+        return lines[0][0].lower() if lines else None
+
+    def cached(self, expected):
+        """Percorso dell'archivio in cache se verificato, altrimenti None."""
+        try:
+            with open(self.path + ".checksum", "r", encoding="ascii") as sidecar:
+                recorded = sidecar.read().strip()
+        except OSError:
+            return None
+        if expected and recorded != expected:
+            return None  # Archivio di una versione precedente
+        if not os.path.isfile(self.path) or file_digest(self.path, recorded) != recorded:
+            return None
+        return self.path
+
+    def fetch(self):
+        """Ritorna il percorso dell'archivio verificato; solleva DownloadError."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        expected = self.expected = self.expected_checksum()
+        if not expected and not self.checksum_url:
+            # Senza checksum la cache non può dire se l'archivio è aggiornato
+            cached = None
+        else:
+            cached = self.cached(expected)
+        if cached:
+            self.log(f"Archivio {self.filename} trovato nella cache: {cached}")
+            return cached
+
+        start_time = time.time()
+        digest = None
+        if self.connections > 1:
+            digest = self._download_parallel()
+        if digest is None:
+            digest = self._download_single()
+        if expected and digest != expected:
+            self._discard_part()
+            raise DownloadError(
+                f"Checksum non corrispondente per {self.filename}: {digest} invece di {expected}."
+            )
+        os.replace(self.part_path, self.path)
+        self._remove(self.meta_path)
+        with open(self.path + ".checksum", "w", encoding="ascii") as sidecar:
+            sidecar.write(digest)
+        elapsed = time.time() - start_time
+        self.log(
+            f"Download completato in {elapsed:.2f} secondi ({self.downloaded / 1048576:.1f} MB)"
+            + (", checksum verificato." if expected else ".")
+        )
+        return self.path
+
+    def _request(self, start=None, end=None, validator=None):
+        headers = {"User-Agent": "VideoConverterApp"}
+        if start is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+            if validator:
+                # Se l'archivio sul server è cambiato si riceve il file intero (200)
+                headers["If-Range"] = validator
+        request = urllib.request.Request(self.url, headers=headers)
+        return urllib.request.urlopen(request, timeout=TIMEOUT)
+
+    def _progress(self, amount):
+        with self._lock:
+            self.downloaded += amount
+            downloaded = self.downloaded
+        if self.on_progress and self.total:
+            self.on_progress(min(downloaded / self.total * 100, 100))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _discard_part(self):
+        self._remove(self.part_path)
+        self._remove(self.meta_path)
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return {}
+        return meta if meta.get("url") == self.url else {}
+
+    def _write_meta(self, response):
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        with open(self.meta_path, "w", encoding="utf-8") as meta_file:
+            json.dump({"url": self.url, "validator": validator, "mode": "single"}, meta_file)
+
+    def _download_single(self):
+        """Un solo flusso, ripreso dal punto di interruzione; ritorna il checksum."""
+        meta = self._read_meta()
+        digest = new_digest(self.expected)
+        offset = 0
+        if meta.get("mode") == "single" and os.path.isfile(self.part_path):
+            # Download interrotto in un avvio precedente: si riparte da lì
+            with open(self.part_path, "rb") as part:
+                while chunk := part.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    offset += len(chunk)
+            if offset:
+                self.log(f"Ripresa del download da {offset / 1048576:.1f} MB.")
+        else:
+            self._discard_part()
+
+        self.downloaded = offset
+        for attempt in range(1, RETRIES + 1):
+            try:
+                response = self._request(
+                    offset if offset else None, validator=meta.get("validator")
+                )
+            except urllib.error.HTTPError as e:
+                if e.code == 416 and offset:
+                    # Intervallo oltre la fine: il file parziale era già completo
+                    return digest.hexdigest()
+                raise DownloadError(f"Errore HTTP {e.code} scaricando {self.url}.")
+            except NETWORK_ERRORS as e:
+                self.log(f"Connessione non riuscita ({e}), tentativo {attempt}/{RETRIES}.", level="warning")
+                time.sleep(min(2**attempt, 30))
+                continue
+            with response:
+                if response.status != 206 and offset:
+                    # Il server non riprende (o l'archivio è cambiato): da capo
+                    self.log("Il server non supporta la ripresa: download da capo.", level="warning")
+                    offset = 0
+                    self.downloaded = 0
+                    digest = new_digest(self.expected)
+                if self.total is None:
+                    length = response.headers.get("Content-Length")
+                    self.total = offset + int(length) if length and length.isdigit() else None
+                self._write_meta(response)
+                meta = self._read_meta()
+                try:
+                    with open(self.part_path, "ab" if offset else "wb") as part:
+                        while chunk := response.read(CHUNK_SIZE):
+                            part.write(chunk)
+                            digest.update(chunk)
+                            offset += len(chunk)
+                            self._progress(len(chunk))
+                except NETWORK_ERRORS as e:
+                    self.log(
+                        f"Download interrotto a {offset / 1048576:.1f} MB ({e}), ripresa {attempt}/{RETRIES}.",
+                        level="warning",
+                    )
+                    time.sleep(min(2**attempt, 30))
+                    continue
+            if self.total and offset < self.total:
+                self.log(f"Download incompleto ({offset}/{self.total} byte), ripresa.", level="warning")
+                continue
+            return digest.hexdigest()
+        raise DownloadError(f"Download di {self.url} non riuscito dopo {RETRIES} tentativi.")
+
+    def _probe_ranges(self):
+        """Dimensione totale se il server accetta richieste Range, altrimenti None."""
+        try:
+            with self._request(0, 0) as response:
+                if response.status != 206:
+                    return None
+                match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        except NETWORK_ERRORS:
+            return None
+        if not match or match.group(3) == "*":
+            return None
+        return int(match.group(3))
+
+    def _download_parallel(self):
+        """
+        Scarica connections intervalli in parallelo nello stesso file; ogni
+        intervallo riprende da dove si era fermato. Ritorna None se il server
+        non supporta gli intervalli (si userà un solo flusso).
+        """
+        total = self._probe_ranges()
+        if total is None or total < MIN_RANGE_SIZE * 2:
+            return None
+        self._discard_part()
+        self.total = total
+        self.downloaded = 0
+        with open(self.part_path, "wb") as part:
+            part.truncate(total)
+        size = max(MIN_RANGE_SIZE, -(-total // self.connections))
+        ranges = [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+        with ThreadPoolExecutor(max_workers=self.connections) as pool:
+            failed = [
+                error for error in pool.map(self._download_range, ranges) if error
+            ]
+        if failed:
+            self._discard_part()
+            raise DownloadError(failed[0])
+        return file_digest(self.part_path, self.expected)
+
+    def _download_range(self, byte_range):
+        """Scarica un intervallo nel file parziale; ritorna un messaggio d'errore o None."""
+        position, end = byte_range
+        for attempt in range(1, RETRIES + 1):
+            try:
+                with self._request(position, end) as response:
+                    if response.status != 206:
+                        return f"Il server ha ignorato l'intervallo {position}-{end}."
+                    with open(self.part_path, "r+b") as part:
+                        part.seek(position)
+                        while position <= end and (chunk := response.read(CHUNK_SIZE)):
+                            part.write(chunk)
+                            position += len(chunk)
+                            self._progress(len(chunk))
+                if position > end:
+                    return None
+            except urllib.error.HTTPError as e:
+                return f"Errore HTTP {e.code} scaricando {self.url}."
+            except NETWORK_ERRORS as e:
+                self.log(f"Intervallo interrotto ({e}), ripresa {attempt}/{RETRIES}.", level="warning")
+            time.sleep(min(2**attempt, 30))
+        return f"Download dell'intervallo {byte_range[0]}-{end} non riuscito."
@@ -0,0 +1,1201 @@
+import os
+import json
+import math
+import queue
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from moduli.utils import Utils
+from moduli.logs import get_logger
+from moduli.progress import ProgressParser, SizeProjection
+from moduli import journal as jr
+from moduli.converted_index import CONVERTED_TAG
+from moduli.segmented import SegmentedEncode
+from moduli.capabilities import (
+    ENCODER_BUSY_ERRORS,
+    ENCODER_INIT_ERRORS,
+    ENCODER_UNAVAILABLE_ERRORS,
+    HWACCEL_INIT_ERRORS,
+    quality_args,
+    quality_mode,
+)
+from moduli.scheduler import JobScheduler, encoder_class
+from moduli.quality_search import QualitySearch
+from moduli.sampling import SampleEncoder
+from moduli.stream_plan import (
+    COPY_BITRATE_MAX,
+    ENCODER_CODECS,
+    OUTPUT_EXTENSION,
+    plan_streams,
+)
+from moduli.metrics import RunningStats
+from moduli.eta import ThroughputModel
+from moduli.scanner import VideoScanner, DEFAULT_EXCLUDES, parse_patterns
+
+FFMPEG_EXE = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+FFPROBE_EXE = "ffprobe.exe" if os.name == "nt" else "ffprobe"
+
+# Stati finali di un job
+FINAL_STATES = ("completato", "errore", "annullato", "saltato")
+# Preset degli encoder (anche chiave del modello di throughput per l'ETA)
+PRESET = "fast"
+
+
+def find_executable(directory, name):
+    """Cerca l'eseguibile nella cartella configurata, poi nel PATH di sistema."""
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+        return path
+    return shutil.which(name) or path
+
+
+class ConversionOptions:
+    """Impostazioni di un batch di conversione, indipendenti dall'interfaccia."""
+
+    def __init__(
+        self,
+        codec="h264_nvenc",
+        quality_mode="crf",
+        quality_value=25,
+        bitrate_max=2500,
+        save_mediainfo=False,
+        overwrite=True,
+        if_big_del=True,
+        max_jobs=2,
+        probe_jobs=4,
+        output_folder="",
+        exclude=DEFAULT_EXCLUDES,
+        max_depth=None,
+        follow_symlinks=False,
+        segment_min_duration=0,
+        segment_jobs=4,
+        segment_length=300,
+        hw_sessions=3,
+        disk_jobs=0,
+        auto_quality=False,
+        quality_metric="ssim",
+        quality_target=0.98,
+        quality_samples=3,
+        quality_sample_length=4,
+        min_savings=0,
+        stream_copy=True,
+        copy_bitrate_max=None,
+    ):
+        self.codec = codec
+        self.quality_mode = quality_mode  # "crf" o "cq"
+        self.quality_value = quality_value
+        self.bitrate_max = bitrate_max  # kbps, 0 disabilita il filtro
+        self.save_mediainfo = save_mediainfo
+        self.overwrite = overwrite
+        self.if_big_del = if_big_del
+        self.max_jobs = max_jobs
+        self.probe_jobs = probe_jobs
+        self.output_folder = output_folder
+        self.exclude = tuple(exclude)
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        # Video più lunghi di segment_min_duration secondi (0 = mai) vengono
+        # codificati a segmenti di ~segment_length secondi, segment_jobs alla volta
+        self.segment_min_duration = segment_min_duration
+        self.segment_jobs = segment_jobs
+        self.segment_length = segment_length
+        # Limiti per risorsa: sessioni per encoder hardware (0 = nessun limite)
+        # e job per disco (0 = automatico, 1 sui dischi meccanici)
+        self.hw_sessions = hw_sessions
+        self.disk_jobs = disk_jobs
+        # Ricerca automatica del CRF/CQ: obiettivo SSIM (0-1) o PSNR (dB)
+        # misurato su quality_samples campioni di quality_sample_length secondi
+        self.auto_quality = auto_quality
+        self.quality_metric = quality_metric
+        self.quality_target = quality_target
+        self.quality_samples = quality_samples
+        self.quality_sample_length = quality_sample_length
+        # Risparmio minimo previsto (%) per avviare la codifica; 0 = nessuna stima
+        self.min_savings = min_savings
+        # Copia dei flussi già conformi: video fino a copy_bitrate_max kbps
+        # (None = COPY_BITRATE_MAX entro bitrate_max, 0 = il video si ricodifica
+        # sempre), audio AAC fino a 128k
+        self.stream_copy = stream_copy
+        self.copy_bitrate_max = copy_bitrate_max
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        """Crea le opzioni da un ConfigManager; gli override None vengono ignorati."""
+        options = cls(
+            quality_value=config.getint("Settings", "crf_value", 25),
+            max_jobs=config.getint("Settings", "max_jobs", 2),
+            probe_jobs=config.getint("Settings", "probe_jobs", 4),
+            output_folder=config.get("Paths", "output_folder", ""),
+            exclude=parse_patterns(
+                config.get("Settings", "exclude_patterns", ",".join(DEFAULT_EXCLUDES))
+            ),
+            max_depth=config.getint("Settings", "max_depth"),
+            follow_symlinks=config.getboolean("Settings", "follow_symlinks"),
+            segment_min_duration=config.getint("Settings", "segment_min_duration", 0),
+            segment_jobs=config.getint("Settings", "segment_jobs", 4),
+            segment_length=config.getint("Settings", "segment_length", 300),
+            hw_sessions=config.getint("Settings", "hw_sessions", 3),
+            disk_jobs=config.getint("Settings", "disk_jobs", 0),
+            auto_quality=config.getboolean("Settings", "auto_quality"),
+            quality_metric=config.get("Settings", "quality_metric", "ssim"),
+            quality_target=float(config.get("Settings", "quality_target", "0.98")),
+            quality_samples=config.getint("Settings", "quality_samples", 3),
+            quality_sample_length=config.getint("Settings", "quality_sample_length", 4),
+            min_savings=config.getint("Settings", "min_savings", 0),
+            stream_copy=config.getboolean("Settings", "stream_copy", True),
+            copy_bitrate_max=config.getint("Settings", "copy_bitrate_max"),
+        )
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(options, name, value)
+        return options
+
+
+class ConversionJob:
+    """Stato di una singola conversione all'interno del batch."""
+
+    def __init__(self, input_path, output_path, probe=None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.probe = probe  # MediaProbe del file di input (se già analizzato)
+        self.index = None  # Posizione nella lista dei job del batch
+        self.process = None
+        self.processes = []  # Processi dei segmenti (codifica a segmenti)
+        self.encoder = None  # Encoder effettivamente usato (dopo i ripieghi)
+        self.quality_value = None  # CRF/CQ usato (fisso o trovato dalla ricerca)
+        self.error = ""  # Ultime righe d'errore di ffmpeg
+        # Encoder non inizializzati per questo file: esclusi solo da questo job
+        self.failed_encoders = set()
+        self.oversize = False  # Fermato perché l'output sarebbe più grande
+        self.replaced = False  # Output rinominato sul percorso dell'originale
+        self.copy_audio = False  # Audio già conforme: copiato senza ricodifica
+        self.status = "in coda"
+        self.duration = probe.duration if probe else None  # Durata in secondi
+        self.media_time = 0.0  # Secondi di video già codificati
+        self.progress = 0.0  # Percentuale 0-100
+        self.remaining = None  # Tempo rimanente stimato in secondi
+        self.last_progress = None  # Ultimo ProgressRecord ricevuto da ffmpeg
+        self.elapsed = 0.0
+        self.size_saved = 0
+        self.stopped = False
+        # Metriche: durata delle fasi (vedi metrics.JOB_STAGES), byte e campioni dell'encoder
+        self.timings = {}
+        self.enqueued_at = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.fps = RunningStats()
+        self.speed = RunningStats()
+
+    def stop(self):
+        """Ferma la conversione di questo job (se in corso)."""
+        self.stopped = True
+        for process in [self.process] + list(self.processes):
+            if process and process.poll() is None:
+                process.terminate()
+
+
+class ConversionEngine:
+    """
+    Motore di conversione batch senza dipendenze da Tk.
+    Lo stato (jobs, counters) viene letto dall'interfaccia o dalla CLI.
+    """
+
+    def __init__(
+        self,
+        ffmpeg_path,
+        ffprobe_path,
+        options,
+        logger,
+        probe_cache=None,
+        events=None,
+        journal=None,
+        converted_index=None,
+        capabilities=None,
+        quality_cache=None,
+        metrics=None,
+        throughput=None,
+    ):
+        self.creationflags = 0
+        self.startupinfo = None
+        if os.name == "nt":  # Solo per Windows
+            self.creationflags = subprocess.CREATE_NO_WINDOW
+            self.startupinfo = subprocess.STARTUPINFO()
+            self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.options = options
+        self.logger = logger  # Qualsiasi oggetto con log(message, level)
+        # Stderr di ffmpeg di ogni job: solo nel file di log, non nella GUI
+        self.stderr_log = get_logger("ffmpeg_stderr")
+        self.probe_cache = probe_cache
+        self.events = events  # EventBus opzionale per notificare la GUI
+        self.journal = journal  # JobJournal opzionale per riprendere il batch
+        self.converted_index = converted_index  # ConvertedIndex opzionale
+        self.capabilities = capabilities  # FFmpegCapabilities opzionale
+        self.quality_cache = quality_cache  # QualityCache opzionale
+        self.metrics = metrics  # MetricsRecorder opzionale
+        # ThroughputModel per l'ETA (senza storico su disco se non fornito)
+        self.throughput = throughput if throughput is not None else ThroughputModel()
+        self.already_converted = 0
+        self._quality_notes = set()  # Encoder con modalità di qualità già segnalata
+        self.utls = Utils(
+            ffmpeg_path=ffmpeg_path, ffprobe_path=ffprobe_path, probe_cache=probe_cache
+        )
+
+        # Stato del batch: un ConversionJob per file, protetto da jobs_lock
+        self.jobs = []
+        # Job non ancora conclusi e aggregati di quelli conclusi: l'avanzamento
+        # si calcola senza scorrere tutti i job del batch
+        self.open_jobs = {}  # indice -> job in coda o in corso
+        self.finished_jobs = []  # Job conclusi, in ordine di completamento
+        self._finished_known = 0.0  # Somma delle durate note dei job conclusi
+        self._finished_known_count = 0
+        self.jobs_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.counters = dict.fromkeys(
+            ("trovati", "analizzati", "accodati", "completati"), 0
+        )
+        self.scheduler = self._new_scheduler()
+        self.batch_start = 0
+        self.elapsed = 0
+        self.scan_seconds = 0.0
+        self.summary = ""
+        self.time_files = []
+        self.size_files = []
+
+    def _new_scheduler(self):
+        options = self.options
+        return JobScheduler(
+            options.max_jobs,
+            hw_sessions=options.hw_sessions,
+            disk_jobs=options.disk_jobs,
+            encoder_for=self.planned_encoder,
+            sessions_for=lambda job: self.segment_workers(job, self.planned_encoder(job)),
+            stop_event=self.stop_event,
+        )
+
+    def _publish(self, topic, value=None, key=None):
+        if self.events is not None:
+            self.events.publish(topic, value, key)
+
+    def _job_changed(self, job):
+        self._publish("job", job, key=job.index)
+
+    @contextmanager
+    def _timed(self, job, stage):
+        """Somma la durata del blocco alla fase stage del job."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            job.timings[stage] = job.timings.get(stage, 0.0) + perf_counter() - start
+
+    def _journal(self, path, state, **result):
+        if self.journal is not None:
+            self.journal.record(path, state, **result)
+
+    def _count(self, name):
+        with self.jobs_lock:
+            self.counters[name] += 1
+            counters = dict(self.counters)
+        self._publish("counters", counters)
+
+    def snapshot(self):
+        """Copia coerente di job e contatori, da leggere da un altro thread."""
+        with self.jobs_lock:
+            return list(self.jobs), dict(self.counters)
+
+    def finished_since(self, start):
+        """Job conclusi dalla posizione start in poi e copia dei contatori."""
+        with self.jobs_lock:
+            return self.finished_jobs[start:], dict(self.counters)
+
+    def active_jobs(self):
+        """Job non ancora conclusi (in coda o in corso), in ordine di accodamento."""
+        with self.jobs_lock:
+            return list(self.open_jobs.values())
+
+    def _finish_job(self, job):
+        """Sposta il job concluso dagli aperti agli aggregati dei conclusi."""
+        with self.jobs_lock:
+            self.open_jobs.pop(job.index, None)
+            self.finished_jobs.append(job)
+            if job.duration:
+                self._finished_known += job.duration
+                self._finished_known_count += 1
+
+    def stop(self):
+        """Ferma tutti i job del batch e impedisce l'avvio di quelli in coda."""
+        self.stop_event.set()
+        jobs, _ = self.snapshot()
+        for job in jobs:
+            if job.status not in FINAL_STATES:
+                job.stop()
+
+    def get_video_info(self, input_path, probe=None):
+        probe = probe or self.utls.probe(input_path)
+        if probe is None or probe.width is None or probe.height is None:
+            self.logger.log("Risoluzione del video non trovata.", level="warning")
+            return None, None, None
+
+        return probe.width, probe.height, probe.duration
+
+    def output_path(self, input_path):
+        file_name, _ = os.path.splitext(os.path.basename(input_path))
+        output_folder = self.options.output_folder
+        filenm = f"{file_name}.mp4" if output_folder else f"{file_name}_nw.mp4"
+        return os.path.join(output_folder or os.path.dirname(input_path), filenm)
+
+    def run_ffmpeg_command(self, command):
+        try:
+            # stderr confluisce in stdout: un solo pipe da leggere per job
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+                creationflags=self.creationflags,
+                startupinfo=self.startupinfo,
+                encoding="utf-8",
+            )
+            return process
+        except Exception as e:
+            self.logger.log(
+                f"Errore durante l'esecuzione del comando FFmpeg: {e}", level="error"
+            )
+            return None
+
+    def stderr_sink(self, job, label=None):
+        """Callback per ProgressParser: registra le righe di stderr con il nome del job."""
+        name = os.path.basename(job.input_path)
+        if label:
+            name = f"{name} ({label})"
+        stderr_log = self.stderr_log
+        return lambda line: stderr_log.info("%s: %s", name, line)
+
+    def input_args(self, encoder):
+        """Decodifica hardware adatta all'encoder (se disponibile)."""
+        if encoder == "copy":
+            return []  # Remux: nessuna decodifica
+        if self.capabilities is None:
+            return ["-hwaccel", "cuda"]
+        hwaccel = self.capabilities.hwaccel_for(encoder)
+        return ["-hwaccel", hwaccel] if hwaccel else []
+
+    def scale_filter(self, width, height):
+        return (
+            "scale=1280:720,format=yuv420p"
+            if (width > 1280 or height > 720)
+            else "scale=-1:-1,format=yuv420p"
+        )
+
+    def video_args(self, width, height, encoder=None, parallel=1, quality=None):
+        """
+        Opzioni di codifica video (filtro di scala, encoder, qualità).
+        parallel è il numero di processi che codificano lo stesso file.
+        """
+        options = self.options
+        encoder = encoder or options.codec
+        # L'opzione di qualità dipende dall'encoder (anche dopo un ripiego)
+        args = [
+            "-vf",
+            self.scale_filter(width, height),
+            "-c:v",
+            encoder,
+        ] + quality_args(encoder, quality or options.quality_value, PRESET)
+        threads = self.scheduler.threads(encoder, parallel)
+        if threads:
+            # Encoder CPU: i core vengono divisi tra i processi contemporanei
+            args += ["-threads", str(threads)]
+        return args
+
+    def output_args(self, encoder=None, quality=None, copy_audio=False):
+        """Opzioni del file finale: contenitore, tag di conversione e audio."""
+        options = self.options
+        encoder = encoder or options.codec
+        quality = quality or options.quality_value
+        return [
+            "-movflags",
+            "+faststart+use_metadata_tags",
+            # Marca l'output, così una nuova scansione non lo riconverte
+            "-metadata",
+            f"{CONVERTED_TAG}=copy"
+            if encoder == "copy"
+            else f"{CONVERTED_TAG}={encoder}:{quality_mode(encoder)}={quality}",
+        ] + (["-c:a", "copy"] if copy_audio else ["-c:a", "aac", "-b:a", "128k"])
+
+    def build_command(self, job, width, height):
+        encoder = job.encoder or self.options.codec
+        video_args = (
+            ["-c:v", "copy"]
+            if encoder == "copy"
+            else self.video_args(width, height, encoder, quality=job.quality_value)
+        )
+        return (
+            [
+                self.ffmpeg_path,
+                "-y",
+                "-hide_banner",
+                "-nostats",
+                "-loglevel",
+                "error",
+                "-progress",
+                "pipe:1",
+            ]
+            + self.input_args(encoder)
+            + ["-i", job.input_path]
+            + video_args
+            + self.output_args(encoder, job.quality_value, job.copy_audio)
+            + [job.output_path]
+        )
+
+    def encoder_chain(self, job=None):
+        """Encoder da provare per ogni job (o per job), dal preferito ai ripieghi."""
+        if self.capabilities is None:
+            return [self.options.codec]
+        chain = self.capabilities.chain(self.options.codec) or [self.options.codec]
+        if job is None:
+            return chain
+        return [encoder for encoder in chain if encoder not in job.failed_encoders]
+
+    def planned_encoder(self, job):
+        """
+        Encoder con cui partirà il job, per le risorse dello scheduler: "copy"
+        per il remux (nessuna sessione hardware), altrimenti il primo della
+        catena del job, già senza gli encoder non disponibili o falliti.
+        """
+        plan = self.stream_plan(job)
+        if plan and plan.copy_video:
+            return "copy"
+        chain = self.encoder_chain(job)
+        return chain[0] if chain else self.options.codec
+
+    def stream_plan(self, job):
+        """Flussi del job che possono essere copiati (vedi plan_streams)."""
+        if not self.options.stream_copy:
+            return None
+        encoder = self.encoder_chain()[0]
+        target_codec = ENCODER_CODECS.get(encoder, encoder)
+        if self.capabilities is not None:
+            target_codec = self.capabilities.encoders.get(encoder, target_codec)
+        return plan_streams(job.probe, target_codec, self.copy_bitrate_max())
+
+    def copy_bitrate_max(self):
+        """
+        Bitrate video massimo (kbps) per la copia: di default COPY_BITRATE_MAX,
+        ma non oltre bitrate_max, così un file giudicato da comprimere non
+        viene solo rimuxato.
+        """
+        options = self.options
+        if options.copy_bitrate_max is not None:
+            return options.copy_bitrate_max
+        if options.bitrate_max:
+            return min(COPY_BITRATE_MAX, options.bitrate_max)
+        return COPY_BITRATE_MAX
+
+    def remux_only(self, job):
+        """
+        True se un file sotto la soglia di bitrate va comunque rimuxato:
+        flussi già conformi in un contenitore diverso da MP4 (es. .ts, .mkv).
+        """
+        if os.path.splitext(job.input_path)[1].lower() == OUTPUT_EXTENSION:
+            return False
+        plan = self.stream_plan(job)
+        return bool(plan and plan.copy_video)
+
+    def _note_quality_mode(self, encoder):
+        """Segnala (una volta per encoder) se la qualità non usa la modalità scelta."""
+        requested = self.options.quality_mode
+        if quality_mode(encoder) == requested:
+            return
+        with self.jobs_lock:
+            if encoder in self._quality_notes:
+                return
+            self._quality_notes.add(encoder)
+        args = quality_args(encoder, self.options.quality_value)
+        self.logger.log(
+            f"L'encoder {encoder} non supporta la modalità {requested.upper()}: "
+            f"qualità {self.options.quality_value} applicata come {' '.join(args)}.",
+            level="warning",
+        )
+
+    def _pick_quality(self, sampler):
+        """CRF/CQ del job: quello delle impostazioni o quello trovato sui campioni."""
+        options, job = self.options, sampler.job
+        if not options.auto_quality:
+            return options.quality_value
+        search = QualitySearch(sampler, self.quality_cache)
+        result = search.search()
+        if result is None:
+            if not job.stopped:
+                self.logger.log(
+                    f"Ricerca automatica della qualità saltata per {os.path.basename(job.input_path)}: "
+                    f"{search.reason}; si usa il valore {options.quality_value}."
+                )
+            return options.quality_value
+        value, score = result
+        self.logger.log(
+            f"{quality_mode(job.encoder).upper()} scelto per {os.path.basename(job.input_path)}: {value}"
+            + (f" ({options.quality_metric.upper()} {score:.4f})" if score else "")
+        )
+        return value
+
+    def _too_big(self, sampler):
+        """
+        Stima la dimensione finale dai campioni: True se il risparmio previsto
+        è sotto min_savings e la codifica completa non vale la pena.
+        """
+        job, min_savings = sampler.job, self.options.min_savings
+        if not min_savings or not sampler.worthwhile():
+            return False
+        predicted = sampler.predict_size(job.quality_value)
+        if predicted is None:
+            return False
+        input_size = os.path.getsize(job.input_path)
+        savings = (1 - predicted / input_size) * 100 if input_size else 0
+        if savings >= min_savings:
+            return False
+        self.logger.log(
+            f"{os.path.basename(job.input_path)} è stato saltato: dimensione prevista {self.utls.format_size(predicted)} (risparmio {savings:.0f}% < {min_savings}%)."
+        )
+        return True
+
+    def size_projection(self, job):
+        """SizeProjection del job, se va fermato quando diventa più grande."""
+        if not self.options.if_big_del:
+            return None
+        try:
+            input_size = os.path.getsize(job.input_path)
+        except OSError:
+            return None
+        return SizeProjection(input_size, job.duration)
+
+    def _stop_oversize(self, job, projection):
+        """Ferma la codifica: l'output previsto supera l'originale."""
+        job.oversize = True
+        self.logger.log(
+            f"{os.path.basename(job.input_path)} è stato saltato: dimensione proiettata {self.utls.format_size(projection.projected)} maggiore dell'originale ({self.utls.format_size(projection.input_size)})."
+        )
+
+    def _init_failure(self, job):
+        """
+        Se ffmpeg è fallito all'avvio dell'encoder o dell'hwaccel, lo registra
+        nelle capacità e ritorna True (il job va ripetuto con un ripiego).
+        """
+        if self.capabilities is None or not job.error:
+            return False
+        hwaccel = self.capabilities.hwaccel_for(job.encoder)
+        if hwaccel and HWACCEL_INIT_ERRORS.search(job.error):
+            self.capabilities.mark_failed(f"hwaccel:{hwaccel}")
+            self.logger.log(
+                f"Decodifica hardware {hwaccel} non disponibile: si userà la CPU.",
+                level="warning",
+            )
+            return True
+        if ENCODER_UNAVAILABLE_ERRORS.search(job.error):
+            self.capabilities.mark_failed(job.encoder)
+            self.logger.log(
+                f"Encoder {job.encoder} non disponibile: si prova il successivo.",
+                level="warning",
+            )
+            return True
+        if ENCODER_INIT_ERRORS.search(job.error):
+            # Errore del file o limite di sessioni: nella cache solo se
+            # l'encoder non supera più nemmeno la codifica di prova
+            if not ENCODER_BUSY_ERRORS.search(
+                job.error
+            ) and not self.capabilities.verify(job.encoder):
+                self.logger.log(
+                    f"Encoder {job.encoder} non più funzionante: si prova il successivo.",
+                    level="warning",
+                )
+            else:
+                job.failed_encoders.add(job.encoder)
+                self.logger.log(
+                    f"Encoder {job.encoder} non inizializzato per {os.path.basename(job.input_path)}: si prova il successivo solo per questo file.",
+                    level="warning",
+                )
+            return True
+        return False
+
+    def use_segments(self, duration):
+        """True se il video è abbastanza lungo per la codifica a segmenti."""
+        options = self.options
+        return (
+            options.segment_min_duration > 0
+            and options.segment_jobs > 1
+            and duration >= max(options.segment_min_duration, options.segment_length * 2)
+        )
+
+    def segment_workers(self, job, encoder=None):
+        """
+        Processi ffmpeg contemporanei del job: 1, oppure per la codifica a
+        segmenti min(segment_jobs, segmenti), entro le sessioni hardware.
+        """
+        options = self.options
+        if not job.duration or not self.use_segments(job.duration):
+            return 1
+        segments = math.ceil(job.duration / max(1, options.segment_length))
+        workers = max(1, min(options.segment_jobs, segments))
+        if encoder_class(encoder or job.encoder) != "cpu" and options.hw_sessions:
+            workers = min(workers, options.hw_sessions)
+        return workers
+
+    def convert_video(self, job):
+        input_path, output_path = job.input_path, job.output_path
+        job.probe = job.probe or self.utls.probe(input_path)
+        width, height, duration = self.get_video_info(input_path, job.probe)
+        if duration is None or width is None or height is None:
+            self.logger.log(
+                f"Impossibile ottenere informazioni video per {input_path}.",
+                level="error",
+            )
+            job.status = "errore"
+            return
+        job.duration = duration
+
+        mediainfo_before = (
+            self.utls.get_mediainfo(input_path, job.probe)
+            if self.options.save_mediainfo
+            else {}
+        )
+
+        initial_size = os.path.getsize(input_path)
+        job.bytes_in = initial_size
+
+        if job.stopped:
+            return
+        job.status = "in corso"
+        self._job_changed(job)
+        try:
+            encoded = False
+            plan = self.stream_plan(job)
+            job.copy_audio = bool(plan and plan.copy_audio)
+            if plan and plan.copy_video:
+                # Flussi già conformi: basta rimuxare in MP4 con faststart
+                self.logger.log(
+                    f"{os.path.basename(input_path)}: flussi già conformi, remux senza ricodifica"
+                )
+                job.encoder = "copy"
+                with self._timed(job, "encode"):
+                    encoded = self._encode_single(job, width, height)
+                if not (encoded or job.stopped or job.oversize):
+                    # Remux fallito: si ricodifica, anche l'audio
+                    self.logger.log(
+                        f"{os.path.basename(input_path)}: remux non riuscito, il video verrà ricodificato.",
+                        level="warning",
+                    )
+                    job.copy_audio = False
+            chain = (
+                []
+                if encoded or job.stopped or job.oversize
+                else self.encoder_chain(job)
+            )
+            # L'hwaccel può cadere senza cambiare encoder: un tentativo in più
+            attempts = len(chain) + 1 if chain else 0
+            for _ in range(attempts):
+                job.encoder = chain[0]
+                job.error = ""
+                self._note_quality_mode(job.encoder)
+                sampler = SampleEncoder(self, job, width, height)
+                try:
+                    with self._timed(job, "sample"):
+                        job.quality_value = self._pick_quality(sampler)
+                        too_big = not job.error and self._too_big(sampler)
+                finally:
+                    sampler.close()
+                if job.stopped:
+                    break
+                if too_big:
+                    job.status = "saltato"
+                    return
+                if job.error and self._init_failure(job):
+                    # L'encoder è fallito già sui campioni
+                    chain = self.encoder_chain(job)
+                    if not chain:
+                        break
+                    continue
+                job.error = ""
+                with self._timed(job, "encode"):
+                    if self.use_segments(duration):
+                        encoded = SegmentedEncode(self, job, width, height).run()
+                    else:
+                        encoded = self._encode_single(job, width, height)
+                if encoded or job.stopped or not self._init_failure(job):
+                    break
+                chain = self.encoder_chain(job)
+                if not chain:
+                    break
+            if job.stopped:
+                return
+            if job.oversize:
+                job.status = "saltato"
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                return
+            if not encoded:
+                job.status = "errore"
+                return
+
+            job.bytes_out = os.path.getsize(output_path)
+            job.size_saved = initial_size - job.bytes_out
+
+            # Azioni post-processo
+            self._post_process_conversion(job, mediainfo_before)
+            # Registra il file prodotto (accanto o rinominato sull'originale);
+            # se l'output più grande è stato eliminato l'originale non è convertito
+            if os.path.exists(output_path):
+                self._mark_converted(output_path)
+            elif job.replaced:
+                self._mark_converted(input_path)
+            job.progress = 100
+            job.remaining = 0
+            job.status = "completato"
+
+        except Exception as e:
+            job.status = "errore"
+            self.logger.log(
+                f"Errore durante la conversione di {input_path}: {str(e)}",
+                level="error",
+            )
+        finally:
+            for process in [job.process] + job.processes:
+                if process and process.poll() is None:  # Processo ancora attivo
+                    process.terminate()  # Tenta di chiuderlo in modo pulito
+                    try:
+                        process.wait(timeout=5)  # Attendi la chiusura
+                    except subprocess.TimeoutExpired:
+                        process.kill()  # Forza la chiusura
+                    self.logger.log("Processo FFmpeg terminato.")
+
+    def _encode_single(self, job, width, height):
+        """Codifica con un solo processo ffmpeg; ritorna True se riuscita."""
+        input_path, duration = job.input_path, job.duration
+        process = self.run_ffmpeg_command(self.build_command(job, width, height))
+        if process is None:
+            return False
+        job.process = process
+        # Stop richiesto mentre il processo veniva avviato
+        if job.stopped:
+            process.terminate()
+
+        self.logger.log(f"Conversione di {os.path.basename(input_path)} avviata")
+
+        parser = ProgressParser(sink=self.stderr_sink(job))
+        projection = self.size_projection(job)
+        for line in process.stdout:
+            record = parser.feed(line)
+            if record is None or record.out_time is None:
+                continue
+            job.last_progress = record
+            job.fps.add(record.fps)
+            job.speed.add(record.speed)
+            if projection and projection.update(record.out_time, record.total_size):
+                self._stop_oversize(job, projection)
+                process.terminate()
+                break
+            current_time = record.out_time
+            job.media_time = min(current_time, duration)
+            job.progress = min((current_time / duration) * 100, 100) if duration else 0
+            job.remaining = max(duration - current_time, 0)
+            if record.speed:
+                job.remaining = job.remaining / record.speed
+            self._job_changed(job)
+
+        process.wait()
+
+        if job.oversize:
+            return False
+        if process.returncode != 0 and not job.stopped:
+            job.error = parser.error_report()
+            self.logger.log(
+                f"FFmpeg ha restituito il codice {process.returncode} per {input_path}:\n{parser.error_report()}",
+                level="error",
+            )
+        return process.returncode == 0
+
+    def _post_process_conversion(self, job, mediainfo_before):
+        with self._timed(job, "post_process"):
+            self._check_output(job, mediainfo_before)
+        if self.options.overwrite and os.path.exists(job.output_path):
+            with self._timed(job, "trash"):
+                self._trash_original(job.input_path)
+            with self._timed(job, "rename"):
+                self._replace_original(job)
+
+    def _check_output(self, job, mediainfo_before):
+        """Rapporto MediaInfo ed eliminazione dell'output se più grande."""
+        input_path, output_path = job.input_path, job.output_path
+        if self.options.save_mediainfo:
+            mediainfo_after = self.utls.get_mediainfo(output_path)
+            # Save both mediainfo data to a JSON file
+            report = {
+                "input_file": input_path,
+                "output_file": output_path,
+                "mediainfo_before": mediainfo_before,
+                "mediainfo_after": mediainfo_after,
+            }
+            json_report_path = os.path.splitext(output_path)[0] + "_mediainfo.json"
+            with open(json_report_path, "w") as json_file:
+                json.dump(report, json_file, indent=4)
+
+            # Log the completion message with JSON report path
+            self.logger.log(f"Rapporto mediainfo salvato in: {json_report_path}")
+
+        if self.options.if_big_del:
+            try:
+                # Confronta le dimensioni e rimuovi il file più grande
+                if os.path.getsize(output_path) >= os.path.getsize(input_path):
+                    os.remove(output_path)
+                    job.size_saved = 0
+                    self.logger.log(
+                        f"Il file '{output_path}' è stato eliminato perché è più grande."
+                    )
+            except FileNotFoundError as e:
+                self.logger.log(f"Errore: {e}", level="error")
+            except Exception as e:
+                self.logger.log(f"Si è verificato un errore: {e}", level="error")
+
+    def _trash_original(self, input_path):
+        # Import ritardato: serve solo con la sovrascrittura dell'originale
+        from send2trash import send2trash
+
+        try:
+            send2trash(os.path.normpath(input_path))
+            self.logger.log("Il file originale è stato spostato nel cestino.")
+        except FileNotFoundError:
+            self.logger.log(f"Il file '{input_path}' non esiste.", level="error")
+        except Exception as e:
+            self.logger.log(
+                f"Errore durante lo spostamento del file nel cestino: {e}",
+                level="error",
+            )
+
+    def _replace_original(self, job):
+        """Rinomina l'output sul percorso dell'originale (già nel cestino)."""
+        input_path, output_path = job.input_path, job.output_path
+        try:
+            os.rename(output_path, input_path)
+            job.replaced = True
+            if self.probe_cache is not None:
+                self.probe_cache.invalidate(input_path)
+        except FileNotFoundError:
+            self.logger.log(f"Il file '{output_path}' non esiste.", level="error")
+        except PermissionError:
+            self.logger.log(
+                "Permessi insufficienti per rinominare il file.", level="error"
+            )
+        except Exception as e:
+            self.logger.log(
+                f"Errore durante la rinomina del file: {e}", level="error"
+            )
+
+    def _mark_converted(self, path):
+        if self.converted_index is not None and os.path.exists(path):
+            self.converted_index.add(path)
+
+    def run(self, input_folder, resume=False):
+        """
+        Esegue il batch su input_folder e ritorna quando tutti i job sono finiti.
+        Con resume=True (e un journal) salta i file già conclusi in precedenza.
+        """
+        options = self.options
+        self.stop_event.clear()
+        self.already_converted = 0
+        self._quality_notes = set()
+        self.scheduler = self._new_scheduler()
+        if self.capabilities is not None:
+            # Rilevamento (o lettura dalla cache) prima di avviare qualsiasi job
+            chain = self.capabilities.load().chain(options.codec)
+            if chain and chain[0] != options.codec:
+                self.logger.log(
+                    f"Encoder {options.codec} non disponibile: verrà usato {chain[0]}.",
+                    level="warning",
+                )
+        with self.jobs_lock:
+            self.jobs = []
+            self.open_jobs = {}
+            self.finished_jobs = []
+            self._finished_known = 0.0
+            self._finished_known_count = 0
+            self.time_files = []
+            self.size_files = []
+            self.counters = dict.fromkeys(self.counters, 0)
+        self.batch_start = perf_counter()
+        self.scan_seconds = 0.0
+        if self.metrics is not None:
+            self.metrics.begin(input_folder)
+
+        if self.journal is not None and self.journal.begin(input_folder, resume):
+            _, saved = self.journal.recover(self.logger)
+            self.size_files.append(saved)
+            states = [entry["state"] for entry in self.journal.entries.values()]
+            concluded = sum(1 for state in states if state in jr.RESUME_SKIP_STATES)
+            self.logger.log(
+                f"Ripresa del batch: {concluded} file già conclusi verranno saltati, "
+                f"{states.count(jr.FAILED)} file falliti verranno ritentati."
+            )
+
+        scanner = VideoScanner(
+            exclude=options.exclude,
+            max_depth=options.max_depth,
+            follow_symlinks=options.follow_symlinks,
+            on_error=lambda e: self.logger.log(
+                f"Impossibile leggere {e.filename}: {e.strerror}", level="warning"
+            ),
+        )
+        file_paths = self._timed_scan(scanner.scan(input_folder))
+
+        # Pipeline: scansione -> pool di probe -> coda limitata -> scheduler -> encoder.
+        # La coda limitata (e il semaforo sui probe in volo) frena la scansione
+        # quando gli encoder sono indietro, mantenendo la memoria costante.
+        # Lo scheduler sceglie tra i job in attesa quelli con risorse libere.
+        max_workers = max(1, options.max_jobs)
+        probe_workers = max(1, options.probe_jobs)
+        job_queue = queue.Queue(maxsize=max_workers * 2)
+        probe_slots = threading.BoundedSemaphore(probe_workers * 4)
+
+        encoders = [
+            threading.Thread(target=self._encoder_worker, args=(job_queue,), daemon=True)
+            for _ in range(max_workers)
+        ]
+        for encoder in encoders:
+            encoder.start()
+
+        with ThreadPoolExecutor(max_workers=probe_workers) as probers:
+            for input_path in file_paths:
+                if self.stop_event.is_set():
+                    break
+                if self.journal is not None and self.journal.should_skip(input_path):
+                    continue
+                self._count("trovati")
+                probe_slots.acquire()
+                future = probers.submit(self._probe_and_enqueue, input_path, job_queue)
+                future.add_done_callback(lambda _: probe_slots.release())
+
+        for _ in encoders:
+            job_queue.put(None)  # Segnala la fine della coda a ogni encoder
+        for encoder in encoders:
+            encoder.join()
+
+        if self.probe_cache is not None:
+            self.probe_cache.flush()
+        if self.journal is not None:
+            self.journal.close()
+        self.throughput.save()
+        if not self.counters["trovati"]:
+            self.logger.log("Nessun file video trovato.")
+        if self.already_converted:
+            self.logger.log(
+                f"{self.already_converted} file già convertiti in precedenza sono stati saltati."
+            )
+        self.elapsed = perf_counter() - self.batch_start
+        if self.metrics is not None:
+            self.metrics.record_batch(
+                self.elapsed,
+                self.scan_seconds,
+                dict(self.counters),
+                stopped=self.stop_event.is_set(),
+            )
+        space_reduction = sum(self.size_files)
+        self.summary = (
+            f"Conversione batch completata in {self.utls.convert_seconds(self.elapsed)} - Spazio Recuperato: {self.utls.format_size(space_reduction)}"
+            if not self.stop_event.is_set()
+            else "Conversione batch interrotta."
+        )
+        self._publish("batch", self.summary)
+        return self.summary
+
+    def _timed_scan(self, paths):
+        """Generatore che somma in scan_seconds il tempo speso nella scansione."""
+        iterator = iter(paths)
+        while True:
+            start = perf_counter()
+            path = next(iterator, None)
+            self.scan_seconds += perf_counter() - start
+            if path is None:
+                return
+            yield path
+
+    def _probe_and_enqueue(self, input_path, job_queue):
+        """Analizza un file e, se supera la soglia di bitrate, lo accoda agli encoder."""
+        if self.stop_event.is_set():
+            return
+        # Output di una conversione precedente: saltato senza probe
+        if self.converted_index is not None and self.converted_index.is_converted(
+            input_path
+        ):
+            with self.jobs_lock:
+                self.already_converted += 1
+            return
+        bitrate_max = self.options.bitrate_max
+        # Il probe viene conservato nel job e riusato da convert_video
+        probe_start = perf_counter()
+        probe = self.utls.probe(input_path)
+        probe_seconds = perf_counter() - probe_start
+        bitrate = self.utls.get_bitrate(input_path, probe) if probe else None
+        self._count("analizzati")
+        if probe and CONVERTED_TAG in probe.tags:
+            # Marcato nei metadati ma assente dall'indice (es. indice nuovo)
+            self._mark_converted(input_path)
+            with self.jobs_lock:
+                self.already_converted += 1
+            return
+        job = ConversionJob(input_path, self.output_path(input_path), probe)
+        if bitrate_max and bitrate and bitrate < bitrate_max:
+            if not self.remux_only(job):
+                self.logger.log(
+                    f"{os.path.basename(input_path)} è stato saltato perché ha un bitrate minore della soglia ({bitrate})/({bitrate_max})."
+                )
+                self._journal(input_path, jr.SKIPPED, bitrate=bitrate)
+                return
+            # Già efficiente ma in un altro contenitore: solo remux in MP4
+
+        job.timings["probe"] = probe_seconds
+        self._journal(input_path, jr.QUEUED, output=job.output_path)
+        with self.jobs_lock:
+            job.index = len(self.jobs)
+            self.jobs.append(job)
+            self.open_jobs[job.index] = job
+        self._count("accodati")
+        self._job_changed(job)
+        job.enqueued_at = perf_counter()
+        job_queue.put(job)  # Blocca se gli encoder sono indietro
+
+    def _encoder_worker(self, job_queue):
+        """Esegue i job assegnati dallo scheduler finché la coda non è finita."""
+        while True:
+            job = self.scheduler.take(job_queue)
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            finally:
+                self.scheduler.release(job)
+            self._finish_job(job)
+            self._job_changed(job)
+            self._count("completati")
+            if self.metrics is not None:
+                self.metrics.record_job(job)
+
+    def _run_job(self, job):
+        """Esegue un singolo job nel pool di conversione."""
+        if job.enqueued_at is not None:
+            job.timings["queue_wait"] = perf_counter() - job.enqueued_at
+        if self.stop_event.is_set() or job.stopped:
+            job.status = "annullato"
+            return
+
+        self._journal(
+            job.input_path,
+            jr.RUNNING,
+            output=job.output_path,
+            overwrite=self.options.overwrite,
+        )
+        start_time = perf_counter()
+        self.convert_video(job)  # Esegui la conversione del video
+        job.elapsed = perf_counter() - start_time
+
+        with self.jobs_lock:
+            self.time_files.append(job.elapsed)
+            if job.status == "completato":
+                self.size_files.append(job.size_saved)
+
+        if job.stopped:
+            job.status = "annullato"
+            if os.path.exists(job.output_path):
+                os.remove(job.output_path)
+            self._journal(job.input_path, jr.STOPPED, output=job.output_path)
+            self.logger.log(
+                f"Conversione di {os.path.basename(job.input_path)} interrotta."
+            )
+        elif job.status == "completato":
+            # Solo la fase di codifica: campioni e post-processo non dipendono
+            # dal throughput dell'encoder
+            self.throughput.observe(
+                self.throughput_key(job), job.duration, job.timings.get("encode")
+            )
+            self._journal(
+                job.input_path,
+                jr.DONE,
+                output=job.output_path,
+                elapsed=round(job.elapsed, 3),
+                size_saved=job.size_saved,
+            )
+            self.logger.log(
+                f"Conversione di {os.path.basename(job.input_path)} completata in {self.utls.convert_seconds(job.elapsed)}"
+            )
+        elif job.status == "saltato":
+            self._journal(job.input_path, jr.SKIPPED, output=job.output_path)
+        else:
+            self._journal(job.input_path, jr.FAILED, output=job.output_path)
+
+    def throughput_key(self, job, default_encoder=None):
+        """
+        Chiave del ThroughputModel: encoder, preset, risoluzione della sorgente
+        e codifica a segmenti (più processi sullo stesso file).
+        """
+        encoder = job.encoder or default_encoder or self.encoder_chain()[0]
+        # Il remux non passa mai dalla codifica a segmenti
+        segmented = (
+            encoder != "copy" and bool(job.duration) and self.use_segments(job.duration)
+        )
+        return ThroughputModel.key(
+            encoder, PRESET, job.probe.height if job.probe else None, segmented
+        )
+
+    def batch_progress(self):
+        """
+        Ritorna (percentuale, ETA) del batch pesando ogni job per la sua durata.
+        L'ETA applica alla durata di ogni job non concluso il throughput storico
+        del suo encoder/risoluzione; i job in corso usano la velocità misurata.
+        I job conclusi contano tramite gli aggregati: si scorrono solo gli aperti.
+        """
+        with self.jobs_lock:
+            jobs = list(self.open_jobs.values())
+            finished = len(self.finished_jobs)
+            finished_known = self._finished_known
+            finished_known_count = self._finished_known_count
+        open_known = [job.duration for job in jobs if job.duration]
+        known_count = finished_known_count + len(open_known)
+        # Per i job senza durata si usa la durata media di quelli noti
+        avg_duration = (
+            (finished_known + sum(open_known)) / known_count if known_count else 1.0
+        )
+        done = finished_known + (finished - finished_known_count) * avg_duration
+        total = done
+        running, queued = [], []
+        # I job non ancora avviati useranno il primo encoder della catena
+        encoder = self.encoder_chain()[0]
+        for job in jobs:
+            weight = job.duration or avg_duration
+            total += weight
+            if job.status in FINAL_STATES:
+                # Concluso ma non ancora spostato negli aggregati
+                done += weight
+                continue
+            done += weight * job.progress / 100
+            left = weight * (1 - job.progress / 100)
+            if job.status == "in corso":
+                running.append(
+                    job.remaining
+                    if job.remaining is not None
+                    else left / self.throughput.rate(self.throughput_key(job, encoder))
+                )
+            else:
+                queued.append((left, self.throughput_key(job, encoder)))
+        if not total:
+            return 0.0, 0.0
+        # Con job in attesa e meno job attivi del massimo, sono i limiti dello
+        # scheduler (sessioni hardware, dischi) a fissare il parallelismo
+        slots = self.options.max_jobs
+        if running and queued:
+            slots = min(slots, len(running))
+        eta = self.throughput.estimate(running, queued, slots)
+        return done / total * 100, eta
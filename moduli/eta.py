@@ -0,0 +1,114 @@
+import os
+import json
+import heapq
+import threading
+
+# Peso di una nuova osservazione nella media mobile esponenziale
+EWMA_ALPHA = 0.3
+# Secondi di video per secondo di orologio usati senza alcuno storico
+DEFAULT_THROUGHPUT = 1.0
+# Classi di risoluzione della sorgente: (altezza minima, nome)
+RESOLUTION_CLASSES = ((1800, "2160p"), (1260, "1440p"), (900, "1080p"), (600, "720p"))
+
+
+def resolution_class(height):
+    if not height:
+        return "?"
+    for minimum, name in RESOLUTION_CLASSES:
+        if height >= minimum:
+            return name
+    return "sd"
+
+
+class ThroughputModel:
+    """
+    Throughput storico (secondi di video codificati per secondo di orologio)
+    per encoder, preset e risoluzione della sorgente (a parte la codifica a
+    segmenti, più veloce), salvato su disco tra un avvio e l'altro. Con la durata nota di ogni job in coda permette un ETA
+    che non dipende da quanto erano lunghi i file già convertiti.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rates = {}  # chiave -> {"rate": secondi/secondo, "samples": n}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def key(encoder, preset, height, segmented=False):
+        key = f"{encoder}|{preset}|{resolution_class(height)}"
+        return key + "|seg" if segmented else key
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as model_file:
+                rates = json.load(model_file).get("rates", {})
+        except (OSError, ValueError, AttributeError):
+            return
+        with self._lock:
+            self.rates = {
+                key: entry
+                for key, entry in rates.items()
+                if isinstance(entry, dict) and entry.get("rate", 0) > 0
+            }
+
+    def save(self):
+        """Scrive il modello se è cambiato (file temporaneo + rename)."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = {"rates": self.rates}
+            self._dirty = False
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as model_file:
+                json.dump(data, model_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def observe(self, key, media_seconds, wall_seconds):
+        """Aggiorna il throughput di key con un job completato."""
+        if not media_seconds or not wall_seconds or wall_seconds <= 0:
+            return
+        rate = media_seconds / wall_seconds
+        with self._lock:
+            entry = self.rates.get(key)
+            if entry is None:
+                self.rates[key] = {"rate": rate, "samples": 1}
+            else:
+                entry["rate"] += EWMA_ALPHA * (rate - entry["rate"])
+                entry["samples"] += 1
+            self._dirty = True
+
+    def rate(self, key):
+        """Throughput per key; senza storico quello dello stesso encoder, poi la media."""
+        with self._lock:
+            entry = self.rates.get(key)
+            if entry is not None:
+                return entry["rate"]
+            encoder = key.split("|", 1)[0]
+            same_encoder = [
+                e["rate"] for k, e in self.rates.items() if k.split("|", 1)[0] == encoder
+            ]
+            rates = same_encoder or [e["rate"] for e in self.rates.values()]
+        return sum(rates) / len(rates) if rates else DEFAULT_THROUGHPUT
+
+    def estimate(self, running, queued, slots):
+        """
+        Secondi alla fine del batch. running sono i secondi rimanenti dei job
+        in corso, queued le coppie (secondi di video, chiave) dei job in coda,
+        assegnati nell'ordine al primo dei slots encoder che si libera.
+        """
+        finish = sorted(running)[-max(1, slots):]
+        finish += [0.0] * (max(1, slots) - len(finish))
+        heapq.heapify(finish)
+        rates = {}
+        for media_seconds, key in queued:
+            if key not in rates:
+                rates[key] = self.rate(key)
+            heapq.heapreplace(finish, finish[0] + media_seconds / rates[key])
+        return max(finish)
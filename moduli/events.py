@@ -0,0 +1,30 @@
+import queue
+
+
+class EventBus:
+    """
+    Canale thread-safe tra i thread di lavoro e la GUI.
+    I thread pubblicano eventi; la GUI li preleva a intervalli regolari con
+    drain(). Gli eventi con lo stesso (topic, key) vengono fusi e resta solo
+    l'ultimo valore. Le righe di log non passano di qui: le raccoglie
+    RingBufferHandler (moduli.logs).
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def publish(self, topic, value=None, key=None):
+        self._queue.put((topic, key, value))
+
+    def drain(self, max_events=None):
+        """Ritorna l'ultimo valore per ogni (topic, key) arrivato dall'ultimo drain."""
+        latest = {}
+        count = 0
+        while max_events is None or count < max_events:
+            try:
+                topic, key, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            latest[(topic, key)] = value
+        return latest
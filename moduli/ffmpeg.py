@@ -1,28 +1,64 @@
 import os
+import logging
 import urllib.request
 import zipfile
-import tempfile
+import tarfile
 import shutil
 import platform
-import time
-import tkinter as tk
 import subprocess
-from bs4 import BeautifulSoup
-from moduli.utils import Logger
+from moduli.logs import LogAdapter
+from moduli.download import ArchiveDownload, DownloadError, default_cache_dir
+
+# Build statiche ufficiali per Linux, per architettura (platform.machine())
+LINUX_ARCHES = {
+    "x86_64": "amd64",
+    "amd64": "amd64",
+    "aarch64": "arm64",
+    "arm64": "arm64",
+    "i686": "i686",
+    "i386": "i686",
+    "armv7l": "armhf",
+}
+
+
+def default_build_url():
+    """Archivio con ffmpeg/ffprobe per questo sistema, o None se non disponibile."""
+    system = platform.system()
+    if system == "Windows":
+        return "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+    arch = LINUX_ARCHES.get(platform.machine().lower())
+    if system == "Linux" and arch:
+        return f"https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-{arch}-static.tar.xz"
+    return None
 
 
 class FFmpegDownloader:
-    def __init__(self, target_dir="ffmpeg_files", text_area=False, progress = False):
+    def __init__(self, target_dir="ffmpeg_files", logger=None, on_progress=None,
+                 ffmpeg_url=None, checksum_url=None, cache_dir=None, connections=1):
         """Inizializza l'istanza del downloader con la cartella di destinazione."""
         self.target_dir = target_dir  # La cartella target ora è "ffmpeg_files"
-        self.ffmpeg_url = (
-            "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
-        )
-        self.zip_filename = "ffmpeg-release-essentials.zip"
-        self.ffmpeg_exe = "ffmpeg.exe"
-        self.ffprobe_exe = "ffprobe.exe"
-        self.text_area = text_area
-        self.progress_bar = progress
+        self.ffmpeg_url = ffmpeg_url or default_build_url()
+        # gyan.dev pubblica lo SHA-256 di ogni archivio, johnvansickle.com l'MD5
+        if checksum_url is None and self.ffmpeg_url:
+            checksum_url = self.ffmpeg_url + (
+                ".md5" if self.ffmpeg_url.endswith(".tar.xz") else ".sha256"
+            )
+        self.checksum_url = checksum_url
+        self.zip_filename = os.path.basename((self.ffmpeg_url or "").split("?", 1)[0])
+        # Archivi verificati, riusati da reinstallazioni e aggiornamenti
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.connections = connections  # Intervalli scaricati in parallelo
+        self.ffmpeg_exe = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+        self.ffprobe_exe = "ffprobe.exe" if os.name == "nt" else "ffprobe"
+        # Il download gira in un thread: niente widget Tk, solo logging (un
+        # oggetto con log(message, level) come LogAdapter, o un logging.Logger)
+        # e una callback di avanzamento
+        if logger is None:
+            logger = LogAdapter("ffmpeg")
+        elif isinstance(logger, logging.Logger):
+            logger = LogAdapter(logger)
+        self.logger = logger
+        self.on_progress = on_progress
         # Crea la cartella ffmpeg_files se non esiste
         if not os.path.exists(self.target_dir):
             os.makedirs(self.target_dir)
@@ -34,127 +70,131 @@ class FFmpegDownloader:
         return os.path.exists(ffmpeg_path) and os.path.exists(ffprobe_path)
 
     def _download_zip(self) -> str:
-        """Scarica il file ZIP contenente ffmpeg nella cartella temporanea."""
+        """Scarica (o prende dalla cache) l'archivio verificato contenente ffmpeg."""
+        self.log_message(f"Scaricando {self.zip_filename} da {self.ffmpeg_url}...")
+        download = ArchiveDownload(
+            self.ffmpeg_url,
+            self.cache_dir,
+            filename=self.zip_filename,
+            checksum_url=self.checksum_url,
+            connections=self.connections,
+            on_progress=self.progress2,
+            log=self.log_message,
+        )
         try:
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_filepath = temp_file.name
-            self.log_message(f"Scaricando {self.zip_filename} da {self.ffmpeg_url}...")
-            start_time = time.time()
-            urllib.request.urlretrieve(self.ffmpeg_url, temp_filepath)
-            try:
-                with urllib.request.urlopen(self.ffmpeg_url, timeout=5) as response:
-                    total_size = int(response.headers.get('Content-Length', 0))
-                    downloaded = 0
-
-                    with open(temp_filepath, 'wb') as file:
-                        while chunk := response.read(1048576):
-                            downloaded += len(chunk)
-                            file.write(chunk)
-                            percent = (downloaded / total_size) * 100
-                            self.progress2(percent)
-                            #self.log_message(f"Download: {percent:.2f}%")
-            except Exception as e:
-                self.log_message(f"Errore durante il download: {str(e)}", level='error')
-            self.log_message(f"Download completato in {time.time() - start_time:.2f} secondi.")
-            return temp_filepath
-        except Exception as e:
+            return download.fetch()
+        except (DownloadError, OSError) as e:
             self.log_message(f"Errore durante il download: {e}", level='error')
             return ""
 
-    def _extract_zip(self, zip_path: str) -> str:
-        """Estrai il contenuto del file ZIP in una cartella temporanea."""
-        try:
-            temp_dir = tempfile.mkdtemp()
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(temp_dir)
-            return temp_dir
-        except Exception as e:
-            self.log_message(f"Errore durante l'estrazione: {e}", level='error')
-            return ""
+    def _wanted(self, name):
+        """Nome dell'eseguibile cercato se name è ffmpeg o ffprobe nell'archivio."""
+        base = name.replace("\\", "/").rsplit("/", 1)[-1]
+        return base if base in (self.ffmpeg_exe, self.ffprobe_exe) else None
 
-    def _move_files(self, temp_dir: str) -> bool:
-        """Cerca e sposta i file ffmpeg.exe e ffprobe.exe nella cartella di destinazione."""
-        files_to_move = [self.ffmpeg_exe, self.ffprobe_exe]
-        moved = (
-            True  # Flag che indica se tutti i file sono stati spostati correttamente
-        )
+    def _install_member(self, source, name):
+        """Copia un membro dell'archivio in target_dir con un rename atomico."""
+        dest = os.path.join(self.target_dir, name)
+        temp_path = dest + ".part"
+        try:
+            with open(temp_path, "wb") as temp_file:
+                shutil.copyfileobj(source, temp_file, 1048576)
+            if os.name != "nt":
+                os.chmod(temp_path, 0o755)
+            os.replace(temp_path, dest)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.log_message(f"Estratto {name} in {self.target_dir}")
 
-        for file_name in files_to_move:
-            file_found = False
-            for root, dirs, files in os.walk(temp_dir):
-                if file_name in files:
-                    src = os.path.join(root, file_name)
-                    dest = os.path.join(self.target_dir, file_name)
-                    shutil.move(src, dest)
-                    self.log_message(f"Spostato {file_name} in {self.target_dir}")
-                    file_found = True
-                    break  # Uscire dal ciclo appena trovato il file
-            if not file_found:
-                self.log_message(f"Errore: {file_name} non trovato.", level='error')
-                moved = False  # Se almeno uno dei file non è stato trovato, setta il flag a False
-
-        return moved
+    def _extract(self, archive_path: str) -> bool:
+        """
+        Estrae dall'archivio (.zip o .tar.xz) solo ffmpeg e ffprobe, senza
+        decomprimere il resto: lo ZIP si legge dall'indice, il tar.xz in un
+        solo passaggio fermandosi appena trovati entrambi.
+        """
+        wanted = {self.ffmpeg_exe, self.ffprobe_exe}
+        found = set()
+        try:
+            if zipfile.is_zipfile(archive_path):
+                with zipfile.ZipFile(archive_path, "r") as zip_ref:
+                    for member in zip_ref.infolist():
+                        name = self._wanted(member.filename)
+                        if name and name not in found and not member.is_dir():
+                            with zip_ref.open(member) as source:
+                                self._install_member(source, name)
+                            found.add(name)
+            else:
+                with tarfile.open(archive_path, "r|*") as tar_ref:
+                    for member in tar_ref:
+                        name = self._wanted(member.name)
+                        if name and name not in found and member.isfile():
+                            with tar_ref.extractfile(member) as source:
+                                self._install_member(source, name)
+                            found.add(name)
+                            if found == wanted:
+                                break
+        except (OSError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            self.log_message(f"Errore durante l'estrazione: {e}", level='error')
+            return False
+        for name in sorted(wanted - found):
+            self.log_message(f"Errore: {name} non trovato.", level='error')
+        return found == wanted
 
     def download_ffmpeg(self):
         """Funzione principale per scaricare e installare FFmpeg."""
-        if platform.system() != "Windows":
-            self.log_message("Questo script è compatibile solo con Windows.", level='warning')
+        if not self.ffmpeg_url:
+            self.log_message(
+                f"Nessuna build di FFmpeg disponibile per {platform.system()} {platform.machine()}.",
+                level='warning',
+            )
             return False
 
         # Controlla se i file sono già presenti nella cartella di destinazione
         if self._is_installed():
             self.log_message(
-                "I file ffmpeg.exe e ffprobe.exe sono già presenti nella cartella di destinazione.", level='warning'
+                f"I file {self.ffmpeg_exe} e {self.ffprobe_exe} sono già presenti nella cartella di destinazione.", level='warning'
             )
             return False
 
-        # Scarica il file ZIP di ffmpeg
-        zip_path = self._download_zip()
-        if not zip_path:
-            self.log_message("Errore nel download del file ZIP. Aborting...", level='error')
-            return False
-
-        # Estrai il contenuto del file ZIP
-        temp_dir = self._extract_zip(zip_path)
-        if not temp_dir:
-            self.log_message("Errore nell'estrazione del file ZIP. Aborting...", level='error')
+        # Scarica l'archivio di ffmpeg (o lo prende dalla cache)
+        archive_path = self._download_zip()
+        if not archive_path:
+            self.log_message("Errore nel download dell'archivio. Aborting...", level='error')
             return False
 
-        # Sposta i file ffmpeg.exe e ffprobe.exe nella cartella di destinazione
-        if self._move_files(temp_dir):
-            self.log_message(f"File spostati correttamente: {self.ffmpeg_exe}, {self.ffprobe_exe}")            
+        # Estrae solo ffmpeg e ffprobe direttamente nella cartella di destinazione
+        if self._extract(archive_path):
+            self.log_message(f"File estratti correttamente: {self.ffmpeg_exe}, {self.ffprobe_exe}")
         else:
             self.log_message("Errore: uno o entrambi i file non sono stati trovati nel pacchetto.", level='error')
             return False
 
-        # Verifica che i file siano stati spostati correttamente
+        # Verifica che i file siano stati estratti correttamente
         self.log_message(
             f"Contenuto della cartella {self.target_dir}: {os.listdir(self.target_dir)}"
         )
-        # Pulizia della cartella temporanea
-        shutil.rmtree(temp_dir, ignore_errors=True)
         return True
 
     def log_message(self, message, level='info'):
-        if self.text_area:
-            ffmpeg_txt = Logger(self.text_area)
-            return ffmpeg_txt.log(message, level)
-        else:
-            print(message)
+        return self.logger.log(message, level)
     
     def progress2(self, percent):
-        """Aggiorna la barra di avanzamento."""
-        if self.progress_bar:
-            self.progress_bar["value"] = percent
+        """Notifica l'avanzamento del download (percentuale)."""
+        if self.on_progress:
+            self.on_progress(percent)
     
     def get_latest_ffmpeg_version(self):
         """Funzione per ottenere l'ultima versione stabile di FFmpeg dalla pagina di download ufficiale."""
+        from bs4 import BeautifulSoup  # Import ritardato: serve solo qui
+
         url = "https://ffmpeg.org/download.html"  # Pagina di download di FFmpeg
         
         try:
             # Usa urllib per ottenere la pagina HTML
-            response = urllib.request.urlopen(url)
-            html = response.read().decode('utf-8')
+            # Timeout: senza rete (o dietro un proxy lento) non si resta appesi
+            with urllib.request.urlopen(url, timeout=10) as response:
+                html = response.read().decode('utf-8')
             
             soup = BeautifulSoup(html, 'html.parser')
             
@@ -173,7 +213,7 @@ class FFmpegDownloader:
             #print("Errore: versione non trovata.")
             return None
 
-        except urllib.error.URLError as e:
+        except (urllib.error.URLError, OSError) as e:
             print(f"Errore durante il download della pagina: {e}")
             return None
 
@@ -186,7 +226,8 @@ class FFmpegDownloader:
                 [ffmpeg_path, "-version"],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                timeout=10,
             )
             
             # Controlla se l'esecuzione è riuscita
@@ -234,6 +275,7 @@ class FFmpegDownloader:
     
 if __name__ == "__main__":
     # Esegui il download e l'installazione di FFmpeg
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     downloader = FFmpegDownloader(
         target_dir="ffmpeg_files"
     )  # Imposta la cartella "ffmpeg_files"
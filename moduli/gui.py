@@ -1,25 +1,44 @@
 import os
-import subprocess
-import re
-import json
 import threading
+from collections import deque
 
 from moduli.config_manager import ConfigManager
 from moduli.utils import Utils
-from moduli.utils import Logger
+from moduli.events import EventBus
+from moduli.logs import (
+    LogAdapter,
+    LogView,
+    RingBufferHandler,
+    get_logger,
+    setup_file_log,
+    DEFAULT_MAX_LINES,
+    DEFAULT_LOG_MB,
+    DEFAULT_LOG_BACKUPS,
+)
+from moduli.probe_cache import ProbeCache
+from moduli.converted_index import ConvertedIndex
+from moduli.capabilities import CODEC_CHOICES, FFmpegCapabilities
+from moduli.quality_search import QualityCache
+from moduli.metrics import MetricsRecorder
+from moduli.eta import ThroughputModel
+from moduli.journal import JobJournal
+from moduli.engine import (
+    ConversionEngine,
+    ConversionOptions,
+    FINAL_STATES,
+    FFMPEG_EXE,
+    FFPROBE_EXE,
+    find_executable,
+)
 from moduli.ffmpeg import FFmpegDownloader
+from moduli.versions import VersionCache, DEFAULT_TTL_HOURS
+from moduli.startup import DEFAULT_BUDGET_MS
 from moduli.icon import ICON_APP
 
 import tkinter as tk
 from tkinter import messagebox
-from time import perf_counter
 from datetime import datetime
-from datetime import timedelta
 from tkinter import filedialog, ttk
-import base64
-from io import BytesIO
-from PIL import Image, ImageTk
-from send2trash import send2trash
 
 # Definisci una palette di colori in stile Material Design
 PRIMARY_COLOR = "#1e3a8a"  # Blu
@@ -29,28 +48,20 @@ BACKGROUND_COLOR = "#121212"
 SURFACE_COLOR = "#1d1d1d"
 TEXT_COLOR = "#ffffff"
 TEXT_SECONDARY_COLOR = "#b0b0b0"
+# Righe di job conclusi mantenute nella tabella (oltre a quelli aperti)
+DEFAULT_FINISHED_ROWS = 200
 
 
 class VideoConverterApp:
-    def __init__(self):
-        self.creationflags = 0
-        self.startupinfo = None
-        if os.name == "nt":  # Solo per Windows
-            self.creationflags = subprocess.CREATE_NO_WINDOW
-            self.startupinfo = subprocess.STARTUPINFO()
-            self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
+    def __init__(self, timer=None):
+        self.timer = timer  # StartupTimer opzionale (main.py --startup-timing)
+        self._mark("import")
         self.config = ConfigManager()
 
         self.root = tk.Tk()
         self.root.title("Video Converter")
-        """Imposta l'icona della finestra da una stringa Base64."""
-        # Decodifica la stringa Base64 e ottieni l'immagine
-        img = self.base64_to_image(ICON_APP)
-        icon = ImageTk.PhotoImage(img)
-
-        # Imposta l'icona della finestra
-        self.root.iconphoto(False, icon)
+        # L'icona (decodifica con PIL) si imposta dopo il primo disegno della finestra
+        self.root.after(0, self.root.after_idle, self._set_icon)
         # Imposta la finestra principale
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
@@ -69,46 +80,177 @@ class VideoConverterApp:
         self.target_dir = self.config.get(
             "Paths", "ffmpeg_dir", fallback="ffmpeg_files/"
         )
-        self.ffmpeg_exe = "ffmpeg.exe"
-        self.ffprobe_exe = "ffprobe.exe"
-        self.ffmpeg_path = os.path.join(self.target_dir, self.ffmpeg_exe)
-        self.ffprobe_path = os.path.join(self.target_dir, self.ffprobe_exe)
+        self.ffmpeg_exe = FFMPEG_EXE
+        self.ffprobe_exe = FFPROBE_EXE
+        self.ffmpeg_path = find_executable(self.target_dir, self.ffmpeg_exe)
+        self.ffprobe_path = find_executable(self.target_dir, self.ffprobe_exe)
         self.input_folder = self.config.get("Paths", "input_folder", "")
         self.output_folder = self.config.get("Paths", "output_folder", "")
         self.crf_value = tk.IntVar(
             value=int(self.config.get("Settings", "crf_value", "25"))
         )
-        self.ffmpeg_process = False
-        self.time_files = []
-        self.size_files = []
-        self.utls = Utils(ffprobe_path=self.ffprobe_path)
-        self.downloader = FFmpegDownloader(target_dir=self.target_dir)
+        self.max_jobs = tk.IntVar(
+            value=int(self.config.get("Settings", "max_jobs", "2"))
+        )
+        # Variabili della scheda Impostazioni (i widget sono creati alla prima apertura)
+        self.codec = tk.StringVar(value="h264_nvenc")
+        self.codec_choices = list(CODEC_CHOICES)
+        self.codec_menu = None
+        self.save_mediainfo = tk.BooleanVar(value=False)
+        self.save_overwrte = tk.BooleanVar(value=True)
+        self.if_big_del = tk.BooleanVar(value=True)
+        self.auto_quality = tk.BooleanVar(
+            value=self.config.getboolean("Settings", "auto_quality")
+        )
+        self.bitrate_max = tk.IntVar(value=2500)  # Default: 2500 kbps
+        self.min_savings = tk.IntVar(
+            value=self.config.getint("Settings", "min_savings", 0)
+        )
+        # I thread di lavoro non toccano mai i widget: pubblicano eventi che la
+        # GUI preleva e applica a frequenza fissa (ui_refresh_hz)
+        self.events = EventBus()
+        self.refresh_ms = int(
+            1000 / max(1, self.config.getint("Settings", "ui_refresh_hz", 15))
+        )
+        # Motore del batch in corso (ricreato a ogni avvio)
+        self.engine = None
+        self.batch_running = False
+        self._tree_values = {}  # Ultimi valori mostrati per riga della tabella
+        # La tabella mostra i job aperti e solo gli ultimi finished_rows conclusi
+        self.finished_rows = max(
+            0, self.config.getint("Settings", "finished_rows", DEFAULT_FINISHED_ROWS)
+        )
+        self._finished_iids = deque()
+        self._counters = {}
+        # Cache dei probe accanto a config.ini, riusata tra un avvio e l'altro
+        self.probe_cache = ProbeCache(
+            self.config.data_path("probe_cache.db"),
+            max_entries=int(
+                self.config.get("Settings", "probe_cache_size", "200000")
+            ),
+        )
+        # File già prodotti dal convertitore, saltati nelle scansioni successive
+        self.converted_index = ConvertedIndex(
+            self.config.data_path("converted_index.db")
+        )
+        # CRF/CQ scelti dalla ricerca automatica, per impronta del contenuto
+        self.quality_cache = QualityCache(self.config.data_path("quality_cache.db"))
+        # Throughput storico per encoder/risoluzione, per l'ETA del batch
+        self.throughput = ThroughputModel(self.config.data_path("throughput.json"))
+        # Metriche per job (JSON lines) e, se configurato, file per Prometheus
+        self.metrics = MetricsRecorder(
+            self.config.get(
+                "Settings", "metrics_file", self.config.data_path("metrics.jsonl")
+            ),
+            self.config.get("Settings", "prometheus_file", ""),
+        )
+        # Encoder/hwaccel utilizzabili, rilevati in background e messi in cache
+        self.capabilities = None
+        # Journal del batch, per riprendere dopo un'interruzione
+        self.journal_path = self.config.data_path("batch_journal.jsonl")
+        self.utls = Utils(ffprobe_path=self.ffprobe_path, probe_cache=self.probe_cache)
+        # Log: file rotante accanto a config.ini e aree della GUI a righe limitate
+        setup_file_log(
+            self.config.get(
+                "Settings", "log_file", self.config.data_path("videoconverter.log")
+            ),
+            max_mb=self.config.getint("Settings", "log_max_mb", DEFAULT_LOG_MB),
+            backups=self.config.getint("Settings", "log_backups", DEFAULT_LOG_BACKUPS),
+        )
+        self.log_max_lines = self.config.getint(
+            "Settings", "log_max_lines", DEFAULT_MAX_LINES
+        )
+        self.conversion_log = RingBufferHandler(self.log_max_lines)
+        get_logger("conversione").addHandler(self.conversion_log)
+        self.ffmpeg_log = RingBufferHandler(self.log_max_lines)
+        get_logger("ffmpeg").addHandler(self.ffmpeg_log)
+        self.log_views = []  # LogView svuotate da _drain_events a ogni tick
+
+        self.downloader = FFmpegDownloader(
+            target_dir=self.target_dir,
+            logger=LogAdapter("ffmpeg"),
+            on_progress=lambda percent: self.events.publish(
+                "download_progress", percent
+            ),
+            # Cache degli archivi (anche una cartella condivisa tra postazioni)
+            cache_dir=self.config.get("Paths", "download_cache", "") or None,
+            connections=self.config.getint("Settings", "download_connections", 1),
+        )
+        # Versioni di FFmpeg lette in background e tenute in cache tra gli avvii
+        self.versions = VersionCache(
+            self.downloader,
+            self.config.data_path("ffmpeg_versions.json"),
+            ttl=self.config.getint("Settings", "version_check_hours", DEFAULT_TTL_HOURS)
+            * 3600,
+        )
+        self._versions = None  # Ultime versioni lette, per la scheda Scarica FFmpeg
         # Creazione del tema personalizzato
         self.create_style()
 
         # Creazione del notebook (container per le schede)
         self.notebook = ttk.Notebook(self.root, style="TNotebook")
         self.notebook.pack(fill="both", expand=True)
+        self._mark("finestra e stile")
 
         # Scheda 1: Conversione video
         self.create_widgets()
 
-        # Scheda 2: Impostazioni
-        self.create_setting()
-
-        # Scheda 3: Impostazioni
-        self.create_download_ffmpeg_tab()
+        # Schede 2 e 3 (Impostazioni, Scarica FFmpeg): costruite alla prima apertura
+        self._lazy_tabs = {}
+        self._add_lazy_tab("settings", "Impostazioni", self.create_setting)
+        self._add_lazy_tab("download", "Scarica FFmpeg", self.create_download_ffmpeg_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        self._mark("scheda conversione")
 
         # Verifica la presenza dei file ffmpeg
         self.check_ffmpeg_files()
 
+        self.root.after(self.refresh_ms, self._drain_events)
+        if self.timer is not None:
+            self.root.after(0, self._report_startup)
+
         self.root.mainloop()
 
-    def base64_to_image(self, base64_string):
-        """Converte una stringa Base64 in un'immagine."""
-        img_data = base64.b64decode(base64_string)
-        img = Image.open(BytesIO(img_data))
-        return img
+    def _mark(self, phase):
+        if self.timer is not None:
+            self.timer.mark(phase)
+
+    def _report_startup(self):
+        """Disegna la finestra e stampa i tempi di avvio (--startup-timing)."""
+        self.root.update_idletasks()
+        self._mark("prima finestra")
+        self.timer.report(
+            self.config.getint("Settings", "startup_budget_ms", DEFAULT_BUDGET_MS)
+        )
+
+    def _set_icon(self):
+        """Imposta l'icona della finestra dalla stringa Base64 (import di PIL ritardato)."""
+        import base64
+        from io import BytesIO
+        from PIL import Image, ImageTk
+
+        img = Image.open(BytesIO(base64.b64decode(ICON_APP)))
+        # Il riferimento evita che l'immagine venga liberata dal garbage collector
+        self.icon = ImageTk.PhotoImage(img)
+        self.root.iconphoto(False, self.icon)
+
+    def _add_lazy_tab(self, name, text, builder):
+        frame = ttk.Frame(self.notebook, style="TNotebook")
+        self.notebook.add(frame, text=text)
+        self._lazy_tabs[name] = (frame, builder)
+
+    def _ensure_tab(self, name):
+        """Costruisce i widget della scheda name se non esistono ancora."""
+        entry = self._lazy_tabs.pop(name, None)
+        if entry is not None:
+            frame, builder = entry
+            builder(frame)
+
+    def _on_tab_changed(self, event):
+        selected = self.notebook.select()
+        for name, (frame, _) in list(self._lazy_tabs.items()):
+            if str(frame) == selected:
+                self._ensure_tab(name)
 
     def create_style(self):
         """Crea il tema personalizzato per il notebook."""
@@ -130,6 +272,22 @@ class VideoConverterApp:
             background=[("selected", PRIMARY_COLOR)],  # Colore tab attiva
             foreground=[("selected", TEXT_COLOR)],  # Colore testo tab attiva
         )
+        style.configure(
+            "Treeview",
+            background=SURFACE_COLOR,
+            fieldbackground=SURFACE_COLOR,
+            foreground=TEXT_COLOR,
+            borderwidth=0,
+        )
+        style.configure(
+            "Treeview.Heading",
+            background=PRIMARY_VARIANT_COLOR,
+            foreground=TEXT_COLOR,
+        )
+        style.map(
+            "Treeview",
+            background=[("selected", PRIMARY_COLOR)],
+        )
         style.configure(
             "TCombobox",
             fieldbackground=BACKGROUND_COLOR,
@@ -155,6 +313,33 @@ class VideoConverterApp:
                 "FFmpeg mancanti",
                 "FFmpeg non trovato. Per favore, scarica FFmpeg per continuare.",
             )
+        else:
+            self.detect_capabilities()
+
+    def detect_capabilities(self):
+        """Rileva in background gli encoder disponibili (o li legge dalla cache)."""
+        self.capabilities = FFmpegCapabilities(
+            self.ffmpeg_path, self.config.data_path("ffmpeg_capabilities.json")
+        )
+        threading.Thread(target=self._capabilities_thread, daemon=True).start()
+
+    def _capabilities_thread(self):
+        capabilities = self.capabilities.load()
+        self.events.publish(
+            "capabilities",
+            (capabilities.available_choices(), capabilities.chain(self.codec.get())),
+        )
+
+    def _apply_capabilities(self, choices, chain):
+        self.codec_choices = choices
+        if self.codec_menu is not None:
+            self.codec_menu.config(values=choices)
+        if chain and chain[0] != self.codec.get():
+            self.conversion_txt.log(
+                f"Encoder {self.codec.get()} non disponibile: selezionato {chain[0]}.",
+                level="warning",
+            )
+            self.codec.set(chain[0])
 
     def create_widgets(self):
         # Frame per la selezione della cartella
@@ -204,11 +389,29 @@ class VideoConverterApp:
         )
         self.progress_bar.pack(pady=20)
 
+        # Tabella dei job in corso (un file per riga)
+        self.jobs_tree = ttk.Treeview(
+            conversion_tab,
+            columns=("file", "stato", "progresso", "rimanente"),
+            show="headings",
+            height=6,
+            selectmode="extended",
+        )
+        self.jobs_tree.heading("file", text="File")
+        self.jobs_tree.heading("stato", text="Stato")
+        self.jobs_tree.heading("progresso", text="Progresso")
+        self.jobs_tree.heading("rimanente", text="Rimanente")
+        self.jobs_tree.column("file", width=500)
+        self.jobs_tree.column("stato", width=120, anchor="center")
+        self.jobs_tree.column("progresso", width=100, anchor="center")
+        self.jobs_tree.column("rimanente", width=100, anchor="center")
+        self.jobs_tree.pack(pady=5, padx=10, fill="x")
+
         # Log Text Area
         self.log_text_area = tk.Text(
             conversion_tab,
             wrap="word",
-            height=15,
+            height=10,
             bg=SURFACE_COLOR,
             fg=TEXT_COLOR,
             bd=0,
@@ -217,7 +420,10 @@ class VideoConverterApp:
         )
         self.log_text_area.pack(pady=10, padx=10, fill="both", expand=True)
 
-        self.conversion_txt = Logger(self.log_text_area)
+        self.conversion_txt = LogAdapter("conversione")
+        self.log_views.append(
+            LogView(self.log_text_area, self.conversion_log, self.log_max_lines)
+        )
 
         # Frame per la selezione della cartella di output
         output_frame = tk.Frame(conversion_tab, bg=BACKGROUND_COLOR)
@@ -259,6 +465,21 @@ class VideoConverterApp:
         )
         self.start_button.pack(pady=10)
 
+        # Pulsante per riprendere l'ultimo batch interrotto
+        self.resume_button = tk.Button(
+            conversion_tab,
+            text="Riprendi batch",
+            command=self.resume_conversion,
+            bg=PRIMARY_COLOR,
+            fg=TEXT_COLOR,
+            activebackground=PRIMARY_VARIANT_COLOR,
+            relief="flat",
+            padx=20,
+            pady=10,
+        )
+        self.resume_button.pack(pady=10)
+        self._update_resume_button()
+
         # Pulsante per fermare ffmpeg
         self.stop_button = tk.Button(
             conversion_tab,
@@ -272,13 +493,25 @@ class VideoConverterApp:
             pady=10,
             state=tk.DISABLED,
         )
-        self.stop_button.pack(pady=20)
+        self.stop_button.pack(pady=(20, 5))
 
-    def create_setting(self):
-        """Crea la scheda per il download di FFmpeg."""
+        # Pulsante per fermare solo i job selezionati nella tabella
+        self.stop_job_button = tk.Button(
+            conversion_tab,
+            text="Ferma selezionati",
+            command=self.stop_selected_jobs,
+            bg=PRIMARY_COLOR,
+            fg=TEXT_COLOR,
+            activebackground=PRIMARY_VARIANT_COLOR,
+            relief="flat",
+            padx=20,
+            pady=10,
+            state=tk.DISABLED,
+        )
+        self.stop_job_button.pack(pady=(5, 20))
 
-        setting_tab = ttk.Frame(self.notebook, style="TNotebook")
-        self.notebook.add(setting_tab, text="Impostazioni")
+    def create_setting(self, setting_tab):
+        """Crea i widget della scheda Impostazioni."""
 
         # Selezione della modalità qualità (CRF o CQ) con il relativo slider
         quality_frame = tk.Frame(setting_tab, bg=BACKGROUND_COLOR)
@@ -364,20 +597,11 @@ class VideoConverterApp:
         )  # Etichetta allineata a sinistra
 
         # Menu a discesa per la selezione del codec
-        self.codec = tk.StringVar(value="h264_nvenc")
-        codec_menu = ttk.Combobox(
+        # L'elenco viene ristretto agli encoder disponibili dopo il rilevamento
+        self.codec_menu = codec_menu = ttk.Combobox(
             codec_frame,
             textvariable=self.codec,
-            values=[
-                "libx264",  # Codifica video con H.264 (x264)
-                "libx265",  # Codifica video con HEVC (H.265)
-                "h264_nvenc",  # Codifica video H.264 usando GPU NVIDIA (accelerazione hardware)
-                "hevc_nvenc",  # Codifica video HEVC (H.265) usando GPU NVIDIA (accelerazione hardware)
-                "vp8",  # Codifica video con VP8
-                "vp9",  # Codifica video con VP9
-                "mpeg4",  # Codifica video con MPEG-4
-                "libaom-av1",  # Codifica video con AV1
-            ],
+            values=self.codec_choices,
             state="normal",  # Permette la selezione
             width=20,  # Imposta la larghezza del menu a discesa
             background=BACKGROUND_COLOR,
@@ -396,8 +620,6 @@ class VideoConverterApp:
             bg=BACKGROUND_COLOR,
         ).pack(anchor="center", pady=5)
 
-        # Variabile per salvare i MediaInfo
-        self.save_mediainfo = tk.BooleanVar(value=False)
         # Casella di spunta: Salva MediaInfo
         mediainfo_checkbox = tk.Checkbutton(
             checkbox_frame,
@@ -411,9 +633,6 @@ class VideoConverterApp:
         )
         mediainfo_checkbox.pack(side="left", padx=10)
 
-        # Variabile per sovrascrivere
-        self.save_overwrte = tk.BooleanVar(value=True)
-
         # Casella di spunta: Sovrascrivi originale
         overwrte_checkbox = tk.Checkbutton(
             checkbox_frame,
@@ -427,9 +646,6 @@ class VideoConverterApp:
         )
         overwrte_checkbox.pack(side="left", padx=10)
 
-        # Variabile per Grandezza
-        self.if_big_del = tk.BooleanVar(value=True)
-
         # Casella di spunta: Se più grande elimina
         if_big_del_checkbox = tk.Checkbutton(
             checkbox_frame,
@@ -443,6 +659,19 @@ class VideoConverterApp:
         )
         if_big_del_checkbox.pack(side="left", padx=10)
 
+        # Casella di spunta: CRF automatico (campioni confrontati con SSIM)
+        auto_quality_checkbox = tk.Checkbutton(
+            checkbox_frame,
+            text="CRF automatico (SSIM)",
+            variable=self.auto_quality,
+            onvalue=True,
+            offvalue=False,
+            fg=TEXT_COLOR,
+            bg=BACKGROUND_COLOR,
+            selectcolor=PRIMARY_COLOR,
+        )
+        auto_quality_checkbox.pack(side="left", padx=10)
+
         # Input box per il bitrate soglia
         bitrate_frame = tk.Frame(setting_tab, bg=BACKGROUND_COLOR)
         bitrate_frame.pack(pady=20, fill="x", padx=20)
@@ -454,8 +683,6 @@ class VideoConverterApp:
             bg=BACKGROUND_COLOR,
         ).pack(side=tk.TOP, anchor="center", padx=5)
 
-        self.bitrate_max = tk.IntVar(value=2500)  # Default: 2500 kbps
-
         def validate_bitrate(new_value):
             if new_value.isdigit():  # Controlla che sia un numero
                 value = int(new_value)
@@ -482,17 +709,64 @@ class VideoConverterApp:
         )
         bitrate_input.pack(anchor="center", padx=10)
 
-    def create_download_ffmpeg_tab(self):
-        """Crea la scheda per il download di FFmpeg."""
+        # Numero di conversioni contemporanee
+        jobs_frame = tk.Frame(setting_tab, bg=BACKGROUND_COLOR)
+        jobs_frame.pack(pady=20, fill="x", padx=20)
+
+        tk.Label(
+            jobs_frame,
+            text="Conversioni contemporanee:",
+            fg=TEXT_COLOR,
+            bg=BACKGROUND_COLOR,
+        ).pack(side=tk.TOP, anchor="center", padx=5)
+
+        jobs_input = tk.Spinbox(
+            jobs_frame,
+            from_=1,
+            to=max(1, os.cpu_count() or 1),
+            increment=1,
+            textvariable=self.max_jobs,
+            width=10,
+            fg=TEXT_COLOR,
+            bg=PRIMARY_VARIANT_COLOR,
+            highlightthickness=0,
+        )
+        jobs_input.pack(anchor="center", padx=10)
+
+        # Risparmio minimo previsto dai campioni (0 = nessuna stima)
+        savings_frame = tk.Frame(setting_tab, bg=BACKGROUND_COLOR)
+        savings_frame.pack(pady=20, fill="x", padx=20)
 
-        download_tab = ttk.Frame(self.notebook, style="TNotebook")
-        self.notebook.add(download_tab, text="Scarica FFmpeg")
+        tk.Label(
+            savings_frame,
+            text="Risparmio minimo previsto (%, 0 = disattivato):",
+            fg=TEXT_COLOR,
+            bg=BACKGROUND_COLOR,
+        ).pack(side=tk.TOP, anchor="center", padx=5)
+
+        savings_input = tk.Spinbox(
+            savings_frame,
+            from_=0,
+            to=90,
+            increment=5,
+            textvariable=self.min_savings,
+            width=10,
+            fg=TEXT_COLOR,
+            bg=PRIMARY_VARIANT_COLOR,
+            highlightthickness=0,
+        )
+        savings_input.pack(anchor="center", padx=10)
+
+    def create_download_ffmpeg_tab(self, download_tab):
+        """Crea i widget della scheda per il download di FFmpeg."""
 
         # Stato e progress bar
+        # Le versioni in cache si mostrano subito; check_versions le aggiorna
+        installed_version, latest_version = self._versions or self.versions.cached()
         # Etichetta per la versione installata
         self.installed_version_label = tk.Label(
             download_tab,
-            text=f"Versione installata: {self.downloader.get_installed_ffmpeg_version()}",
+            text=f"Versione installata: {installed_version or '...'}",
             fg=TEXT_COLOR,
             bg=BACKGROUND_COLOR,
         )
@@ -501,7 +775,7 @@ class VideoConverterApp:
         # Etichetta per l'ultima versione disponibile
         self.latest_version_label = tk.Label(
             download_tab,
-            text=f"Ultima versione disponibile: {self.downloader.get_latest_ffmpeg_version()}",
+            text=f"Ultima versione disponibile: {latest_version or '...'}",
             fg=TEXT_COLOR,
             bg=BACKGROUND_COLOR,
         )
@@ -524,6 +798,9 @@ class VideoConverterApp:
             pady=10,
         )
         self.log_text_area_ffmpeg.pack(pady=10, padx=10, fill="both", expand=True)
+        self.log_views.append(
+            LogView(self.log_text_area_ffmpeg, self.ffmpeg_log, self.log_max_lines)
+        )
 
         # Pulsante Aggiorna
         self.update_button = tk.Button(
@@ -552,16 +829,27 @@ class VideoConverterApp:
             pady=10,
         )
         download_button.pack(pady=10)
-        self.downloader = FFmpegDownloader(
-            target_dir=self.target_dir,
-            text_area=self.log_text_area_ffmpeg,
-            progress=self.progress_bar_2,
-        )
+        if self._versions is not None:
+            self._apply_versions(*self._versions)
 
     def check_versions(self):
-        """Verifica se le versioni sono uguali e disabilita il pulsante Aggiorna."""
-        installed_version = self.downloader.get_installed_ffmpeg_version()
-        latest_version = self.downloader.get_latest_ffmpeg_version()
+        """Legge le versioni in background; _apply_versions aggiorna le etichette."""
+        threading.Thread(target=self._versions_thread, daemon=True).start()
+
+    def _versions_thread(self):
+        self.events.publish("versions", self.versions.resolve())
+
+    def _apply_versions(self, installed_version, latest_version):
+        """Mostra le versioni e abilita "Aggiorna" solo se ne esiste una più recente."""
+        self._versions = (installed_version, latest_version)
+        if "download" in self._lazy_tabs:
+            return  # Scheda non ancora aperta: i valori si applicano alla creazione
+        self.installed_version_label.config(
+            text=f"Versione installata: {installed_version}"
+        )
+        self.latest_version_label.config(
+            text=f"Ultima versione disponibile: {latest_version}"
+        )
         if installed_version == None:
             self.update_button.config(state=tk.DISABLED)
         if installed_version and latest_version:
@@ -588,14 +876,18 @@ class VideoConverterApp:
 
     def download_ffmpeg_deamon(self, redirect=True):
         if self.downloader.download_ffmpeg():
-            if redirect:
-                self.notebook.tab(self.notebook.tabs()[0], state="normal")
-                self.notebook.select(self.notebook.tabs()[0])
-            installed_version = self.downloader.get_installed_ffmpeg_version()
-            self.installed_version_label.config(
-                text=f"Versione installata: {installed_version}"
+            # Le versioni si leggono qui; i widget li aggiorna _drain_events
+            self.events.publish(
+                "download_done", (redirect,) + self.versions.resolve()
             )
-            self.check_versions()
+
+    def _on_download_done(self, redirect, installed_version, latest_version):
+        if redirect:
+            self.notebook.tab(self.notebook.tabs()[0], state="normal")
+            self.notebook.select(self.notebook.tabs()[0])
+        # Nuovo binario: le capacità vanno rilevate di nuovo
+        self.detect_capabilities()
+        self._apply_versions(installed_version, latest_version)
 
     def select_folder(self):
         folder_selected = filedialog.askdirectory()
@@ -611,368 +903,182 @@ class VideoConverterApp:
             self.output_folder = folder_selected
             self.config.update("Paths", "output_folder", folder_selected)
 
-    def get_video_info(self, input_path):
-        command = [self.ffmpeg_path, "-i", input_path]
-        process = subprocess.Popen(
-            command,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            text=True,
-            encoding="utf-8",
-        )
-        stdout, stderr = process.communicate()
-
-        # Trova le informazioni sulla risoluzione
-        match = re.search(r"(\d{2,5})x(\d{2,5})", stderr)
-        if match:
-            width_str, height_str = match.groups()
-            try:
-                width = int(width_str.strip())
-                height = int(height_str.strip())
-            except ValueError:
-                self.conversion_txt.log(
-                    f"Errore nel parsing della risoluzione del video: {width_str}x{height_str}",
-                    level="error",
-                )
-                return None, None, None
-        else:
-            self.conversion_txt.log(
-                "Risoluzione del video non trovata.", level="warning"
-            )
-            return None, None, None
-
-        # Trova la durata del video
-        duration_match = re.search(r"Duration: (\d+):(\d+):(\d+\.\d+)", stderr)
-        if duration_match:
-            hours, minutes, seconds = map(float, duration_match.groups())
-            duration = hours * 3600 + minutes * 60 + seconds
-        else:
-            duration = None  # Durata non trovata
-
-        return width, height, duration
-
     def stop_ffmpeg(self):
-        # Se il processo ffmpeg è attivo, lo fermiamo
-        if self.ffmpeg_process:
-            self.ffmpeg_process.terminate()  # Invia il comando per terminare il processo
-            self.ffmpeg_process = None  # Reset del processo
-            self.start_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
-
-    def run_ffmpeg_command(self, command):
-        try:
-            process = subprocess.Popen(
-                command,
-                stderr=subprocess.PIPE,
-                text=True,
-                creationflags=self.creationflags,
-                startupinfo=self.startupinfo,
-                encoding="utf-8",
-            )
-            return process
-        except Exception as e:
-            self.logger.log(
-                f"Errore durante l'esecuzione del comando FFmpeg: {e}", level="error"
-            )
-            return None
-
-    def convert_video(self, input_path, output_path):
-        width, height, duration = self.get_video_info(input_path)
-        if duration is None or width is None or height is None:
-            self.conversion_txt.log(
-                f"Impossibile ottenere informazioni video per {input_path}.",
-                level="error",
-            )
+        # Ferma tutti i job del batch e impedisce l'avvio di quelli in coda
+        if self.engine:
+            self.engine.stop()
+        self.stop_button.config(state=tk.DISABLED)
+        self.stop_job_button.config(state=tk.DISABLED)
+
+    def stop_selected_jobs(self):
+        """Ferma solo i job selezionati nella tabella."""
+        if not self.engine:
             return
-
-        scale_filter = (
-            "scale=1280:720,format=yuv420p"
-            if (width > 1280 or height > 720)
-            else "scale=-1:-1,format=yuv420p"
+        jobs, _ = self.engine.snapshot()
+        for iid in self.jobs_tree.selection():
+            job = jobs[int(iid)]
+            if job.status not in FINAL_STATES:
+                job.stop()
+
+    def _drain_events(self):
+        """Applica ai widget gli eventi arrivati dai thread, una volta per tick."""
+        latest = self.events.drain()
+        if self.ffmpeg_log.pending or ("download_progress", None) in latest:
+            self._ensure_tab("download")
+
+        # Un solo insert per area e per tick, qualunque sia il numero di righe
+        for view in self.log_views:
+            view.flush()
+
+        jobs_changed = False
+        for (topic, key), value in latest.items():
+            if topic == "job":
+                self._update_job_row(value)
+                jobs_changed = True
+            elif topic == "counters":
+                self._counters = value
+                jobs_changed = True
+            elif topic == "download_progress":
+                self.progress_bar_2["value"] = value
+            elif topic == "download_done":
+                self._on_download_done(*value)
+            elif topic == "capabilities":
+                self._apply_capabilities(*value)
+            elif topic == "versions":
+                self._apply_versions(*value)
+
+        if self.engine and (jobs_changed or self.batch_running):
+            self._update_batch_status()
+        if ("batch", None) in latest and not self.batch_running:
+            self._on_batch_done(latest[("batch", None)])
+
+        self.root.after(self.refresh_ms, self._drain_events)
+
+    def _update_job_row(self, job):
+        iid = str(job.index)
+        remaining = (
+            self.utls.convert_seconds(job.remaining)
+            if job.remaining is not None
+            else ""
         )
-
-        quality_option = "-crf" if self.quality_mode.get() == "crf" else "-cq"
-        quality_value = self.crf_value.get()
-
-        mediainfo_before = (
-            self.utls.get_mediainfo(input_path) if self.save_mediainfo.get() else {}
+        values = (
+            os.path.basename(job.input_path),
+            job.status,
+            f"{int(job.progress)}%",
+            remaining,
         )
-
-        initial_size = os.path.getsize(input_path)
-
-        command = [
-            self.ffmpeg_path,
-            "-y",
-            "-hwaccel",
-            "cuda",
-            "-i",
-            input_path,
-            "-vf",
-            scale_filter,
-            "-c:v",
-            self.codec.get(),
-            quality_option,
-            str(quality_value),
-            "-preset",
-            "fast",
-            "-movflags",
-            "faststart",
-            "-c:a",
-            "aac",
-            "-b:a",
-            "128k",
-            output_path,
-        ]
-
-        try:
-            process = self.run_ffmpeg_command(command)
-        except FileNotFoundError:
-            self.logger.log(
-                "FFmpeg non trovato. Assicurati che sia installato correttamente.",
-                level="error",
+        if not self.jobs_tree.exists(iid):
+            self.jobs_tree.insert("", tk.END, iid=iid, values=values)
+        elif self._tree_values.get(iid) != values:
+            self.jobs_tree.item(iid, values=values)
+        self._tree_values[iid] = values
+        if job.status in FINAL_STATES and iid not in self._finished_iids:
+            # Tabella limitata: le righe concluse più vecchie vengono rimosse
+            self._finished_iids.append(iid)
+            while len(self._finished_iids) > self.finished_rows:
+                oldest = self._finished_iids.popleft()
+                self.jobs_tree.delete(oldest)
+                self._tree_values.pop(oldest, None)
+
+    def _update_batch_status(self):
+        if not self.batch_running:
+            return
+        progress, eta = self.engine.batch_progress()
+        active = sum(
+            1 for job in self.engine.active_jobs() if job.status == "in corso"
+        )
+        counters = self._counters
+        self.progress_bar["value"] = progress
+        self.file_label.config(text=f"Conversioni attive: {active}")
+        self.status_label.config(
+            text=(
+                f"Trovati: {counters.get('trovati', 0)} - Analizzati: {counters.get('analizzati', 0)}"
+                f" - Accodati: {counters.get('accodati', 0)} - Completati: {counters.get('completati', 0)}"
+                f" - {int(progress)}% - ETA: {self.utls.convert_seconds(eta)}"
             )
-        except RuntimeError as e:
-            self.logger.log(str(e), level="error")
-        except Exception as e:
-            self.logger.log(f"Errore inaspettato: {e}", level="error")
+        )
 
-        self.ffmpeg_process = process
+    def _on_batch_done(self, summary):
+        self.progress_bar["value"] = 0
+        self.file_label.config(text="")
+        self.status_label.config(text=summary or "Pronto per la conversione")
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.stop_job_button.config(state=tk.DISABLED)
+        self._update_resume_button()
+
+    def conversion_options(self):
+        """Raccoglie le impostazioni correnti della GUI per il motore."""
+        return ConversionOptions.from_config(
+            self.config,
+            codec=self.codec.get(),
+            quality_mode=self.quality_mode.get(),
+            quality_value=self.crf_value.get(),
+            bitrate_max=self.bitrate_max.get(),
+            save_mediainfo=self.save_mediainfo.get(),
+            overwrite=self.save_overwrte.get(),
+            if_big_del=self.if_big_del.get(),
+            max_jobs=self.max_jobs.get(),
+            output_folder=self.output_folder,
+            auto_quality=self.auto_quality.get(),
+            min_savings=self.min_savings.get(),
+        )
 
-        self.conversion_txt.log(
-            f"Conversione di {os.path.basename(input_path)} avviata"
+    def _update_resume_button(self):
+        """Abilita "Riprendi batch" solo se il journal ha job non conclusi."""
+        self.resume_folder = JobJournal.unfinished_batch(self.journal_path)
+        self.resume_button.config(
+            state=tk.NORMAL
+            if self.resume_folder and not self.batch_running
+            else tk.DISABLED
         )
 
-        self.start_button.config(state=tk.DISABLED)
-        self.stop_button.config(state=tk.NORMAL)
-        try:
-            self.file_label.config(text=f"{os.path.basename(input_path)}: 0%")
-            for line in process.stderr:
-                time_match = re.search(r"time=(\d+:\d+:\d+(?:\.\d+)?)", line)
-                # Estrazione della velocità
-                speed_match = re.search(r"speed=(\d+\.?\d*)x", line)
-                if time_match:
-                    current_time = self.utls.parse_time_to_seconds(time_match.group(1))
-                    progress = (current_time / duration) * 100
-                    self.progress_bar["value"] = progress
-                    remaining_time_current_file = max(duration - current_time, 0)
-                if speed_match and time_match:
-                    estimated_speed = float(speed_match.group(1))
-                    remaining_time_current_file = (
-                        duration - current_time
-                    ) / estimated_speed
-                    self.file_label.config(
-                        text=f"{os.path.basename(input_path)}: {int(progress)}% - Rimanente: {self.convert_seconds(remaining_time_current_file)}"
-                    )
-                self.file_label.update_idletasks()
-
-            process.wait()
-
-            self.size_files.append(initial_size - os.path.getsize(output_path))
-
-            # Azioni post-processo
-            if self.ffmpeg_process:
-                self._post_process_conversion(input_path, output_path, mediainfo_before)
-
-        except Exception as e:
-            self.conversion_txt.log(
-                f"Errore durante la conversione di {input_path}: {str(e)}",
-                level="error",
-            )
-        finally:
-            if process.poll() is None:  # Controlla se il processo è ancora attivo
-                process.terminate()  # Tenta di chiuderlo in modo pulito
-                try:
-                    process.wait(timeout=5)  # Attendi la chiusura
-                except subprocess.TimeoutExpired:
-                    process.kill()  # Forza la chiusura
-                self.conversion_txt.log("Processo FFmpeg terminato.")
-
-    def _post_process_conversion(self, input_path, output_path, mediainfo_before):
-        if self.save_mediainfo.get():
-            mediainfo_after = self.utls.get_mediainfo(output_path)
-            # Save both mediainfo data to a JSON file
-            report = {
-                "input_file": input_path,
-                "output_file": output_path,
-                "mediainfo_before": mediainfo_before,
-                "mediainfo_after": mediainfo_after,
-            }
-            json_report_path = os.path.splitext(output_path)[0] + "_mediainfo.json"
-            with open(json_report_path, "w") as json_file:
-                json.dump(report, json_file, indent=4)
-
-            # Log the completion message with JSON report path
-            self.conversion_txt.log(
-                f"Rapporto mediainfo salvato in: {json_report_path}"
-            )
+    def resume_conversion(self):
+        if not self.resume_folder or not os.path.isdir(self.resume_folder):
+            self.conversion_txt.log("Nessun batch da riprendere.", level="warning")
+            return
+        self.input_folder = self.resume_folder
+        self.folder_label.config(text=self.input_folder)
+        self.start_conversion(resume=True)
 
-        if self.if_big_del.get():
-            try:
-                # Confronta le dimensioni e rimuovi il file più grande
-                if os.path.getsize(output_path) >= os.path.getsize(input_path):
-                    os.remove(output_path)
-                    self.conversion_txt.log(
-                        f"Il file '{output_path}' è stato eliminato perché è più grande."
-                    )
-            except FileNotFoundError as e:
-                self.conversion_txt.log(f"Errore: {e}", level="error")
-            except Exception as e:
-                self.conversion_txt.log(
-                    f"Si è verificato un errore: {e}", level="error"
-                )
-
-        if self.save_overwrte.get() and os.path.exists(output_path):
-            try:
-                send2trash(os.path.normpath(input_path))
-                self.conversion_txt.log(
-                    f"Il file originale è stato spostato nel cestino."
-                )
-            except FileNotFoundError:
-                self.conversion_txt.log(
-                    f"Il file '{input_path}' non esiste.", level="error"
-                )
-            except Exception as e:
-                self.conversion_txt.log(
-                    f"Errore durante lo spostamento del file nel cestino: {e}",
-                    level="error",
-                )
-            try:
-                os.rename(output_path, input_path)
-            except FileNotFoundError:
-                self.conversion_txt.log(
-                    f"Il file '{output_path}' non esiste.", level="error"
-                )
-            except PermissionError:
-                self.conversion_txt.log(
-                    "Permessi insufficienti per rinominare il file.", level="error"
-                )
-            except Exception as e:
-                self.conversion_txt.log(
-                    f"Errore durante la rinomina del file: {e}", level="error"
-                )
-
-    def convert_seconds(self, seconds):
-        t = timedelta(seconds=seconds)
-        hours, remainder = divmod(t.total_seconds(), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
-
-    def batch_convert(self):
-        allowed_extensions = (
-            ".3gp",
-            ".avi",
-            ".flv",
-            ".h264",
-            ".hevc",
-            ".mkv",
-            ".mov",
-            ".mp4",
-            ".mpeg",
-            ".mpg",
-            ".mpeg4",
-            ".mts",
-            ".ogv",
-            ".ts",
-            ".vob",
-            ".webm",
-            ".wmv",
-            ".divx",
-            ".xvid",
-            ".m4v",
-            ".rm",
-            ".rmvb",
-            ".mxf",
-            ".amv",
-        )
-        self.ffmpeg_process = False
+    def start_conversion(self, resume=False):
         if not self.input_folder:
             self.conversion_txt.log("Seleziona una cartella valida.")
             return
-
-        file_paths = [
-            os.path.join(root, filename)
-            for root, _, files in os.walk(self.input_folder)
-            for filename in files
-            if filename.endswith(allowed_extensions)
-        ]
-
-        if not file_paths:
-            self.conversion_txt.log("Nessun file video trovato.")
-            return
-
-        total_files = len(file_paths)
-
-        cleaned_total_files = 0
-        cleaned_file_paths = []
-        
-        for index, input_path in enumerate(file_paths, start=1):
-            bitrate = (
-                self.utls.get_bitrate(input_path) if self.bitrate_max.get() else None
-            )
-            if bitrate and bitrate < self.bitrate_max.get():
-                self.conversion_txt.log(
-                    f"{os.path.basename(input_path)} è stato saltato perché ha un bitrate minore della soglia ({bitrate})/({self.bitrate_max.get()})."
-                )
-                continue
-            cleaned_total_files += 1
-            cleaned_file_paths.append(input_path)
-        
-        avg_tm = 0
-        eta = 0
-
-        for index, input_path in enumerate(cleaned_file_paths, start=1):
-            if self.ffmpeg_process is None:
-                break
-
-            if self.time_files:
-                avg_tm = sum(self.time_files) / len(self.time_files)
-                eta = avg_tm * (cleaned_total_files - index)
-
-            self.status_label.config(
-                text=f"Conversione: {index}/{cleaned_total_files} di {total_files} - TMV: {self.convert_seconds(avg_tm)} - ETA: {self.convert_seconds(eta)}"
-            )
-
-            file_name, _ = os.path.splitext(os.path.basename(input_path))
-            filenm = f"{file_name}.mp4" if self.output_folder else f"{file_name}_nw.mp4"
-            output_folder = self.output_folder or os.path.dirname(input_path)
-            output_path = os.path.join(output_folder, filenm)
-
-            start_time = perf_counter()
-            self.convert_video(
-                input_path, output_path
-            )  # Esegui la conversione del video
-            elapsed_time = perf_counter() - start_time
-            self.time_files.append(elapsed_time)
-
-            if self.ffmpeg_process:
-                self.conversion_txt.log(
-                    f"Conversione di {os.path.basename(input_path)} completata in {self.convert_seconds(elapsed_time)}"
-                )
-            else:
-                os.remove(output_path)
-                self.conversion_txt.log(
-                    f"Conversione di {os.path.basename(input_path)} interrotta."
-                )
-
-        self.progress_bar["value"] = 0
-        self.start_button.config(state=tk.NORMAL)
-        self.file_label.config(text="")
-        space_reduction = sum(self.size_files)
-        self.status_label.config(
-            text=(
-                f"Conversione batch completata in {self.convert_seconds(sum(self.time_files))} - Spazio Recuperato: {self.format_size(space_reduction)}"
-                if self.ffmpeg_process
-                else "Conversione batch interrotta."
-            )
+        self.config.update("Settings", "max_jobs", str(self.max_jobs.get()))
+        self.config.update("Settings", "auto_quality", str(self.auto_quality.get()))
+        self.config.update("Settings", "min_savings", str(self.min_savings.get()))
+        self.engine = ConversionEngine(
+            self.ffmpeg_path,
+            self.ffprobe_path,
+            self.conversion_options(),
+            self.conversion_txt,
+            probe_cache=self.probe_cache,
+            events=self.events,
+            journal=JobJournal(self.journal_path),
+            converted_index=self.converted_index,
+            capabilities=self.capabilities,
+            quality_cache=self.quality_cache,
+            metrics=self.metrics,
+            throughput=self.throughput,
         )
+        self.batch_running = True
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        self._tree_values = {}
+        self._finished_iids = deque()
+        self._counters = {}
+        self.start_button.config(state=tk.DISABLED)
+        self.resume_button.config(state=tk.DISABLED)
+        self.stop_button.config(state=tk.NORMAL)
+        self.stop_job_button.config(state=tk.NORMAL)
+        threading.Thread(
+            target=self._batch_thread, args=(resume,), daemon=True
+        ).start()
 
-    def format_size(self, size_in_bytes):
-        if size_in_bytes:
-            for unit in ["B", "KB", "MB", "GB", "TB"]:
-                if size_in_bytes < 1024:
-                    return f"{size_in_bytes:.2f} {unit}"
-                size_in_bytes /= 1024
-        return "0 Bytes"
-
-    def start_conversion(self):
-        threading.Thread(target=self.batch_convert, daemon=True).start()
+    def _batch_thread(self, resume=False):
+        summary = ""
+        try:
+            summary = self.engine.run(self.input_folder, resume)
+        finally:
+            self.batch_running = False
+            self.events.publish("batch", summary)
@@ -0,0 +1,152 @@
+import os
+import json
+import shutil
+import time
+import threading
+
+from moduli.segmented import SEGMENTS_SUFFIX
+
+# Stati registrati nel journal
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+STOPPED = "stopped"
+
+# Stati che non vanno ripetuti quando si riprende un batch: i file falliti
+# (anche per un errore temporaneo dell'encoder) vengono ritentati
+RESUME_SKIP_STATES = (DONE, SKIPPED)
+# Stati conclusi: un batch con soli job in questi stati non va ripreso
+FINISHED_STATES = (DONE, FAILED, SKIPPED)
+# Stati che richiedono la pulizia dell'output parziale alla ripresa
+INTERRUPTED_STATES = (RUNNING, STOPPED)
+
+
+class JobJournal:
+    """
+    Journal append-only (JSON lines) dello stato dei job di un batch.
+    Ogni cambio di stato viene scritto subito su disco, così un batch
+    interrotto (crash, riavvio, stop) può essere ripreso da dove si era fermato.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.input_folder = None
+        self.entries = {}  # percorso di input -> ultimo record
+        self._lock = threading.Lock()
+        self._file = None
+
+    @staticmethod
+    def read(path):
+        """Legge un journal; ritorna (cartella del batch, ultimo record per file)."""
+        input_folder = None
+        entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Ultima riga troncata da un crash
+                    if "batch" in record:
+                        input_folder = record["batch"].get("input_folder")
+                    elif "path" in record:
+                        entries[record["path"]] = record
+        except FileNotFoundError:
+            pass
+        return input_folder, entries
+
+    @classmethod
+    def unfinished_batch(cls, path):
+        """Cartella del batch nel journal se ha job non conclusi, altrimenti None."""
+        input_folder, entries = cls.read(path)
+        if any(r["state"] not in FINISHED_STATES for r in entries.values()):
+            return input_folder
+        return None
+
+    def begin(self, input_folder, resume=False):
+        """Apre il journal: nuovo batch (file azzerato) o ripresa del precedente."""
+        with self._lock:
+            if resume:
+                self.input_folder, self.entries = self.read(self.path)
+                if self.input_folder and not self._same_folder(input_folder):
+                    # Journal di un'altra cartella: non è una ripresa
+                    self.entries = {}
+                    resume = False
+            else:
+                self.entries = {}
+            self.input_folder = input_folder
+            self._file = open(
+                self.path, "a" if resume else "w", encoding="utf-8"
+            )
+            self._write({"batch": {"input_folder": input_folder, "resume": resume}})
+        return resume
+
+    def _same_folder(self, input_folder):
+        return os.path.normcase(os.path.abspath(self.input_folder)) == os.path.normcase(
+            os.path.abspath(input_folder)
+        )
+
+    def _write(self, record, sync=False):
+        record["t"] = time.time()
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def state(self, path):
+        entry = self.entries.get(path)
+        return entry["state"] if entry else None
+
+    def should_skip(self, path):
+        """True se il file è già stato concluso (non fallito) in un'esecuzione precedente."""
+        return self.state(path) in RESUME_SKIP_STATES
+
+    def record(self, path, state, **result):
+        record = {"path": path, "state": state}
+        record.update(result)
+        with self._lock:
+            self.entries[path] = record
+            if self._file:
+                # fsync solo sui passaggi che proteggono lavoro già svolto
+                self._write(dict(record), sync=state in (RUNNING, DONE))
+
+    def recover(self, logger):
+        """
+        Pulisce gli output lasciati a metà dai job interrotti.
+        Se l'originale era già stato spostato nel cestino ma l'output non era
+        ancora stato rinominato, completa la rinomina invece di cancellarlo.
+        Ritorna (secondi, byte risparmiati) dei job già completati.
+        """
+        elapsed = saved = 0
+        for path, entry in list(self.entries.items()):
+            if entry["state"] == DONE:
+                elapsed += entry.get("elapsed", 0)
+                saved += entry.get("size_saved", 0)
+                continue
+            if entry["state"] not in INTERRUPTED_STATES:
+                continue
+            output_path = entry.get("output")
+            if output_path:
+                # Segmenti di una codifica a segmenti interrotta
+                shutil.rmtree(output_path + SEGMENTS_SUFFIX, ignore_errors=True)
+            if not output_path or not os.path.exists(output_path):
+                continue
+            try:
+                if not os.path.exists(path) and entry.get("overwrite"):
+                    os.rename(output_path, path)
+                    self.record(path, DONE, output=output_path, elapsed=0, size_saved=0)
+                    logger.log(f"Rinomina di {output_path} completata dopo l'interruzione.")
+                else:
+                    os.remove(output_path)
+                    logger.log(f"Rimosso output incompleto: {output_path}")
+            except OSError as e:
+                logger.log(f"Impossibile ripulire {output_path}: {e}", level="error")
+        return elapsed, saved
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
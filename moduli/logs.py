@@ -0,0 +1,126 @@
+import os
+import logging
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# Logger radice dell'applicazione: i figli (conversione, ffmpeg, stderr dei
+# job) propagano fino a qui, dove è agganciato il file di log rotante
+LOGGER_NAME = "videoconverter"
+LOG_FORMAT = "%(asctime)s - [%(levelname)s] - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+# Righe conservate in ogni area di log della GUI (le altre restano nel file)
+DEFAULT_MAX_LINES = 5000
+DEFAULT_LOG_MB = 5
+DEFAULT_LOG_BACKUPS = 3
+
+logging.getLogger(LOGGER_NAME).setLevel(logging.INFO)
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def log_formatter():
+    return logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+
+
+def setup_file_log(path, max_mb=DEFAULT_LOG_MB, backups=DEFAULT_LOG_BACKUPS):
+    """
+    Aggancia al logger dell'applicazione un file rotante (max_mb per file,
+    backups file precedenti). Ritorna l'handler, o None se il file non si apre.
+    """
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    root = get_logger()
+    for handler in root.handlers:
+        if isinstance(handler, RotatingFileHandler) and handler.baseFilename == path:
+            return handler
+    try:
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=max(1, max_mb) * 1048576,
+            backupCount=max(0, backups),
+            encoding="utf-8",
+        )
+    except OSError:
+        return None  # Il log su disco non deve mai impedire l'avvio
+    handler.setFormatter(log_formatter())
+    root.addHandler(handler)
+    return handler
+
+
+class LogAdapter:
+    """Logger con l'interfaccia log(message, level) sopra un logger di logging."""
+
+    def __init__(self, name):
+        # Nome di un figlio del logger dell'applicazione, o un logging.Logger
+        self.logger = name if isinstance(name, logging.Logger) else get_logger(name)
+
+    def log(self, message, level="info"):
+        self.logger.log(LEVELS.get(level, logging.INFO), message)
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Righe formattate in attesa di essere mostrate dalla GUI. Ne conserva al
+    massimo max_lines: se la GUI resta indietro le più vecchie vengono scartate
+    (e contate), così la memoria resta costante qualunque sia il batch.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        super().__init__()
+        self.max_lines = max_lines
+        self.pending = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.setFormatter(log_formatter())
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        # emit è già chiamato con il lock dell'handler
+        if len(self.pending) == self.max_lines:
+            self.dropped += 1
+        self.pending.append(line)
+
+    def drain(self):
+        """Ritorna (righe in attesa, righe scartate) e svuota il buffer."""
+        with self.lock:
+            lines = list(self.pending)
+            dropped = self.dropped
+            self.pending.clear()
+            self.dropped = 0
+        return lines, dropped
+
+
+class LogView:
+    """
+    Area di testo (tk.Text) che mostra le righe di un RingBufferHandler: un
+    solo insert per chiamata di flush() e al massimo max_lines righe, tolte
+    dall'inizio. Segue la fine del log solo se l'utente non è risalito.
+    """
+
+    def __init__(self, text_area, handler, max_lines=DEFAULT_MAX_LINES):
+        self.text_area = text_area
+        self.handler = handler
+        self.max_lines = max_lines
+
+    def flush(self):
+        lines, dropped = self.handler.drain()
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"... {dropped} righe non mostrate (vedi il file di log)")
+        text_area = self.text_area
+        # "end" equivale a tk.END: il modulo non importa tkinter
+        follow = text_area.yview()[1] >= 1.0
+        text_area.insert("end", "\n".join(lines) + "\n")
+        excess = int(text_area.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            text_area.delete("1.0", f"{excess + 1}.0")
+        if follow:
+            text_area.see("end")
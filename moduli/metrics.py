@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import socket
+import threading
+from time import perf_counter
+
+# Fasi misurate per ogni job, in secondi di orologio e senza sovrapposizioni
+JOB_STAGES = (
+    "probe",
+    "queue_wait",
+    "sample",  # Campioni della ricerca del CRF e della stima della dimensione
+    "encode",
+    "post_process",  # MediaInfo e confronto delle dimensioni
+    "trash",
+    "rename",
+)
+# Intervallo minimo tra due riscritture del file Prometheus durante il batch
+PROMETHEUS_INTERVAL = 10
+
+
+class RunningStats:
+    """Conteggio, media, minimo e massimo di una serie di campioni, senza conservarli."""
+
+    __slots__ = ("count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        if value is None:
+            return  # "N/A" nei primi blocchi di avanzamento
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        if not self.count:
+            return None
+        return {
+            "avg": round(self.mean, 3),
+            "min": round(self.minimum, 3),
+            "max": round(self.maximum, 3),
+            "samples": self.count,
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRecorder:
+    """
+    Metriche strutturate dei batch: una riga JSON per job (durata delle fasi,
+    secondi di video codificati, byte letti e scritti, fps e velocità
+    dell'encoder) e una di riepilogo per batch, più i totali nel formato
+    testuale di Prometheus, per il textfile collector di node_exporter.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, node=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.node = node or socket.gethostname()
+        self.batch_id = None
+        self._lock = threading.Lock()
+        self._prometheus_lock = threading.Lock()
+        self._file = None
+        self._prometheus_written = 0
+        # Totali cumulativi (contatori Prometheus) dall'avvio del processo
+        self.stage_seconds = dict.fromkeys(("scan",) + JOB_STAGES, 0.0)
+        self.stage_count = dict.fromkeys(("scan",) + JOB_STAGES, 0)
+        self.jobs = {}  # stato finale -> numero di job
+        self.media_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Valori dell'ultimo batch (gauge Prometheus)
+        self.batch = {}
+        self.batch_jobs = {}
+        self.batch_media_seconds = 0.0
+        self.fps = RunningStats()
+        self.speed = RunningStats()
+
+    def begin(self, input_folder):
+        """Inizio di un batch: apre il file JSON lines e azzera i valori del batch."""
+        with self._lock:
+            self.batch_id = f"{self.node}-{time.strftime('%Y%m%dT%H%M%S')}"
+            self.batch_jobs = {}
+            self.batch_media_seconds = 0.0
+            self.fps = RunningStats()
+            self.speed = RunningStats()
+            if self.jsonl_path and self._file is None:
+                self._file = open(self.jsonl_path, "a", encoding="utf-8")
+            self._write(
+                {
+                    "event": "batch_start",
+                    "batch": self.batch_id,
+                    "node": self.node,
+                    "time": round(time.time(), 3),
+                    "input_folder": input_folder,
+                }
+            )
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def record_job(self, job):
+        """Registra un job concluso (ConversionJob con timings, fps e speed)."""
+        media_seconds = (
+            (job.duration or 0) if job.status == "completato" else job.media_time
+        )
+        record = {
+            "event": "job",
+            "batch": self.batch_id,
+            "node": self.node,
+            "time": round(time.time(), 3),
+            "path": job.input_path,
+            "status": job.status,
+            "encoder": job.encoder,
+            "quality": job.quality_value,
+            "stages": {
+                stage: round(seconds, 3) for stage, seconds in job.timings.items()
+            },
+            "elapsed": round(job.elapsed, 3),
+            "media_seconds": round(media_seconds, 3),
+            "bytes_in": job.bytes_in,
+            "bytes_out": job.bytes_out,
+            "fps": job.fps.as_dict(),
+            "speed": job.speed.as_dict(),
+        }
+        with self._lock:
+            for stage, seconds in job.timings.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+                self.stage_count[stage] = self.stage_count.get(stage, 0) + 1
+            self.jobs[job.status] = self.jobs.get(job.status, 0) + 1
+            self.batch_jobs[job.status] = self.batch_jobs.get(job.status, 0) + 1
+            self.media_seconds += media_seconds
+            self.batch_media_seconds += media_seconds
+            self.bytes_in += job.bytes_in
+            self.bytes_out += job.bytes_out
+            if job.fps.count:
+                self.fps.add(job.fps.mean)
+            if job.speed.count:
+                self.speed.add(job.speed.mean)
+            self._write(record)
+            due = perf_counter() - self._prometheus_written >= PROMETHEUS_INTERVAL
+        if due:
+            self.write_prometheus()
+
+    def record_batch(self, elapsed, scan_seconds, counters, stopped=False):
+        """Fine del batch: riga di riepilogo e riscrittura del file Prometheus."""
+        with self._lock:
+            self.stage_seconds["scan"] += scan_seconds
+            self.stage_count["scan"] += 1
+            found = counters.get("trovati", 0)
+            self.batch = {
+                "duration_seconds": elapsed,
+                "scan_seconds": scan_seconds,
+                "files": found,
+                "files_per_second": found / elapsed if elapsed else 0,
+                # Secondi di video per secondo di orologio: il throughput del nodo
+                "media_seconds_per_second": self.batch_media_seconds / elapsed
+                if elapsed
+                else 0,
+                "encode_speed": self.speed.mean or 0,
+                "encode_fps": self.fps.mean or 0,
+                "timestamp_seconds": time.time(),
+            }
+            self._write(
+                {
+                    "event": "batch",
+                    "batch": self.batch_id,
+                    "node": self.node,
+                    "time": round(time.time(), 3),
+                    "elapsed": round(elapsed, 3),
+                    "scan_seconds": round(scan_seconds, 3),
+                    "stopped": stopped,
+                    "counters": counters,
+                    "jobs": dict(self.batch_jobs),
+                    "media_seconds": round(self.batch_media_seconds, 3),
+                    "fps": self.fps.as_dict(),
+                    "speed": self.speed.as_dict(),
+                }
+            )
+        self.write_prometheus()
+
+    def prometheus_text(self):
+        """Metriche nel formato di esposizione testuale di Prometheus."""
+        node = f'node="{_escape(self.node)}"'
+        lines = [
+            "# HELP vca_stage_seconds_total Secondi spesi in ogni fase dei job.",
+            "# TYPE vca_stage_seconds_total counter",
+        ]
+        with self._lock:
+            lines += [
+                f'vca_stage_seconds_total{{{node},stage="{stage}"}} {seconds:.3f}'
+                for stage, seconds in self.stage_seconds.items()
+            ]
+            lines += [
+                "# HELP vca_stage_runs_total Esecuzioni di ogni fase.",
+                "# TYPE vca_stage_runs_total counter",
+            ] + [
+                f'vca_stage_runs_total{{{node},stage="{stage}"}} {count}'
+                for stage, count in self.stage_count.items()
+            ]
+            lines += [
+                "# HELP vca_jobs_total Job conclusi per stato.",
+                "# TYPE vca_jobs_total counter",
+            ] + [
+                f'vca_jobs_total{{{node},status="{_escape(status)}"}} {count}'
+                for status, count in sorted(self.jobs.items())
+            ]
+            for name, value, help_text in (
+                ("media_seconds", self.media_seconds, "Secondi di video codificati."),
+                ("bytes_in", self.bytes_in, "Byte dei file di input."),
+                ("bytes_out", self.bytes_out, "Byte dei file prodotti."),
+            ):
+                lines += [
+                    f"# HELP vca_{name}_total {help_text}",
+                    f"# TYPE vca_{name}_total counter",
+                    f"vca_{name}_total{{{node}}} {value:g}",
+                ]
+            for name, value in sorted(self.batch.items()):
+                lines += [
+                    f"# HELP vca_last_batch_{name} Ultimo batch concluso: {name}.",
+                    f"# TYPE vca_last_batch_{name} gauge",
+                    f"vca_last_batch_{name}{{{node}}} {value:.3f}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """Scrittura atomica (file temporaneo + rename), come richiede il textfile collector."""
+        if not self.prometheus_path:
+            return
+        with self._prometheus_lock:
+            self._prometheus_written = perf_counter()
+            temp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as prom_file:
+                    prom_file.write(self.prometheus_text())
+                os.replace(temp_path, self.prometheus_path)
+            except OSError:
+                pass  # Le metriche non devono mai fermare il batch
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
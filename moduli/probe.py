@@ -0,0 +1,249 @@
+import os
+import json
+import subprocess
+from datetime import datetime
+
+# Limiti di analisi per ffprobe: evitano letture lunghe su share di rete lente
+PROBE_SIZE = "2000000"  # Byte letti al massimo per riconoscere i flussi
+ANALYZE_DURATION = "2000000"  # Microsecondi di media analizzati al massimo
+
+# Campi dei flussi conservati nel probe (il resto dell'output viene scartato)
+STREAM_FIELDS = (
+    "index",
+    "codec_type",
+    "codec_name",
+    "width",
+    "height",
+    "pix_fmt",
+    "bit_rate",
+    "channels",
+    "sample_rate",
+    "duration",
+    "start_time",
+    "r_frame_rate",
+    "nb_frames",
+    "bits_per_raw_sample",
+)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_rate(rate):
+    """Converte un frame rate ffprobe ('30000/1001') in float."""
+    if not rate:
+        return None
+    num, _, den = str(rate).partition("/")
+    num, den = _to_float(num), _to_float(den or 1)
+    if not num or not den:
+        return None
+    return num / den
+
+
+class MediaProbe:
+    """Risultato compatto di una singola analisi ffprobe di un file."""
+
+    __slots__ = (
+        "path",
+        "size",
+        "format_name",
+        "duration",
+        "start_time",
+        "bit_rate",
+        "width",
+        "height",
+        "fps",
+        "video_codec",
+        "audio_codec",
+        "streams",
+        "tags",
+    )
+
+    def __init__(
+        self,
+        path,
+        size=None,
+        format_name=None,
+        duration=None,
+        start_time=None,
+        bit_rate=None,
+        width=None,
+        height=None,
+        fps=None,
+        video_codec=None,
+        audio_codec=None,
+        streams=(),
+        tags=None,
+    ):
+        self.path = path
+        self.size = size
+        self.format_name = format_name
+        self.duration = duration  # Secondi
+        # Primo timestamp del file (diverso da 0 in .ts/.mts/.m2ts): -ss conta da qui
+        self.start_time = start_time
+        self.bit_rate = bit_rate  # bit/s
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.video_codec = video_codec
+        self.audio_codec = audio_codec
+        self.streams = list(streams)
+        self.tags = tags or {}  # Tag del contenitore (format tags)
+
+    def __repr__(self):
+        return (
+            f"MediaProbe({self.path!r}, {self.width}x{self.height}, "
+            f"{self.duration}s, {self.bit_rate}bps, {self.video_codec}/{self.audio_codec})"
+        )
+
+    @classmethod
+    def from_ffprobe(cls, path, info, size=None):
+        """Costruisce il probe dall'output JSON di ffprobe (-show_format -show_streams)."""
+        format_info = info.get("format", {})
+        streams = [
+            {key: stream[key] for key in STREAM_FIELDS if key in stream}
+            for stream in info.get("streams", [])
+        ]
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+        duration = _to_float(format_info.get("duration")) or _to_float(
+            video.get("duration")
+        )
+        start_time = _to_float(format_info.get("start_time"))
+        if start_time is None:
+            start_time = _to_float(video.get("start_time"))
+        bit_rate = _to_int(format_info.get("bit_rate"))
+        if size is None and os.path.exists(path):
+            size = os.path.getsize(path)
+        # Alcuni contenitori non riportano il bitrate: lo si ricava da dimensione e durata
+        if bit_rate is None and size and duration:
+            bit_rate = int(size * 8 / duration)
+
+        return cls(
+            path,
+            size=size,
+            format_name=format_info.get("format_name"),
+            duration=duration,
+            start_time=start_time,
+            bit_rate=bit_rate,
+            width=_to_int(video.get("width")),
+            height=_to_int(video.get("height")),
+            fps=_parse_rate(video.get("r_frame_rate")),
+            video_codec=video.get("codec_name"),
+            audio_codec=audio.get("codec_name"),
+            streams=streams,
+            tags=format_info.get("tags", {}),
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def bitrate_kbps(self):
+        return self.bit_rate // 1000 if self.bit_rate is not None else None
+
+    def streams_of(self, codec_type):
+        return [s for s in self.streams if s.get("codec_type") == codec_type]
+
+    def to_mediainfo(self):
+        """Rapporto nel formato usato dai file *_mediainfo.json."""
+        media_info = {"media": {"@ref": self.path, "track": []}}
+        now = datetime.now()
+        media_info["media"]["track"].append(
+            {
+                "@type": "General",
+                "VideoCount": len(self.streams_of("video")),
+                "AudioCount": len(self.streams_of("audio")),
+                "FileExtension": self.path.split(".")[-1],
+                "Format": self.format_name or "N/A",
+                "Duration": str(self.duration) if self.duration else "N/A",
+                "FileSize": self.size,
+                "OverallBitRate": str(self.bit_rate) if self.bit_rate else "N/A",
+                "Recorded_Date": now.year,
+                "File_Created_Date": now.strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+                "File_Modified_Date": now.strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+            }
+        )
+
+        for stream in self.streams:
+            stream_info = {
+                "@type": stream.get("codec_type", "N/A").capitalize(),
+                "StreamOrder": str(stream.get("index", "N/A")),
+                "ID": str(stream.get("index", "N/A")),
+                "Format": stream.get("codec_name", "N/A"),
+                "Duration": stream.get("duration", "N/A"),
+                "BitRate": stream.get("bit_rate", "N/A"),
+            }
+            if stream.get("codec_type") == "video":
+                stream_info.update(
+                    {
+                        "Width": stream.get("width", "N/A"),
+                        "Height": stream.get("height", "N/A"),
+                        "FrameRate": stream.get("r_frame_rate", "N/A"),
+                        "FrameCount": stream.get("nb_frames", "N/A"),
+                        "BitDepth": stream.get("bits_per_raw_sample", "8"),
+                    }
+                )
+            elif stream.get("codec_type") == "audio":
+                stream_info.update(
+                    {
+                        "Channels": stream.get("channels", "N/A"),
+                        "SamplingRate": stream.get("sample_rate", "N/A"),
+                    }
+                )
+            media_info["media"]["track"].append(stream_info)
+
+        return media_info
+
+
+def run_ffprobe(ffprobe_path, file_path, creationflags=0, startupinfo=None):
+    """Esegue una sola invocazione ffprobe JSON e ritorna un MediaProbe (o None)."""
+    command = [
+        ffprobe_path,
+        "-v",
+        "error",
+        "-probesize",
+        PROBE_SIZE,
+        "-analyzeduration",
+        ANALYZE_DURATION,
+        "-show_format",
+        "-show_streams",
+        "-of",
+        "json",
+        file_path,
+    ]
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            creationflags=creationflags,
+            startupinfo=startupinfo,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        info = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return None
+    return MediaProbe.from_ffprobe(file_path, info)
@@ -0,0 +1,133 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+from moduli.probe import MediaProbe
+
+
+class ProbeCache:
+    """
+    Cache su disco (SQLite) dei risultati ffprobe.
+    Ogni voce è valida finché dimensione e mtime del file non cambiano.
+    """
+
+    def __init__(self, db_path, max_entries=200000, commit_every=200):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS probes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS probes_last_used ON probes(last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path, stat=None):
+        """Ritorna il MediaProbe in cache per il file o None se assente/non valido."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return None
+        key = self._key(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, data FROM probes WHERE path = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            size, mtime_ns, data = row
+            if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+                # Il file è cambiato: la voce non è più valida
+                self._conn.execute("DELETE FROM probes WHERE path = ?", (key,))
+                self._mark_dirty()
+                return None
+            self._conn.execute(
+                "UPDATE probes SET last_used = ? WHERE path = ?", (time.time(), key)
+            )
+            self._mark_dirty()
+        try:
+            return MediaProbe.from_dict(json.loads(data))
+        except (TypeError, ValueError):
+            self.invalidate(path)
+            return None
+
+    def put(self, path, probe, stat=None):
+        """Salva il probe del file con la sua dimensione e mtime attuali."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)",
+                (
+                    self._key(path),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    json.dumps(probe.to_dict()),
+                    time.time(),
+                ),
+            )
+            self._mark_dirty()
+
+    def invalidate(self, path):
+        """Rimuove la voce di un file (ad esempio dopo averlo sovrascritto)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM probes WHERE path = ?", (self._key(path),))
+            self._mark_dirty()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM probes")
+            self._conn.commit()
+            self._pending = 0
+
+    def _mark_dirty(self):
+        # Le scritture sono raggruppate per non fare un commit per ogni file
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._evict()
+            self._conn.commit()
+            self._pending = 0
+
+    def _evict(self):
+        """Elimina le voci usate meno di recente oltre max_entries."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM probes WHERE path IN "
+                "(SELECT path FROM probes ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def flush(self):
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
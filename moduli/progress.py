@@ -0,0 +1,143 @@
+import re
+from collections import deque
+
+# Riconosce le righe key=value prodotte da "ffmpeg -progress"
+_KEY_VALUE = re.compile(r"^([a-z0-9_]+)=(.*)$")
+
+# Chiavi di avanzamento conosciute; le altre righe finiscono nel log d'errore
+PROGRESS_KEYS = frozenset(
+    (
+        "frame",
+        "fps",
+        "bitrate",
+        "total_size",
+        "out_time_us",
+        "out_time_ms",
+        "out_time",
+        "dup_frames",
+        "drop_frames",
+        "speed",
+        "progress",
+    )
+)
+
+
+def _number(value, suffix=""):
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[: -len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None  # "N/A" o valori non ancora disponibili
+
+
+class ProgressRecord:
+    """Un blocco di avanzamento di ffmpeg (emesso ogni ~0.5 secondi)."""
+
+    __slots__ = ("out_time", "frame", "fps", "speed", "total_size", "bitrate", "done")
+
+    def __init__(
+        self,
+        out_time=None,
+        frame=None,
+        fps=None,
+        speed=None,
+        total_size=None,
+        bitrate=None,
+        done=False,
+    ):
+        self.out_time = out_time  # Secondi di output già scritti
+        self.frame = frame
+        self.fps = fps
+        self.speed = speed  # Moltiplicatore rispetto al tempo reale
+        self.total_size = total_size  # Byte scritti finora
+        self.bitrate = bitrate  # kbit/s
+        self.done = done
+
+    def __repr__(self):
+        return (
+            f"ProgressRecord(out_time={self.out_time}, fps={self.fps}, "
+            f"speed={self.speed}, total_size={self.total_size}, done={self.done})"
+        )
+
+
+class ProgressParser:
+    """
+    Interpreta l'output di "ffmpeg -progress pipe:1".
+    Le righe che non sono di avanzamento (errori, avvisi) vengono conservate
+    solo nelle ultime error_lines righe, per il rapporto in caso di errore,
+    e passate tutte a sink (se fornito), ad esempio verso il file di log.
+    """
+
+    def __init__(self, error_lines=20, sink=None):
+        self.errors = deque(maxlen=error_lines)
+        self.sink = sink
+        self._fields = {}
+
+    def feed(self, line):
+        """Elabora una riga; ritorna un ProgressRecord alla fine di ogni blocco."""
+        line = line.strip()
+        if not line:
+            return None
+        match = _KEY_VALUE.match(line)
+        if not match or match.group(1) not in PROGRESS_KEYS:
+            self.errors.append(line)
+            if self.sink is not None:
+                self.sink(line)
+            return None
+
+        key, value = match.groups()
+        if key != "progress":
+            self._fields[key] = value
+            return None
+
+        fields, self._fields = self._fields, {}
+        out_time_us = _number(fields.get("out_time_us", "N/A"))
+        if out_time_us is None:
+            out_time_us = _number(fields.get("out_time_ms", "N/A"))
+        total_size = _number(fields.get("total_size", "N/A"))
+        frame = _number(fields.get("frame", "N/A"))
+        return ProgressRecord(
+            out_time=max(out_time_us / 1000000, 0) if out_time_us is not None else None,
+            frame=int(frame) if frame is not None else None,
+            fps=_number(fields.get("fps", "N/A")),
+            speed=_number(fields.get("speed", "N/A"), "x"),
+            total_size=int(total_size) if total_size is not None else None,
+            bitrate=_number(fields.get("bitrate", "N/A"), "kbits/s"),
+            done=value == "end",
+        )
+
+    def error_report(self):
+        return "\n".join(self.errors)
+
+
+class SizeProjection:
+    """
+    Proiezione della dimensione finale dell'output durante la codifica.
+    Segnala il superamento della dimensione dell'originale solo dopo aver
+    codificato almeno min_fraction del video e per confirmations blocchi
+    di avanzamento consecutivi, per non fermarsi su un inizio poco comprimibile.
+    """
+
+    def __init__(self, input_size, duration, min_fraction=0.1, margin=1.05, confirmations=3):
+        self.input_size = input_size
+        self.duration = duration
+        self.min_fraction = min_fraction
+        self.margin = margin  # Tolleranza sopra la dimensione dell'originale
+        self.confirmations = confirmations
+        self.projected = None  # Byte previsti a fine codifica
+        self._over = 0
+
+    def update(self, out_time, total_size):
+        """Aggiorna la proiezione; ritorna True se l'output sarà sicuramente più grande."""
+        if not self.duration or not out_time or not total_size:
+            return False
+        self.projected = int(total_size / out_time * self.duration)
+        if out_time < self.duration * self.min_fraction:
+            return False
+        if self.projected > self.input_size * self.margin:
+            self._over += 1
+        else:
+            self._over = 0
+        return self._over >= self.confirmations
@@ -0,0 +1,211 @@
+import re
+import math
+import sqlite3
+import threading
+
+from moduli.capabilities import quality_mode
+from moduli.converted_index import fingerprint
+from moduli.sampling import SEARCH_BUDGET
+
+# Valori riportati dai filtri ssim/psnr di ffmpeg alla fine dell'analisi
+_SSIM_ALL = re.compile(r"SSIM .*All:([0-9.]+)")
+_PSNR_AVERAGE = re.compile(r"PSNR .*average:([0-9.]+|inf)")
+
+# Intervallo di ricerca per modalità dell'encoder (CRF per x264/x265, CQ per
+# NVENC; mpeg4 converte la scala CRF nel suo quantizzatore)
+QUALITY_RANGES = {"crf": (18, 36), "cq": (16, 36)}
+# Valori provati al massimo per file (ognuno codifica e confronta tutti i campioni)
+MAX_CANDIDATES = 4
+
+
+def parse_score(metric, output):
+    """Estrae il punteggio (SSIM 0-1 o PSNR in dB) dall'output di ffmpeg."""
+    pattern = _SSIM_ALL if metric == "ssim" else _PSNR_AVERAGE
+    matches = pattern.findall(output)
+    if not matches:
+        return None
+    return float("inf") if matches[-1] == "inf" else float(matches[-1])
+
+
+class QualityCache:
+    """Decisioni della ricerca (valore CRF/CQ scelto) per impronta del contenuto."""
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS decisions (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                score REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, score FROM decisions WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def put(self, key, value, score):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)", (key, value, score)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QualitySearch:
+    """
+    Sceglie per ogni file il CRF/CQ più alto che rispetta l'obiettivo di qualità.
+    Codifica alcuni brevi campioni del video a valori candidati, li confronta
+    con l'originale tramite i filtri ssim/psnr di ffmpeg e restringe
+    l'intervallo per bisezione, partendo dalla stima per risoluzione di Utils.
+    Sui file corti si provano meno valori, vicini alla stima.
+    """
+
+    def __init__(self, sampler, cache=None):
+        self.sampler = sampler  # SampleEncoder del job
+        self.engine = sampler.engine
+        self.options = sampler.options
+        self.cache = cache
+        self.reason = ""  # Perché la ricerca non ha scelto un valore (per il log)
+
+    def _cache_key(self, job):
+        options = self.options
+        return ":".join(
+            (
+                fingerprint(job.input_path),
+                job.encoder,
+                quality_mode(job.encoder),
+                options.quality_metric,
+                str(options.quality_target),
+            )
+        )
+
+    def measure(self, value):
+        """Punteggio medio dei campioni codificati con il valore indicato."""
+        sampler, engine, job = self.sampler, self.engine, self.sampler.job
+        length = self.options.quality_sample_length
+        scores = []
+        for index, start in enumerate(sampler.points()):
+            if job.stopped:
+                return None
+            sample_path = sampler.encode(value, index, start)
+            if sample_path is None:
+                return None
+            # Il riferimento passa per lo stesso filtro di scala dell'output
+            compare = [
+                engine.ffmpeg_path,
+                "-hide_banner",
+                "-nostats",
+                "-i",
+                sample_path,
+                "-ss",
+                f"{start:.3f}",
+                "-t",
+                str(length),
+                "-i",
+                job.input_path,
+                "-lavfi",
+                f"[1:v]{engine.scale_filter(sampler.width, sampler.height)}[ref];"
+                f"[0:v][ref]{self.options.quality_metric}",
+                "-f",
+                "null",
+                "-",
+            ]
+            output = sampler.run(compare)
+            score = parse_score(self.options.quality_metric, output or "")
+            if score is None:
+                return None
+            scores.append(score)
+        return sum(scores) / len(scores)
+
+    @staticmethod
+    def candidates(low, high):
+        """Valori misurati dalla bisezione su [low, high], entro MAX_CANDIDATES."""
+        return min(math.ceil(math.log2(high - low + 2)), MAX_CANDIDATES)
+
+    def guess(self, mode, low, high):
+        """Primo candidato: la stima basata sulla sola risoluzione."""
+        utls = self.engine.utls
+        width, height = self.sampler.width, self.sampler.height
+        if mode == "cq":
+            guess = utls.get_dynamic_cq(width, height, low, high)
+        else:
+            guess = utls.get_dynamic_crf(width, height, low, high)
+        return min(max(guess or (low + high) // 2, low), high)
+
+    def search(self):
+        """
+        Ritorna (valore, punteggio) per il job, o None se la ricerca non è
+        applicabile o fallisce (si usa allora il valore fisso delle impostazioni).
+        """
+        options, job = self.options, self.sampler.job
+        mode = quality_mode(job.encoder)
+        low, high = QUALITY_RANGES.get(mode, QUALITY_RANGES["crf"])
+        # Ogni candidato codifica tutti i campioni e li confronta con l'originale
+        candidates = min(
+            self.candidates(low, high),
+            self.sampler.affordable(compare=True, budget=SEARCH_BUDGET),
+        )
+        if candidates < 1:
+            self.reason = (
+                f"video troppo corto ({job.duration or 0:.0f} s), i campioni "
+                f"costerebbero più del {SEARCH_BUDGET:.0%} della codifica"
+            )
+            return None
+        key = None
+        if self.cache is not None:
+            try:
+                key = self._cache_key(job)
+            except OSError:
+                key = None
+            cached = self.cache.get(key) if key else None
+            if cached:
+                return cached
+
+        value = self.guess(mode, low, high)
+        # Con n candidati la bisezione distingue 2^n - 1 valori: si cerca
+        # intorno alla stima invece che sull'intero intervallo
+        radius = 2 ** (candidates - 1) - 1
+        low, high = max(low, value - radius), min(high, value + radius)
+
+        best = None
+        closest = None  # Miglior punteggio misurato, per il log
+        for _ in range(candidates):
+            if low > high:
+                break
+            score = self.measure(value)
+            if score is None:
+                # Encoder in errore o stop: niente ricerca
+                self.reason = "codifica o confronto dei campioni non riuscito"
+                return None
+            if closest is None or score > closest[1]:
+                closest = (value, score)
+            if score >= options.quality_target:
+                best = (value, score)
+                low = value + 1  # Qualità sufficiente: si prova a comprimere di più
+            else:
+                high = value - 1
+            value = (low + high) // 2
+
+        if best is None:
+            # Nessun valore misurato raggiunge l'obiettivo: si usa quello delle
+            # impostazioni, senza registrare nella cache una scelta non misurata
+            self.reason = (
+                f"nessun valore raggiunge {options.quality_metric.upper()} "
+                f"{options.quality_target} (massimo {closest[1]:.4f} con {closest[0]})"
+            )
+            return None
+        if key:
+            self.cache.put(key, *best)
+        return best
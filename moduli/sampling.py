@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+
+# Bitrate audio dell'output (vedi ConversionEngine.output_args), in bit/s
+AUDIO_BITRATE = 128000
+# Overhead del contenitore MP4 stimato sulla dimensione totale
+CONTAINER_OVERHEAD = 1.01
+# Secondi di video elaborati dai campioni, al massimo, per secondo del file:
+# 5% per la stima della dimensione, 25% per la ricerca del CRF/CQ (attivata
+# esplicitamente e ripagata da un output più piccolo)
+SAMPLING_BUDGET = 0.05
+SEARCH_BUDGET = 0.25
+# Costo del confronto ssim/psnr di un campione rispetto alla sua codifica:
+# solo decodifica dei due flussi e filtro, nessuna codifica
+COMPARE_COST = 0.25
+
+
+class SampleEncoder:
+    """
+    Codifica di brevi campioni (solo video) di un file con le impostazioni
+    del job. Usata dalla ricerca del CRF e dalla stima della dimensione finale;
+    i campioni già codificati a un certo valore vengono riusati.
+    """
+
+    def __init__(self, engine, job, width, height):
+        self.engine = engine
+        self.job = job
+        self.width = width
+        self.height = height
+        self.options = engine.options
+        self.workdir = None
+        self.sizes = {}  # valore CRF/CQ -> {indice campione: byte}
+
+    def points(self):
+        """Inizio dei campioni, distribuiti uniformemente nel video."""
+        count = max(1, self.options.quality_samples)
+        return [self.job.duration * (i + 1) / (count + 1) for i in range(count)]
+
+    def cost(self, candidates=1, compare=False):
+        """
+        Secondi di codifica equivalenti per i campioni a candidates valori;
+        con compare anche il confronto ssim/psnr di ogni campione con l'originale.
+        """
+        options = self.options
+        sampled = max(1, options.quality_samples) * options.quality_sample_length
+        return sampled * candidates * (1 + COMPARE_COST if compare else 1)
+
+    def affordable(self, compare=False, budget=SAMPLING_BUDGET):
+        """Valori che si possono provare sui campioni entro budget della codifica completa."""
+        duration = self.job.duration
+        if not duration:
+            return 0
+        return int(duration * budget // self.cost(1, compare))
+
+    def worthwhile(self, candidates=1, compare=False, budget=SAMPLING_BUDGET):
+        """True se i campioni costano al massimo budget della codifica completa."""
+        return self.affordable(compare, budget) >= candidates
+
+    def run(self, command):
+        """Esegue ffmpeg (interrompibile dallo stop del job); ritorna l'output o None."""
+        job = self.job
+        process = self.engine.run_ffmpeg_command(command)
+        if process is None:
+            return None
+        job.process = process
+        if job.stopped:
+            process.terminate()
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            if not job.stopped:
+                job.error = output.strip()
+            return None
+        return output
+
+    def path(self, value, index):
+        if self.workdir is None:
+            self.workdir = tempfile.mkdtemp(prefix="vca_samples_")
+        return os.path.join(self.workdir, f"{value}_{index}.mkv")
+
+    def encode(self, value, index, start):
+        """Codifica il campione index al valore indicato; ritorna il percorso o None."""
+        path = self.path(value, index)
+        if index in self.sizes.get(value, {}):
+            return path
+        engine, job = self.engine, self.job
+        command = (
+            [engine.ffmpeg_path, "-y", "-hide_banner", "-nostats", "-loglevel", "error"]
+            + engine.input_args(job.encoder)
+            + [
+                "-ss",
+                f"{start:.3f}",
+                "-t",
+                str(self.options.quality_sample_length),
+                "-i",
+                job.input_path,
+            ]
+            + ["-map", "0:v:0", "-an", "-sn", "-dn"]
+            + engine.video_args(self.width, self.height, job.encoder, quality=value)
+            + ["-f", "matroska", path]
+        )
+        if self.run(command) is None:
+            return None
+        try:
+            self.sizes.setdefault(value, {})[index] = os.path.getsize(path)
+        except OSError:
+            return None
+        return path
+
+    def predict_size(self, value):
+        """Dimensione prevista dell'output completo (byte), o None se non stimabile."""
+        points = self.points()
+        for index, start in enumerate(points):
+            if self.job.stopped or self.encode(value, index, start) is None:
+                return None
+        sampled_seconds = len(points) * self.options.quality_sample_length
+        video_rate = sum(self.sizes[value].values()) / sampled_seconds
+        audio_rate = AUDIO_BITRATE / 8 if self.job.probe and self.job.probe.audio_codec else 0
+        return int((video_rate + audio_rate) * self.job.duration * CONTAINER_OVERHEAD)
+
+    def close(self):
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
@@ -0,0 +1,107 @@
+import os
+from fnmatch import fnmatchcase
+
+VIDEO_EXTENSIONS = (
+    ".3gp",
+    ".avi",
+    ".flv",
+    ".h264",
+    ".hevc",
+    ".mkv",
+    ".mov",
+    ".mp4",
+    ".mpeg",
+    ".mpg",
+    ".mpeg4",
+    ".mts",
+    ".ogv",
+    ".ts",
+    ".vob",
+    ".webm",
+    ".wmv",
+    ".divx",
+    ".xvid",
+    ".m4v",
+    ".rm",
+    ".rmvb",
+    ".mxf",
+    ".amv",
+)
+
+# File prodotti dal convertitore stesso, da non riconvertire
+DEFAULT_EXCLUDES = ("*_nw.mp4", "*_mediainfo.json")
+
+
+def parse_patterns(value):
+    """Converte una lista separata da virgole (da config.ini) in una tupla di glob."""
+    return tuple(p.strip() for p in (value or "").split(",") if p.strip())
+
+
+class VideoScanner:
+    """
+    Scansione incrementale di una cartella basata su os.scandir.
+    I percorsi vengono prodotti man mano, senza costruire l'elenco completo.
+    """
+
+    def __init__(
+        self,
+        extensions=VIDEO_EXTENSIONS,
+        exclude=DEFAULT_EXCLUDES,
+        max_depth=None,
+        follow_symlinks=False,
+        on_error=None,
+    ):
+        # Confronti case-insensitive: .MP4 e .MKV delle videocamere sono inclusi
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.exclude = tuple(p.lower() for p in exclude)
+        self.max_depth = max_depth  # None = nessun limite, 0 = solo la radice
+        self.follow_symlinks = follow_symlinks
+        self.on_error = on_error
+
+    def _excluded(self, name):
+        return any(fnmatchcase(name, pattern) for pattern in self.exclude)
+
+    def scan(self, root):
+        """Generatore dei percorsi dei video trovati sotto root."""
+        stack = [(root, 0)]
+        visited = set()  # (dispositivo, inode) delle cartelle, contro i cicli di link
+        while stack:
+            directory, depth = stack.pop()
+            if self.follow_symlinks:
+                try:
+                    stat = os.stat(directory)
+                except OSError as e:
+                    self._error(e)
+                    continue
+                if (stat.st_dev, stat.st_ino) in visited:
+                    continue
+                visited.add((stat.st_dev, stat.st_ino))
+
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        name = entry.name.lower()
+                        try:
+                            if entry.is_symlink() and not self.follow_symlinks:
+                                continue
+                            if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                                if self.max_depth is None or depth < self.max_depth:
+                                    if not self._excluded(name):
+                                        subdirs.append(entry.path)
+                                continue
+                        except OSError as e:
+                            self._error(e)
+                            continue
+                        if name.endswith(self.extensions) and not self._excluded(name):
+                            yield entry.path
+            except OSError as e:
+                self._error(e)
+                continue
+
+            # Ordine inverso: le sottocartelle vengono visitate in ordine alfabetico
+            stack.extend((path, depth + 1) for path in sorted(subdirs, reverse=True))
+
+    def _error(self, error):
+        if self.on_error:
+            self.on_error(error)
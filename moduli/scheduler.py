@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+
+from moduli.capabilities import HARDWARE_SUFFIXES
+
+
+def is_rotational(device):
+    """
+    True se il dispositivo (st_dev) è un disco meccanico, False se è un SSD,
+    None se non si può stabilire (es. Windows, dischi di rete).
+    """
+    if not os.path.isdir("/sys/dev/block"):
+        return None
+    base = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    # Per una partizione le informazioni sono nel disco che la contiene
+    for path in (
+        os.path.join(base, "queue", "rotational"),
+        os.path.join(base, "..", "queue", "rotational"),
+    ):
+        try:
+            with open(path, "r") as rotational_file:
+                return rotational_file.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def encoder_class(encoder):
+    """Classe di risorsa dell'encoder: "hw:<famiglia>" per la GPU, "cpu" altrimenti."""
+    for suffix in HARDWARE_SUFFIXES:
+        if encoder.endswith(suffix):
+            return "hw:" + suffix.lstrip("_")
+    return "cpu"
+
+
+class JobScheduler:
+    """
+    Assegna i job agli encoder rispettando i limiti delle risorse:
+    sessioni contemporanee per encoder hardware e job per disco (sorgente e
+    destinazione). Un job che non può partire non blocca quelli dietro di lui:
+    viene scelto il primo job in attesa le cui risorse sono libere.
+    Un job a segmenti occupa una sessione hardware per ogni processo ffmpeg
+    che avvia insieme (sessions_for).
+    """
+
+    def __init__(
+        self,
+        max_jobs,
+        hw_sessions=3,
+        disk_jobs=0,
+        window=None,
+        encoder_for=None,
+        sessions_for=None,
+        stop_event=None,
+    ):
+        self.max_jobs = max(1, max_jobs)
+        self.hw_sessions = hw_sessions  # 0 = nessun limite
+        self.disk_jobs = disk_jobs  # 0 = automatico (1 sui dischi meccanici)
+        self.window = window or self.max_jobs * 2  # Job in attesa esaminati
+        self.encoder_for = encoder_for or (lambda job: "cpu")
+        self.sessions_for = sessions_for or (lambda job: 1)
+        self.stop_event = stop_event or threading.Event()
+        self.cores = os.cpu_count() or 1
+        self._pending = []
+        self._finished = False
+        self._in_use = {}  # risorsa -> unità in uso (job o sessioni hardware)
+        self._resources = {}  # job -> risorse assegnate
+        self._rotational = {}  # st_dev -> disco meccanico?
+        self._cond = threading.Condition()
+
+    def threads(self, encoder, parallel=1):
+        """
+        Thread da assegnare a un processo ffmpeg: i core vengono divisi tra
+        tutti i processi CPU che possono girare insieme. None per la GPU.
+        """
+        if encoder_class(encoder) != "cpu":
+            return None
+        processes = self.max_jobs * max(1, parallel)
+        if processes <= 1:
+            return None  # Un solo processo: ffmpeg usa già tutti i core
+        return max(1, self.cores // processes)
+
+    def _device(self, path):
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return None
+
+    def _disk_cap(self, device):
+        if self.disk_jobs:
+            return self.disk_jobs
+        if device not in self._rotational:
+            self._rotational[device] = is_rotational(device)
+        return 1 if self._rotational[device] else None
+
+    def _requirements(self, job):
+        """Risorse necessarie al job: risorsa -> (limite, unità occupate)."""
+        requirements = {}
+        kind = encoder_class(self.encoder_for(job))
+        if kind != "cpu" and self.hw_sessions:
+            # Oltre il limite non si va: il job attende che la GPU sia libera
+            sessions = min(max(1, self.sessions_for(job)), self.hw_sessions)
+            requirements[kind] = (self.hw_sessions, sessions)
+        output_dir = os.path.dirname(os.path.abspath(job.output_path))
+        # Sorgente e destinazione sullo stesso disco contano una volta sola
+        for device in {self._device(job.input_path), self._device(output_dir)}:
+            if device is None:
+                continue
+            cap = self._disk_cap(device)
+            if cap:
+                requirements[f"disk:{device}"] = (cap, 1)
+        return requirements
+
+    def _fits(self, requirements):
+        return all(
+            self._in_use.get(resource, 0) + units <= cap
+            for resource, (cap, units) in requirements.items()
+        )
+
+    def _fill(self, job_queue):
+        while len(self._pending) < self.window and not self._finished:
+            try:
+                job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                self._finished = True  # Fine della coda
+            else:
+                self._pending.append((job, self._requirements(job)))
+
+    def take(self, job_queue):
+        """Ritorna il prossimo job eseguibile, o None quando la coda è finita."""
+        with self._cond:
+            while True:
+                self._fill(job_queue)
+                for index, (job, requirements) in enumerate(self._pending):
+                    # Con lo stop i job vengono rilasciati subito (saranno annullati)
+                    if self.stop_event.is_set() or self._fits(requirements):
+                        del self._pending[index]
+                        for resource, (_, units) in requirements.items():
+                            self._in_use[resource] = self._in_use.get(resource, 0) + units
+                        self._resources[id(job)] = requirements
+                        return job
+                if self._finished and not self._pending:
+                    return None
+                # Risorse occupate o coda vuota: si riprova a un rilascio o tra poco
+                self._cond.wait(0.2)
+
+    def release(self, job):
+        with self._cond:
+            for resource, (_, units) in self._resources.pop(id(job), {}).items():
+                self._in_use[resource] -= units
+            self._cond.notify_all()
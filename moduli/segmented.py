@@ -0,0 +1,309 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from moduli.progress import ProgressParser
+
+# Cartella temporanea dei segmenti, accanto all'output (stesso filesystem)
+SEGMENTS_SUFFIX = ".segments"
+# Estensione dei segmenti: non è tra quelle video, lo scanner li ignora
+SEGMENT_EXT = ".seg"
+
+
+def parse_keyframes(output, start_time=0.0):
+    """
+    Tempi dei keyframe dall'output csv di ffprobe (pts_time,flags), contati
+    dall'inizio del file come -ss: pts_time è assoluto e parte da start_time.
+    """
+    times = set()
+    for line in output.splitlines():
+        pts_time, _, flags = line.strip().partition(",")
+        if "K" not in flags:
+            continue  # Il pacchetto letto non è un keyframe: punto scartato
+        try:
+            times.add(round(float(pts_time) - start_time, 6))
+        except ValueError:
+            continue
+    return sorted(times)
+
+
+def keyframe_times(
+    ffprobe_path, input_path, targets, creationflags=0, startupinfo=None, start_time=0.0
+):
+    """
+    Ritorna i keyframe più vicini ai tempi richiesti (in secondi dall'inizio
+    del file; start_time è il primo timestamp riportato da ffprobe).
+    Con -read_intervals ffprobe salta a ogni punto e legge un solo pacchetto,
+    quindi il costo non dipende dalla lunghezza del file.
+    """
+    if not targets:
+        return []
+    command = [
+        ffprobe_path,
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-read_intervals",
+        # -read_intervals usa timestamp assoluti
+        ",".join(f"{target + start_time:.3f}%+#1" for target in targets),
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+        input_path,
+    ]
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            errors="replace",
+            creationflags=creationflags,
+            startupinfo=startupinfo,
+        )
+    except OSError:
+        return []
+    if result.returncode != 0:
+        return []
+    return parse_keyframes(result.stdout, start_time)
+
+
+class SegmentedEncode:
+    """
+    Codifica di un singolo video lungo a segmenti paralleli.
+    Il video viene diviso ai keyframe, ogni segmento (solo video) è codificato
+    da un processo ffmpeg separato e alla fine i segmenti vengono uniti senza
+    ricodifica con il demuxer concat; l'audio viene codificato una sola volta
+    durante l'unione.
+    """
+
+    def __init__(self, engine, job, width, height):
+        self.engine = engine
+        self.job = job
+        self.width = width
+        self.height = height
+        self.options = engine.options
+        self.segments_dir = job.output_path + SEGMENTS_SUFFIX
+        self._lock = threading.Lock()
+        self._media_times = []  # Secondi codificati per segmento
+        self._sizes = []  # Byte scritti per segmento
+        self._projection = engine.size_projection(job)
+        self._failed = False
+        # Segmenti codificati insieme (entro le sessioni dell'encoder hardware)
+        self.workers = engine.segment_workers(job)
+
+    def boundaries(self):
+        """Punti di taglio [0, k1, ..., durata] allineati ai keyframe."""
+        duration = self.job.duration
+        length = max(1, self.options.segment_length)
+        targets = [length * i for i in range(1, int(duration // length) + 1)]
+        # Un ultimo segmento troppo corto non vale un processo in più
+        targets = [t for t in targets if duration - t > length / 4]
+        keyframes = keyframe_times(
+            self.engine.ffprobe_path,
+            self.job.input_path,
+            targets,
+            self.engine.creationflags,
+            self.engine.startupinfo,
+            (self.job.probe.start_time if self.job.probe else None) or 0.0,
+        )
+        return [0.0] + [k for k in keyframes if 0 < k < duration] + [duration]
+
+    def segment_command(self, index, start, end, path):
+        command = [
+            self.engine.ffmpeg_path,
+            "-y",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "error",
+            "-progress",
+            "pipe:1",
+        ] + self.engine.input_args(self.job.encoder)
+        command += ["-ss", f"{start:.6f}", "-i", self.job.input_path]
+        if end < self.job.duration:
+            command += ["-t", f"{end - start:.6f}"]
+        return (
+            command
+            + ["-map", "0:v:0", "-an", "-sn", "-dn"]
+            + self.engine.video_args(
+                self.width,
+                self.height,
+                self.job.encoder,
+                self.workers,
+                self.job.quality_value,
+            )
+            + ["-f", "matroska", path]
+        )
+
+    def concat_command(self, list_path):
+        return (
+            [
+                self.engine.ffmpeg_path,
+                "-y",
+                "-hide_banner",
+                "-nostats",
+                "-loglevel",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_path,
+                "-i",
+                self.job.input_path,
+                "-map",
+                "0:v:0",
+                "-map",
+                "1:a:0?",
+                "-c:v",
+                "copy",
+            ]
+            + self.engine.output_args(
+                self.job.encoder, self.job.quality_value, self.job.copy_audio
+            )
+            + [self.job.output_path]
+        )
+
+    def _update_progress(self, start_time):
+        job = self.job
+        with self._lock:
+            job.media_time = min(sum(self._media_times), job.duration)
+        elapsed = perf_counter() - start_time
+        # La percentuale resta sotto il 100 finché i segmenti non sono uniti
+        job.progress = min(job.media_time / job.duration * 100, 99.0)
+        if job.media_time:
+            job.remaining = elapsed * (job.duration - job.media_time) / job.media_time
+        self.engine._job_changed(job)
+
+    def _terminate_all(self):
+        with self._lock:
+            processes = list(self.job.processes)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    def _encode_segment(self, index, start, end, path, start_time):
+        job = self.job
+        if job.stopped or job.oversize or self._failed:
+            return False
+        process = self.engine.run_ffmpeg_command(
+            self.segment_command(index, start, end, path)
+        )
+        if process is None:
+            self._failed = True
+            return False
+        with self._lock:
+            job.processes.append(process)
+        if job.stopped:
+            process.terminate()
+
+        parser = ProgressParser(
+            sink=self.engine.stderr_sink(self.job, f"segmento {index}")
+        )
+        try:
+            for line in process.stdout:
+                record = parser.feed(line)
+                if record is None or record.out_time is None:
+                    continue
+                job.last_progress = record
+                with self._lock:
+                    job.fps.add(record.fps)
+                    job.speed.add(record.speed)
+                    self._media_times[index] = min(record.out_time, end - start)
+                    self._sizes[index] = record.total_size or self._sizes[index]
+                    oversize = (
+                        self._projection is not None
+                        and not job.oversize
+                        and self._projection.update(
+                            sum(self._media_times), sum(self._sizes)
+                        )
+                    )
+                if oversize:
+                    self.engine._stop_oversize(job, self._projection)
+                    self._terminate_all()
+                    break
+                self._update_progress(start_time)
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if process.returncode != 0:
+            # Solo il primo errore viene riportato; gli altri segmenti sono stati fermati
+            if not job.stopped and not job.oversize and not self._failed:
+                self._failed = True
+                job.error = parser.error_report()
+                self.engine.logger.log(
+                    f"FFmpeg ha restituito il codice {process.returncode} per il segmento {index + 1} di {job.input_path}:\n{parser.error_report()}",
+                    level="error",
+                )
+                self._terminate_all()  # Inutile continuare con gli altri segmenti
+            return False
+        return True
+
+    def run(self):
+        """Codifica e unisce i segmenti; ritorna True se l'output è stato scritto."""
+        job = self.job
+        bounds = self.boundaries()
+        count = len(bounds) - 1
+        self.engine.logger.log(
+            f"Conversione di {os.path.basename(job.input_path)} in {count} segmenti paralleli"
+        )
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+        os.makedirs(self.segments_dir)
+        try:
+            paths = [
+                os.path.join(self.segments_dir, f"{i:05d}{SEGMENT_EXT}")
+                for i in range(count)
+            ]
+            self._media_times = [0.0] * count
+            self._sizes = [0] * count
+            start_time = perf_counter()
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(
+                    pool.map(
+                        self._encode_segment,
+                        range(count),
+                        bounds[:-1],
+                        bounds[1:],
+                        paths,
+                        [start_time] * count,
+                    )
+                )
+            if job.stopped or job.oversize or not all(results):
+                return False
+
+            list_path = os.path.join(self.segments_dir, "segments.txt")
+            with open(list_path, "w", encoding="utf-8") as list_file:
+                for path in paths:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    list_file.write(f"file '{escaped}'\n")
+
+            self.engine.logger.log(
+                f"Unione dei segmenti di {os.path.basename(job.input_path)}"
+            )
+            process = self.engine.run_ffmpeg_command(self.concat_command(list_path))
+            if process is None:
+                return False
+            job.process = process
+            if job.stopped:
+                process.terminate()
+            output, _ = process.communicate()
+            if job.stopped:
+                return False
+            if process.returncode != 0:
+                job.error = output.strip()
+                self.engine.logger.log(
+                    f"FFmpeg ha restituito il codice {process.returncode} unendo i segmenti di {job.input_path}:\n{output.strip()}",
+                    level="error",
+                )
+                return False
+            return True
+        finally:
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
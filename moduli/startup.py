@@ -0,0 +1,103 @@
+import sys
+import threading
+from time import perf_counter
+
+# Budget predefinito per la prima finestra disegnata (millisecondi)
+DEFAULT_BUDGET_MS = 800
+
+
+class _TimedLoader:
+    """Loader che misura exec_module del loader originale."""
+
+    def __init__(self, loader, name, timer):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        timer = self._timer
+        if threading.get_ident() != timer._thread:
+            # Solo gli import del thread principale fanno parte dell'avvio
+            return self._loader.exec_module(module)
+        timer._stack.append(0.0)
+        start = perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            cumulative = perf_counter() - start
+            children = timer._stack.pop()
+            if timer._stack:
+                timer._stack[-1] += cumulative
+            timer.imports[self._name] = (cumulative - children, cumulative)
+
+
+class StartupTimer:
+    """
+    Tempi di avvio dell'interfaccia: fasi segnate con mark() e, come
+    "python -X importtime", il tempo di ogni import (proprio e cumulativo).
+    """
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.marks = []  # (fase, secondi dall'avvio)
+        self.imports = {}  # modulo -> (secondi propri, secondi cumulativi)
+        self._stack = []  # Tempo degli import figli, per ogni import in corso
+        self._thread = threading.get_ident()
+
+    def find_spec(self, name, path, target=None):
+        """Finder di sys.meta_path: delega agli altri finder e avvolge il loader."""
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def mark(self, phase):
+        self.marks.append((phase, perf_counter() - self.start))
+
+    def report(self, budget_ms=DEFAULT_BUDGET_MS, top=15, stream=None):
+        """Stampa fasi e import più lenti; ritorna True se l'avvio è nel budget."""
+        stream = stream or sys.stderr
+        self.uninstall()
+        previous = 0.0
+        print("Tempi di avvio (ms):", file=stream)
+        for phase, elapsed in self.marks:
+            print(
+                f"  {phase:<24} {elapsed * 1000:8.1f}  (+{(elapsed - previous) * 1000:.1f})",
+                file=stream,
+            )
+            previous = elapsed
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        print(f"Import più lenti (proprio | cumulativo, ms), primi {top}:", file=stream)
+        for name, (own, cumulative) in slowest[:top]:
+            print(f"  {own * 1000:8.1f} | {cumulative * 1000:8.1f}  {name}", file=stream)
+        total_ms = previous * 1000
+        within = total_ms <= budget_ms
+        print(
+            f"Totale {total_ms:.0f} ms, budget {budget_ms} ms"
+            + ("" if within else " - OLTRE IL BUDGET"),
+            file=stream,
+            flush=True,
+        )
+        return within
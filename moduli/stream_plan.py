@@ -0,0 +1,90 @@
+# Codec prodotto da ciascun encoder proposto (se le capacità non lo dicono)
+ENCODER_CODECS = {
+    "libx264": "h264",
+    "h264_nvenc": "h264",
+    "libx265": "hevc",
+    "hevc_nvenc": "hevc",
+    "vp8": "vp8",
+    "vp9": "vp9",
+    "mpeg4": "mpeg4",
+    "libaom-av1": "av1",
+}
+
+# Risoluzione massima dell'output (vedi ConversionEngine.scale_filter)
+MAX_WIDTH, MAX_HEIGHT = 1280, 720
+# Bitrate video massimo (kbps) di un flusso già efficiente da copiare, se
+# copy_bitrate_max non è impostato (e comunque non oltre bitrate_max)
+COPY_BITRATE_MAX = 2500
+# Contenitore dell'output: i file già in MP4 e conformi non vanno rimuxati
+OUTPUT_EXTENSION = ".mp4"
+# Audio copiato così com'è se già AAC e non oltre il bitrate dell'output
+AUDIO_COPY_CODECS = ("aac",)
+AUDIO_MAX_BITRATE = 128000
+
+
+class StreamPlan:
+    """Quali flussi del file possono essere copiati invece che ricodificati."""
+
+    __slots__ = ("copy_video", "copy_audio", "reason")
+
+    def __init__(self, copy_video=False, copy_audio=False, reason=""):
+        self.copy_video = copy_video
+        self.copy_audio = copy_audio
+        self.reason = reason  # Perché il video va ricodificato (per il log)
+
+    def __repr__(self):
+        return f"StreamPlan(copy_video={self.copy_video}, copy_audio={self.copy_audio})"
+
+
+def video_bitrate(probe, video):
+    """Bitrate del flusso video in bit/s (dal flusso o dal totale meno l'audio)."""
+    bit_rate = video.get("bit_rate")
+    try:
+        return int(bit_rate)
+    except (TypeError, ValueError):
+        pass
+    if not probe.bit_rate:
+        return None
+    audio = sum(int(s.get("bit_rate") or 0) for s in probe.streams_of("audio"))
+    return probe.bit_rate - audio
+
+
+def plan_streams(probe, target_codec, copy_bitrate_max):
+    """
+    Decide dal probe se video e audio sono già conformi all'output:
+    stesso codec, risoluzione entro 1280x720, yuv420p e bitrate video non
+    oltre copy_bitrate_max (kbps, 0 = mai copiare il video).
+    """
+    if probe is None:
+        return StreamPlan(reason="probe non disponibile")
+    audio = probe.streams_of("audio")
+    first_audio = audio[0] if audio else {}
+    audio_rate = first_audio.get("bit_rate")
+    try:
+        audio_rate = int(audio_rate)
+    except (TypeError, ValueError):
+        audio_rate = None
+    copy_audio = (
+        first_audio.get("codec_name") in AUDIO_COPY_CODECS
+        and audio_rate is not None
+        and audio_rate <= AUDIO_MAX_BITRATE
+    )
+
+    videos = probe.streams_of("video")
+    if not videos:
+        return StreamPlan(copy_audio=copy_audio, reason="nessun flusso video")
+    video = videos[0]
+    bitrate = video_bitrate(probe, video)
+    if not copy_bitrate_max:
+        reason = "copia del video disattivata"
+    elif video.get("codec_name") != target_codec:
+        reason = f"codec {video.get('codec_name')}"
+    elif (video.get("width") or 0) > MAX_WIDTH or (video.get("height") or 0) > MAX_HEIGHT:
+        reason = f"risoluzione {video.get('width')}x{video.get('height')}"
+    elif video.get("pix_fmt") != "yuv420p":
+        reason = f"formato pixel {video.get('pix_fmt')}"
+    elif bitrate is None or bitrate > copy_bitrate_max * 1000:
+        reason = f"bitrate {bitrate // 1000 if bitrate else '?'} kbps"
+    else:
+        return StreamPlan(copy_video=True, copy_audio=copy_audio or not audio)
+    return StreamPlan(copy_audio=copy_audio, reason=reason)
@@ -1,13 +1,13 @@
-import subprocess, json, os
-import tkinter as tk
-from datetime import datetime
+from datetime import timedelta
+from moduli.probe import run_ffprobe
 
 
 class Utils:
 
-    def __init__(self, ffmpeg_path=None, ffprobe_path=None):
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, probe_cache=None):
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
+        self.probe_cache = probe_cache  # ProbeCache opzionale
 
     def get_dynamic_cq(
         self, width, height, min_cq=16, max_cq=30, output_resolution=(1280, 720)
@@ -63,160 +63,47 @@ class Utils:
 
         return dynamic_crf
 
-    def get_bitrate(self, file_path):
+    def probe(self, file_path):
+        """
+        Analizza il file con una sola chiamata ffprobe.
+        Ritorna un MediaProbe o None in caso di errore.
+        """
+        if self.probe_cache is not None:
+            probe = self.probe_cache.get(file_path)
+            if probe is not None:
+                return probe
+        probe = run_ffprobe(self.ffprobe_path, file_path)
+        if probe is not None and self.probe_cache is not None:
+            self.probe_cache.put(file_path, probe)
+        return probe
+
+    def get_bitrate(self, file_path, probe=None):
         """
         Ottiene il bitrate del file video usando ffprobe.
         Ritorna il bitrate in kbps o None in caso di errore.
         """
-        try:
-            result = subprocess.run(
-                [
-                    self.ffprobe_path,
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "format=bit_rate",
-                    "-of",
-                    "default=nw=1:nk=1",
-                    file_path,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                encoding="utf-8",
-                text=True,
-            )
-            bitrate = int(result.stdout.strip())
-            return bitrate // 1000  # Converti in kbps
-        except (ValueError, subprocess.SubprocessError):
-            return None
+        probe = probe or self.probe(file_path)
+        return probe.bitrate_kbps if probe else None
 
-    def get_mediainfo(self, video_path):
+    def get_mediainfo(self, video_path, probe=None):
         """Ottieni dettagli mediainfo (video e audio) del file utilizzando ffprobe."""
-        command = [
-            self.ffprobe_path,
-            "-v",
-            "error",  # Disabilita i log di errore
-            "-show_entries",
-            "format=filename,format_name,format_long_name,bit_rate,duration,streams",
-            "-show_entries",
-            "stream=codec_name,codec_type,width,height,bit_rate,channels,sample_rate,duration,frame_rate,frame_count,bit_depth",
-            "-of",
-            "json",  # Output in formato JSON
-            video_path,
-        ]
-
-        try:
-            # Esegui il comando e cattura l'output e gli errori
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8",
-            )
-            stdout, stderr = process.communicate()
-
-            # Verifica se il comando è stato eseguito correttamente
-            if process.returncode != 0:
-                # self.log_message(f"Errore ottenendo mediainfo per {video_path}: {stderr}")
-                return {}
-
-            # Decodifica l'output JSON
-            try:
-                info = json.loads(stdout)
-            except json.JSONDecodeError:
-                # self.log_message(f"Errore di decodifica JSON per {video_path}")
-                return {}
-
-            # Estrai informazioni generali e sui flussi
-            media_info = {"media": {"@ref": video_path, "track": []}}
-
-            # Aggiungi informazioni generali sul formato
-            format_info = info.get("format", {})
-            general_info = {
-                "@type": "General",
-                "VideoCount": len(
-                    [
-                        stream
-                        for stream in info["streams"]
-                        if stream["codec_type"] == "video"
-                    ]
-                ),
-                "AudioCount": len(
-                    [
-                        stream
-                        for stream in info["streams"]
-                        if stream["codec_type"] == "audio"
-                    ]
-                ),
-                "FileExtension": video_path.split(".")[-1],
-                "Format": format_info.get("format_name", "N/A"),
-                "Duration": format_info.get("duration", "N/A"),
-                "FileSize": os.path.getsize(video_path),
-                "OverallBitRate": format_info.get("bit_rate", "N/A"),
-                "Recorded_Date": datetime.now().year,
-                "File_Created_Date": datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S.%f UTC"
-                ),
-                "File_Modified_Date": datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S.%f UTC"
-                ),
-            }
-
-            media_info["media"]["track"].append(general_info)
-
-            # Aggiungi informazioni sui flussi video e audio
-            for stream in info["streams"]:
-                stream_info = {
-                    "@type": stream.get("codec_type", "N/A").capitalize(),
-                    "StreamOrder": str(stream.get("index", "N/A")),
-                    "ID": str(stream.get("index", "N/A")),
-                    "Format": stream.get("codec_name", "N/A"),
-                    "Duration": stream.get("duration", "N/A"),
-                    "BitRate": stream.get("bit_rate", "N/A"),
-                }
-
-                if stream["codec_type"] == "video":
-                    stream_info.update(
-                        {
-                            "Width": stream.get("width", "N/A"),
-                            "Height": stream.get("height", "N/A"),
-                            "FrameRate": stream.get("r_frame_rate", "N/A"),
-                            "FrameCount": stream.get("nb_frames", "N/A"),
-                            "BitDepth": stream.get("bit_depth", "8"),
-                        }
-                    )
-                elif stream["codec_type"] == "audio":
-                    stream_info.update(
-                        {
-                            "Channels": stream.get("channels", "N/A"),
-                            "SamplingRate": stream.get("sample_rate", "N/A"),
-                        }
-                    )
-
-                media_info["media"]["track"].append(stream_info)
-
-            return media_info
-
-        except subprocess.SubprocessError as e:
-            # Cattura eventuali errori del subprocess
-            # self.log_message(f"Errore eseguendo ffprobe per {video_path}: {str(e)}")
-            return {}
+        probe = probe or self.probe(video_path)
+        return probe.to_mediainfo() if probe else {}
 
     def parse_time_to_seconds(self, time_str):
         h, m, s = map(float, time_str.split(":"))
         return h * 3600 + m * 60 + s
 
-class Logger:
-    def __init__(self, log_area):
-        self.log_area = log_area
-
-    def log(self, message, level="info"):
-        levels = {"info": "[INFO]", "warning": "[WARNING]", "error": "[ERROR]"}
-        prefix = levels.get(level, "[INFO]")
-        current_time = datetime.now()
-        formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        self.log_area.insert(tk.END, f"{formatted_time} - {prefix} - {message}\n")
-        self.log_area.see(tk.END)
\ No newline at end of file
+    def convert_seconds(self, seconds):
+        t = timedelta(seconds=seconds)
+        hours, remainder = divmod(t.total_seconds(), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+
+    def format_size(self, size_in_bytes):
+        if size_in_bytes:
+            for unit in ["B", "KB", "MB", "GB", "TB"]:
+                if size_in_bytes < 1024:
+                    return f"{size_in_bytes:.2f} {unit}"
+                size_in_bytes /= 1024
+        return "0 Bytes"
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import threading
+
+# Ore di validità dell'ultima versione disponibile letta da ffmpeg.org
+DEFAULT_TTL_HOURS = 24
+
+
+def binary_key(path):
+    """Identifica un binario per percorso, dimensione e data di modifica."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class VersionCache:
+    """
+    Versioni di FFmpeg in cache su disco: quella installata vale finché il
+    binario non cambia, l'ultima disponibile per ttl secondi. Senza rete
+    resta valido l'ultimo valore letto, così l'avvio non attende mai ffmpeg.org.
+    """
+
+    def __init__(self, downloader, path, ttl=DEFAULT_TTL_HOURS * 3600):
+        self.downloader = downloader  # FFmpegDownloader (legge le versioni)
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self):
+        try:
+            with open(self.path, "w", encoding="utf-8") as cache_file:
+                json.dump(self._data, cache_file, indent=2)
+        except OSError:
+            pass
+
+    def cached(self):
+        """Valori in cache (anche scaduti) da mostrare subito: (installata, ultima)."""
+        with self._lock:
+            installed = self._data.get("installed", {})
+            key = binary_key(self._ffmpeg_path())
+            return (
+                installed.get("version") if installed.get("key") == key else None,
+                self._data.get("latest", {}).get("version"),
+            )
+
+    def _ffmpeg_path(self):
+        return os.path.join(self.downloader.target_dir, self.downloader.ffmpeg_exe)
+
+    def installed(self):
+        key = binary_key(self._ffmpeg_path())
+        if key is None:
+            return None  # ffmpeg non installato: niente da avviare
+        with self._lock:
+            entry = self._data.get("installed", {})
+            if entry.get("key") == key:
+                return entry.get("version")
+        version = self.downloader.get_installed_ffmpeg_version()
+        with self._lock:
+            self._data["installed"] = {"key": key, "version": version}
+            self._write()
+        return version
+
+    def latest(self, force=False):
+        with self._lock:
+            entry = self._data.get("latest", {})
+        if not force and time.time() - entry.get("checked", 0) < self.ttl:
+            return entry.get("version")
+        version = self.downloader.get_latest_ffmpeg_version()
+        if version is None:
+            return entry.get("version")  # Offline: resta l'ultimo valore noto
+        with self._lock:
+            self._data["latest"] = {"version": version, "checked": time.time()}
+            self._write()
+        return version
+
+    def resolve(self, force=False):
+        """(versione installata, ultima disponibile); può usare rete e processi."""
+        return self.installed(), self.latest(force)
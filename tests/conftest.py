@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from benchmarks.run import make_launchers
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """
+    ffmpeg/ffprobe finti dei benchmark; ritorna (ffmpeg, ffprobe, configura),
+    dove configura(**valori) imposta VCA_FAKE (vedi benchmarks/fake_ffmpeg.py).
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ffmpeg_path, ffprobe_path = make_launchers(str(bin_dir))
+
+    def configure(**values):
+        monkeypatch.setenv("VCA_FAKE", json.dumps(values))
+
+    configure()
+    return ffmpeg_path, ffprobe_path, configure
+
+
+@pytest.fixture
+def videos(tmp_path):
+    """Cartella con tre "video" da 5000 byte (più un file da ignorare)."""
+    folder = tmp_path / "in"
+    folder.mkdir()
+    for name in ("a.mp4", "b.mkv", "c.mov"):
+        (folder / name).write_bytes(b"\1" * 5000)
+    (folder / "note.txt").write_bytes(b"")
+    return folder
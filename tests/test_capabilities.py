@@ -0,0 +1,101 @@
+import pytest
+
+from moduli.capabilities import (
+    CODEC_CHOICES,
+    FALLBACKS,
+    parse_encoders,
+    parse_hwaccels,
+    quality_args,
+)
+from moduli.engine import ConversionEngine, ConversionOptions
+
+ENCODERS = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ V....D mpeg4                MPEG-4 part 2
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+HWACCELS = """Hardware acceleration methods:
+vdpau
+cuda
+vaapi
+"""
+
+
+def test_parse_encoders():
+    assert parse_encoders(ENCODERS) == {
+        "libx264": "h264",
+        "h264_nvenc": "h264",
+        "mpeg4": "mpeg4",
+    }
+    assert parse_encoders("") == {}
+
+
+def test_parse_hwaccels():
+    assert parse_hwaccels(HWACCELS) == ["vdpau", "cuda", "vaapi"]
+
+
+# Opzioni attese per ogni encoder proposto o usato come ripiego
+EXPECTED_ARGS = {
+    "h264_nvenc": ["-cq", "25", "-preset", "fast"],
+    "hevc_nvenc": ["-cq", "25", "-preset", "fast"],
+    "libx264": ["-crf", "25", "-preset", "fast"],
+    "libx265": ["-crf", "25", "-preset", "fast"],
+    "libsvtav1": ["-crf", "25", "-preset", "8"],
+    "libaom-av1": ["-crf", "25", "-b:v", "0"],
+    "vp9": ["-crf", "25", "-b:v", "0"],
+    "vp8": ["-crf", "25"],
+    "mpeg4": ["-q:v", "5"],
+}
+
+
+@pytest.mark.parametrize("codec", CODEC_CHOICES)
+def test_every_encoder_of_the_chain_gets_its_quality_option(codec):
+    for encoder in (codec,) + FALLBACKS.get(codec, ()):
+        assert quality_args(encoder, 25, "fast") == EXPECTED_ARGS[encoder]
+
+
+def test_mpeg4_quantizer_range():
+    assert quality_args("mpeg4", 18) == ["-q:v", "2"]
+    assert quality_args("mpeg4", 0) == ["-q:v", "2"]
+    assert quality_args("mpeg4", 100) == ["-q:v", "31"]
+
+
+class ListLogger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+
+
+def test_fallback_encoders_use_their_own_quality_option():
+    options = ConversionOptions(codec="h264_nvenc", quality_mode="cq", quality_value=25)
+    engine = ConversionEngine("ffmpeg", "ffprobe", options, ListLogger())
+    args = {
+        encoder: engine.video_args(1920, 1080, encoder)
+        for encoder in ("h264_nvenc", "libx264", "mpeg4")
+    }
+    assert args["h264_nvenc"][4:6] == ["-cq", "25"]
+    assert args["libx264"][4:6] == ["-crf", "25"]
+    assert args["mpeg4"][4:6] == ["-q:v", "5"]
+    assert "-preset" not in args["mpeg4"]
+    assert "-cq" not in args["libx264"] and "-crf" not in args["mpeg4"]
+
+
+def test_quality_mode_change_is_logged_once_per_encoder():
+    options = ConversionOptions(codec="h264_nvenc", quality_mode="cq", quality_value=25)
+    engine = ConversionEngine("ffmpeg", "ffprobe", options, ListLogger())
+    for encoder in ("h264_nvenc", "libx264", "libx264"):
+        engine._note_quality_mode(encoder)
+    assert engine.logger.messages == [
+        (
+            "warning",
+            "L'encoder libx264 non supporta la modalità CQ: "
+            "qualità 25 applicata come -crf 25.",
+        )
+    ]
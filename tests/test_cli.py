@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from moduli import cli
+from moduli.logs import get_logger
+
+
+@pytest.fixture(autouse=True)
+def console_handlers():
+    """Rimuove l'handler su stderr che ogni convert() aggancia al logger."""
+    logger = get_logger("conversione")
+    handlers = list(logger.handlers)
+    yield
+    logger.handlers = handlers
+
+
+def write_config(tmp_path, bin_dir):
+    config = tmp_path / "config.ini"
+    config.write_text(
+        "[Paths]\n"
+        f"ffmpeg_dir = {bin_dir}\n"
+        "[Settings]\n"
+        "crf_value = 25\n"
+        "max_jobs = 2\n"
+        "log_file =\n"
+        "metrics_file =\n",
+        encoding="utf-8",
+    )
+    return str(config)
+
+
+def run_cli(capsys, config, *args):
+    code = cli.main(["--config", config, "convert", "--json", "--interval", "0.05", *args])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return code, records
+
+
+def test_convert_reports_jobs_and_summary(fake_ffmpeg, videos, tmp_path, capsys):
+    fake_ffmpeg[2](output_size=1000)
+    config = write_config(tmp_path, tmp_path / "bin")
+    code, records = run_cli(
+        capsys,
+        config,
+        "--input",
+        str(videos),
+        "--codec",
+        "libx264",
+        "--bitrate-max",
+        "0",
+        "--no-overwrite",
+    )
+    assert code == 0
+    jobs = [record for record in records if record["event"] == "job"]
+    assert sorted(record["status"] for record in jobs) == ["completato"] * 3
+    summary = records[-1]
+    assert summary["event"] == "summary"
+    assert summary["completati"] == 3 and summary["errors"] == 0
+    assert summary["size_saved"] == 12000
+    assert (tmp_path / "batch_journal.jsonl").exists()
+
+
+def test_convert_exit_code_on_errors(fake_ffmpeg, videos, tmp_path, capsys):
+    fake_ffmpeg[2](fail_rate=1)
+    config = write_config(tmp_path, tmp_path / "bin")
+    code, records = run_cli(
+        capsys, config, "--input", str(videos), "--bitrate-max", "0", "--no-overwrite"
+    )
+    assert code == 1
+    assert records[-1]["errors"] == 3 and records[-1]["completati"] == 0
+
+
+def test_invalid_input_and_nothing_to_resume(tmp_path, capsys):
+    config = write_config(tmp_path, tmp_path / "bin")
+    assert cli.main(["--config", config, "convert", "--input", str(tmp_path / "x")]) == 2
+    assert cli.main(["--config", config, "convert", "--resume"]) == 2
+    assert "Nessun batch da riprendere" in capsys.readouterr().err
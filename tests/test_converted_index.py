@@ -0,0 +1,82 @@
+import os
+
+from moduli.converted_index import ConvertedIndex
+from moduli.engine import ConversionEngine, ConversionOptions
+
+
+class NullLogger:
+    def log(self, message, level="info"):
+        pass
+
+
+def test_added_file_is_converted(tmp_path):
+    index = ConvertedIndex(str(tmp_path / "index.db"))
+    video = tmp_path / "a_nw.mp4"
+    video.write_bytes(b"convertito")
+    assert not index.is_converted(str(video))
+    index.add(str(video))
+    assert index.is_converted(str(video))
+    assert not index.is_converted(str(tmp_path / "manca.mp4"))
+    index.close()
+
+
+def test_moved_copy_is_found_by_fingerprint(tmp_path):
+    index = ConvertedIndex(str(tmp_path / "index.db"))
+    video = tmp_path / "a_nw.mp4"
+    video.write_bytes(b"convertito")
+    index.add(str(video))
+    (tmp_path / "altra").mkdir()
+    moved = tmp_path / "altra" / "a.mp4"
+    os.replace(video, moved)
+    assert index.is_converted(str(moved))
+    # Stessa dimensione ma contenuto diverso: non è un file convertito
+    other = tmp_path / "b.mp4"
+    other.write_bytes(b"originale!")
+    assert not index.is_converted(str(other))
+    index.close()
+
+
+def make_engine(fake_ffmpeg, index):
+    ffmpeg_path, ffprobe_path, _ = fake_ffmpeg
+    options = ConversionOptions(
+        codec="libx264",
+        bitrate_max=0,
+        overwrite=False,
+        max_jobs=2,
+        disk_jobs=2,
+        exclude=(),  # Anche gli output *_nw.mp4 arrivano all'indice
+    )
+    return ConversionEngine(
+        ffmpeg_path, ffprobe_path, options, NullLogger(), converted_index=index
+    )
+
+
+def test_rerun_skips_outputs_of_the_previous_run(fake_ffmpeg, videos, tmp_path):
+    fake_ffmpeg[2](output_size=1000)
+    index = ConvertedIndex(str(tmp_path / "index.db"))
+    make_engine(fake_ffmpeg, index).run(str(videos))
+    engine = make_engine(fake_ffmpeg, index)
+    engine.run(str(videos))
+    jobs, counters = engine.snapshot()
+    assert counters["trovati"] == 6
+    assert engine.already_converted == 3
+    assert sorted(os.path.basename(job.input_path) for job in jobs) == [
+        "a.mp4",
+        "b.mkv",
+        "c.mov",
+    ]
+    index.close()
+
+
+def test_deleted_bigger_output_is_not_indexed(fake_ffmpeg, videos, tmp_path):
+    # Un solo blocco di avanzamento: la proiezione non ferma la codifica
+    fake_ffmpeg[2](output_size=8000, progress_blocks=1)
+    index = ConvertedIndex(str(tmp_path / "index.db"))
+    engine = make_engine(fake_ffmpeg, index)
+    engine.run(str(videos))
+    jobs, _ = engine.snapshot()
+    for job in jobs:
+        assert job.status == "completato" and job.size_saved == 0
+        assert not os.path.exists(job.output_path)
+        assert not index.is_converted(job.input_path)
+    index.close()
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import http.server
+
+import pytest
+
+from moduli.download import ArchiveDownload, DownloadError
+
+DATA = bytes(range(256)) * 4096  # 1 MB
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Server minimo con Range ed ETag; registra gli intervalli richiesti."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.endswith(".sha256"):
+            self._send(200, f"{SHA256}  archivio.zip\n".encode())
+            return
+        requested = self.headers.get("Range")
+        self.server.ranges.append(requested)
+        match = re.match(r"bytes=(\d+)-(\d*)", requested or "")
+        if not match:
+            self._send(200, DATA)
+            return
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(DATA) - 1
+        if start >= len(DATA):
+            self._send(416, b"")
+            return
+        self._send(206, DATA[start : end + 1], f"bytes {start}-{end}/{len(DATA)}")
+
+    def _send(self, code, body, content_range=None):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.ranges = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}/archivio.zip"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_verifies_published_checksum(server, tmp_path):
+    httpd, url = server
+    download = ArchiveDownload(url, str(tmp_path), checksum_url=url + ".sha256")
+    path = download.fetch()
+    with open(path, "rb") as archive:
+        assert archive.read() == DATA
+    with open(path + ".checksum", encoding="ascii") as sidecar:
+        assert sidecar.read() == SHA256
+    assert not os.path.exists(download.part_path)
+    assert not os.path.exists(download.meta_path)
+
+
+def test_verified_archive_is_served_from_cache(server, tmp_path):
+    httpd, url = server
+    ArchiveDownload(url, str(tmp_path), checksum=SHA256).fetch()
+    httpd.ranges.clear()
+    path = ArchiveDownload(url, str(tmp_path), checksum=SHA256.upper()).fetch()
+    assert path == os.path.join(str(tmp_path), "archivio.zip")
+    assert httpd.ranges == []
+
+
+def test_resume_from_partial_file(server, tmp_path):
+    httpd, url = server
+    download = ArchiveDownload(url, str(tmp_path), checksum=SHA256)
+    with open(download.part_path, "wb") as part:
+        part.write(DATA[:300000])
+    with open(download.meta_path, "w", encoding="utf-8") as meta_file:
+        json.dump({"url": url, "validator": '"v1"', "mode": "single"}, meta_file)
+    with open(download.fetch(), "rb") as archive:
+        assert archive.read() == DATA
+    assert httpd.ranges == ["bytes=300000-"]
+    assert download.downloaded == len(DATA)
+
+
+def test_partial_file_of_another_url_is_discarded(server, tmp_path):
+    httpd, url = server
+    download = ArchiveDownload(url, str(tmp_path), checksum=SHA256)
+    with open(download.part_path, "wb") as part:
+        part.write(b"altro archivio")
+    with open(download.meta_path, "w", encoding="utf-8") as meta_file:
+        json.dump({"url": url + "?vecchio", "mode": "single"}, meta_file)
+    download.fetch()
+    assert httpd.ranges == [None]
+
+
+def test_checksum_mismatch_removes_partial_file(server, tmp_path):
+    httpd, url = server
+    download = ArchiveDownload(url, str(tmp_path), checksum="0" * 64)
+    with pytest.raises(DownloadError):
+        download.fetch()
+    assert not os.path.exists(download.part_path)
+    assert not os.path.exists(download.meta_path)
+    assert not os.path.exists(download.path)
@@ -0,0 +1,147 @@
+import os
+import threading
+
+from moduli import journal as jr
+from moduli.engine import ConversionEngine, ConversionJob, ConversionOptions
+from moduli.events import EventBus
+from moduli.journal import JobJournal
+
+
+class ListLogger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+
+
+def make_engine(fake_ffmpeg, **overrides):
+    ffmpeg_path, ffprobe_path, _ = fake_ffmpeg
+    options = dict(
+        codec="libx264",
+        bitrate_max=0,
+        overwrite=False,
+        if_big_del=True,
+        max_jobs=2,
+        disk_jobs=2,
+    )
+    options.update(overrides.pop("options", {}))
+    return ConversionEngine(
+        ffmpeg_path, ffprobe_path, ConversionOptions(**options), ListLogger(), **overrides
+    )
+
+
+def by_name(engine):
+    jobs, _ = engine.snapshot()
+    return {os.path.basename(job.output_path): job for job in jobs}
+
+
+def test_batch_converts_every_video(fake_ffmpeg, videos):
+    fake_ffmpeg[2](output_size=1000)
+    events = EventBus()
+    engine = make_engine(fake_ffmpeg, events=events)
+    summary = engine.run(str(videos))
+
+    jobs = by_name(engine)
+    assert sorted(jobs) == ["a_nw.mp4", "b_nw.mp4", "c_nw.mp4"]
+    for name, job in jobs.items():
+        assert job.status == "completato"
+        assert job.encoder == "libx264"
+        assert job.size_saved == 4000
+        assert (videos / name).stat().st_size == 1000
+    assert engine.counters == {"trovati": 3, "analizzati": 3, "accodati": 3, "completati": 3}
+    assert sum(engine.size_files) == 12000
+    assert summary.startswith("Conversione batch completata")
+    latest = events.drain()
+    assert latest[("batch", None)] == summary
+
+
+def test_bitrate_filter_skips_files(fake_ffmpeg, videos):
+    fake_ffmpeg[2](bit_rate=1000000)  # 1000 kbps, sotto la soglia di 2500
+    engine = make_engine(fake_ffmpeg, options={"bitrate_max": 2500})
+    engine.run(str(videos))
+    jobs, counters = engine.snapshot()
+    assert jobs == []
+    assert counters["analizzati"] == 3 and counters["accodati"] == 0
+
+
+def test_output_projected_bigger_is_stopped(fake_ffmpeg, videos):
+    fake_ffmpeg[2](output_size=20000, progress_blocks=10)
+    engine = make_engine(fake_ffmpeg)
+    engine.run(str(videos))
+    for name, job in by_name(engine).items():
+        assert job.status == "saltato" and job.oversize
+        assert not (videos / name).exists()
+
+
+def test_failed_encode_is_journaled(fake_ffmpeg, videos, tmp_path):
+    fake_ffmpeg[2](fail_rate=1)
+    journal_path = str(tmp_path / "journal.jsonl")
+    engine = make_engine(fake_ffmpeg, journal=JobJournal(journal_path))
+    engine.run(str(videos))
+    jobs = by_name(engine)
+    assert {job.status for job in jobs.values()} == {"errore"}
+    assert all("Errore simulato" in job.error for job in jobs.values())
+    _, entries = JobJournal.read(journal_path)
+    assert {entry["state"] for entry in entries.values()} == {jr.FAILED}
+
+
+def test_resume_retries_failed_files(fake_ffmpeg, videos, tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    fake_ffmpeg[2](fail_rate=1)
+    make_engine(fake_ffmpeg, journal=JobJournal(journal_path)).run(str(videos))
+    fake_ffmpeg[2]()
+    engine = make_engine(fake_ffmpeg, journal=JobJournal(journal_path))
+    engine.run(str(videos), resume=True)
+    assert {job.status for job in by_name(engine).values()} == {"completato"}
+    assert (
+        "info",
+        "Ripresa del batch: 0 file già conclusi verranno saltati, "
+        "3 file falliti verranno ritentati.",
+    ) in engine.logger.messages
+
+
+def test_stop_cancels_running_jobs(fake_ffmpeg, videos):
+    fake_ffmpeg[2](progress_blocks=200, block_delay=0.05)
+    engine = make_engine(fake_ffmpeg)
+    started = threading.Event()
+    engine._job_changed = lambda job: job.status == "in corso" and started.set()
+    batch = threading.Thread(target=engine.run, args=(str(videos),))
+    batch.start()
+    assert started.wait(30)
+    engine.stop()
+    batch.join(30)
+    assert not batch.is_alive()
+    assert engine.summary == "Conversione batch interrotta."
+    for name, job in by_name(engine).items():
+        assert job.status == "annullato"
+        assert not (videos / name).exists()
+
+
+def test_finished_jobs_leave_the_open_set(fake_ffmpeg, videos):
+    fake_ffmpeg[2](output_size=1000)
+    engine = make_engine(fake_ffmpeg)
+    engine.run(str(videos))
+    assert engine.active_jobs() == []
+    assert len(engine.finished_jobs) == 3
+    assert engine.batch_progress()[0] == 100
+    finished, counters = engine.finished_since(2)
+    assert len(finished) == 1 and counters["completati"] == 3
+
+
+def test_batch_progress_uses_finished_aggregates(fake_ffmpeg):
+    engine = make_engine(fake_ffmpeg)
+    jobs = [ConversionJob(f"{name}.mkv", f"{name}_nw.mp4") for name in "abcd"]
+    for index, (job, duration) in enumerate(zip(jobs, (100, None, 100, 100))):
+        job.index, job.duration = index, duration
+        engine.jobs.append(job)
+        engine.open_jobs[index] = job
+    for job in jobs[:2]:
+        job.status = "completato"
+        engine._finish_job(job)
+    for job in jobs[2:]:
+        job.status, job.progress = "in corso", 50
+    # Il job senza durata pesa la media delle durate note (100 s)
+    progress, _ = engine.batch_progress()
+    assert progress == 75
+    assert list(engine.open_jobs) == [2, 3]
@@ -0,0 +1,55 @@
+from moduli.engine import ConversionJob
+from moduli.eta import ThroughputModel
+from moduli.probe import MediaProbe
+
+from tests.test_engine import make_engine
+
+
+class RecordingThroughput(ThroughputModel):
+    def __init__(self):
+        super().__init__()
+        self.observed = []
+
+    def observe(self, key, media_seconds, wall_seconds):
+        self.observed.append((key, media_seconds, wall_seconds))
+        super().observe(key, media_seconds, wall_seconds)
+
+
+def test_segmented_runs_have_their_own_key():
+    model = ThroughputModel()
+    single = ThroughputModel.key("libx265", "medium", 1080)
+    segmented = ThroughputModel.key("libx265", "medium", 1080, segmented=True)
+    assert single == "libx265|medium|1080p"
+    assert segmented == "libx265|medium|1080p|seg"
+    model.observe(single, 60, 30)
+    # Senza storico a segmenti si usa quello dello stesso encoder
+    assert model.rate(segmented) == 2.0
+    model.observe(segmented, 60, 10)
+    assert model.rate(segmented) == 6.0 and model.rate(single) == 2.0
+
+
+def test_engine_observes_only_the_encode_phase(fake_ffmpeg, videos):
+    fake_ffmpeg[2](output_size=1000, duration=30)
+    throughput = RecordingThroughput()
+    engine = make_engine(fake_ffmpeg, throughput=throughput)
+    engine.run(str(videos))
+    jobs, _ = engine.snapshot()
+    encode_times = sorted(job.timings["encode"] for job in jobs)
+    assert sorted(wall for _, _, wall in throughput.observed) == encode_times
+    assert all(media == 30 for _, media, _ in throughput.observed)
+    assert all(job.timings["encode"] <= job.elapsed for job in jobs)
+
+
+def test_throughput_key_marks_segmented_encodes(fake_ffmpeg):
+    engine = make_engine(
+        fake_ffmpeg,
+        options={"segment_min_duration": 600, "segment_jobs": 4, "segment_length": 120},
+    )
+    probe = MediaProbe("a.mkv", height=720, duration=1200)
+    long_job = ConversionJob("a.mkv", "a_nw.mp4", probe)
+    short_job = ConversionJob("b.mkv", "b_nw.mp4", probe)
+    short_job.duration = 300
+    assert engine.throughput_key(long_job) == "libx264|fast|720p|seg"
+    assert engine.throughput_key(short_job) == "libx264|fast|720p"
+    long_job.encoder = "copy"
+    assert engine.throughput_key(long_job) == "copy|fast|720p"
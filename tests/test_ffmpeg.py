@@ -0,0 +1,95 @@
+import io
+import os
+import logging
+import tarfile
+import zipfile
+
+from moduli.ffmpeg import FFmpegDownloader
+from moduli.logs import LogAdapter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelname, record.getMessage()))
+
+
+def test_downloader_accepts_a_logging_logger(tmp_path):
+    logger = logging.getLogger("test_ffmpeg.downloader")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"), logger=logger)
+        downloader.log_message("Scaricando")
+        downloader.log_message("Errore", level="error")
+    finally:
+        logger.removeHandler(handler)
+    assert handler.records == [("INFO", "Scaricando"), ("ERROR", "Errore")]
+
+
+def test_downloader_defaults_to_log_adapter(tmp_path):
+    downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"))
+    assert isinstance(downloader.logger, LogAdapter)
+
+
+def test_progress_goes_only_to_callback(tmp_path):
+    seen = []
+    downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"), on_progress=seen.append)
+    downloader.progress2(42)
+    assert seen == [42]
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+def make_tar_xz(path, members):
+    with tarfile.open(path, "w:xz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def test_extract_zip_installs_only_the_executables(tmp_path):
+    downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"), ffmpeg_url="http://x/build.zip")
+    archive = tmp_path / "build.zip"
+    make_zip(archive, {
+        "build/doc/readme.txt": b"doc",
+        f"build/bin/{downloader.ffmpeg_exe}": b"ffmpeg",
+        f"build/bin/{downloader.ffprobe_exe}": b"ffprobe",
+        "build/bin/ffplay": b"ffplay",
+    })
+    assert downloader._extract(str(archive))
+    assert sorted(os.listdir(downloader.target_dir)) == sorted(
+        [downloader.ffmpeg_exe, downloader.ffprobe_exe]
+    )
+    with open(os.path.join(downloader.target_dir, downloader.ffprobe_exe), "rb") as f:
+        assert f.read() == b"ffprobe"
+
+
+def test_extract_tar_xz(tmp_path):
+    downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"), ffmpeg_url="http://x/build.tar.xz")
+    archive = tmp_path / "build.tar.xz"
+    make_tar_xz(archive, {
+        "ffmpeg-7.1-static/readme.txt": b"doc",
+        f"ffmpeg-7.1-static/{downloader.ffmpeg_exe}": b"ffmpeg",
+        f"ffmpeg-7.1-static/{downloader.ffprobe_exe}": b"ffprobe",
+    })
+    assert downloader._extract(str(archive))
+    assert downloader._is_installed()
+    assert not [name for name in os.listdir(downloader.target_dir) if name.endswith(".part")]
+
+
+def test_extract_reports_missing_executable(tmp_path):
+    downloader = FFmpegDownloader(target_dir=str(tmp_path / "bin"), ffmpeg_url="http://x/build.zip")
+    archive = tmp_path / "build.zip"
+    make_zip(archive, {f"build/bin/{downloader.ffmpeg_exe}": b"ffmpeg"})
+    assert not downloader._extract(str(archive))
+    assert not downloader._is_installed()
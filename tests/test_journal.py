@@ -0,0 +1,122 @@
+import json
+
+from moduli import journal as jr
+from moduli.journal import JobJournal
+from moduli.segmented import SEGMENTS_SUFFIX
+
+
+class ListLogger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+
+
+def write_journal(path, folder, records):
+    with open(path, "w", encoding="utf-8") as journal_file:
+        journal_file.write(json.dumps({"batch": {"input_folder": str(folder)}}) + "\n")
+        for record in records:
+            journal_file.write(json.dumps(record) + "\n")
+
+
+def test_read_keeps_last_record_and_ignores_truncated_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(
+        path,
+        tmp_path,
+        [
+            {"path": "a.mkv", "state": jr.RUNNING},
+            {"path": "a.mkv", "state": jr.DONE},
+        ],
+    )
+    with open(path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"path": "b.mkv", "sta')
+    folder, entries = JobJournal.read(path)
+    assert folder == str(tmp_path)
+    assert entries == {"a.mkv": {"path": "a.mkv", "state": jr.DONE}}
+
+
+def test_unfinished_batch(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(path, tmp_path, [{"path": "a.mkv", "state": jr.DONE}])
+    assert JobJournal.unfinished_batch(path) is None
+    write_journal(path, tmp_path, [{"path": "a.mkv", "state": jr.STOPPED}])
+    assert JobJournal.unfinished_batch(path) == str(tmp_path)
+    # Un batch finito con errori non va proposto per la ripresa
+    write_journal(path, tmp_path, [{"path": "a.mkv", "state": jr.FAILED}])
+    assert JobJournal.unfinished_batch(path) is None
+
+
+def test_failed_files_are_retried_on_resume(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(
+        path,
+        tmp_path,
+        [
+            {"path": "a.mkv", "state": jr.FAILED},
+            {"path": "b.mkv", "state": jr.SKIPPED},
+        ],
+    )
+    journal = JobJournal(str(path))
+    assert journal.begin(str(tmp_path), resume=True)
+    assert not journal.should_skip("a.mkv")
+    assert journal.should_skip("b.mkv")
+    journal.close()
+
+
+def test_resume_other_folder_starts_a_new_batch(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_journal(path, tmp_path / "altra", [{"path": "a.mkv", "state": jr.DONE}])
+    journal = JobJournal(str(path))
+    assert not journal.begin(str(tmp_path), resume=True)
+    assert not journal.should_skip("a.mkv")
+    journal.close()
+
+
+def test_recover(tmp_path):
+    done = tmp_path / "done.mkv"
+    partial = tmp_path / "partial.mkv"
+    partial_out = tmp_path / "partial_nw.mp4"
+    trashed = tmp_path / "trashed.mkv"
+    trashed_out = tmp_path / "trashed_nw.mp4"
+    segmented_out = tmp_path / "long_nw.mp4"
+    partial.write_bytes(b"originale")
+    partial_out.write_bytes(b"parziale")
+    trashed_out.write_bytes(b"completo")  # L'originale è già nel cestino
+    segments = tmp_path / ("long_nw.mp4" + SEGMENTS_SUFFIX)
+    segments.mkdir()
+    (segments / "00000.seg").write_bytes(b"x")
+
+    path = tmp_path / "journal.jsonl"
+    write_journal(
+        path,
+        tmp_path,
+        [
+            {"path": str(done), "state": jr.DONE, "elapsed": 3, "size_saved": 100},
+            {"path": str(partial), "state": jr.RUNNING, "output": str(partial_out)},
+            {
+                "path": str(trashed),
+                "state": jr.RUNNING,
+                "output": str(trashed_out),
+                "overwrite": True,
+            },
+            {"path": str(tmp_path / "long.mkv"), "state": jr.STOPPED, "output": str(segmented_out)},
+            {"path": str(tmp_path / "skip.mkv"), "state": jr.SKIPPED},
+        ],
+    )
+    journal = JobJournal(str(path))
+    assert journal.begin(str(tmp_path), resume=True)
+    elapsed, saved = journal.recover(ListLogger())
+    journal.close()
+
+    assert (elapsed, saved) == (3, 100)
+    assert partial.exists() and not partial_out.exists()
+    assert trashed.read_bytes() == b"completo" and not trashed_out.exists()
+    assert journal.state(str(trashed)) == jr.DONE
+    assert not segments.exists()
+    assert journal.should_skip(str(tmp_path / "skip.mkv"))
+    assert not journal.should_skip(str(partial))
+    # La rinomina completata è registrata anche su disco
+    _, entries = JobJournal.read(path)
+    assert entries[str(trashed)]["state"] == jr.DONE
@@ -0,0 +1,67 @@
+from moduli.progress import ProgressParser, SizeProjection
+
+BLOCK = (
+    "frame=120\nfps=29.97\nbitrate=1500.5kbits/s\ntotal_size=750000\n"
+    "out_time_us=4000000\nout_time=00:00:04.000000\nspeed=2.5x\nprogress={}\n"
+)
+
+
+def feed_all(parser, text):
+    return [r for r in map(parser.feed, text.splitlines(True)) if r is not None]
+
+
+def test_one_record_per_block():
+    records = feed_all(ProgressParser(), BLOCK.format("continue") + BLOCK.format("end"))
+    assert len(records) == 2
+    record = records[0]
+    assert record.out_time == 4.0
+    assert record.frame == 120
+    assert record.fps == 29.97
+    assert record.speed == 2.5
+    assert record.total_size == 750000
+    assert record.bitrate == 1500.5
+    assert not record.done and records[1].done
+
+
+def test_not_available_values():
+    text = "fps=0.00\ntotal_size=N/A\nout_time_us=N/A\nspeed=N/A\nprogress=continue\n"
+    (record,) = feed_all(ProgressParser(), text)
+    assert record.out_time is None
+    assert record.speed is None
+    assert record.total_size is None
+
+
+def test_out_time_ms_fallback():
+    (record,) = feed_all(ProgressParser(), "out_time_ms=2500000\nprogress=continue\n")
+    assert record.out_time == 2.5
+
+
+def test_error_lines_are_kept_and_sent_to_sink():
+    lines = []
+    parser = ProgressParser(error_lines=2, sink=lines.append)
+    feed_all(parser, "primo errore\nsecondo\nframe=1\nterzo\n\n")
+    assert lines == ["primo errore", "secondo", "terzo"]
+    assert parser.error_report() == "secondo\nterzo"
+
+
+def test_size_projection_needs_min_fraction_and_confirmations():
+    projection = SizeProjection(input_size=1000, duration=100, confirmations=2)
+    # Prima del 10% del video non si decide, anche se la proiezione è alta
+    assert not projection.update(5, 500)
+    assert projection.projected == 10000
+    assert not projection.update(20, 400)
+    assert projection.update(30, 600)
+
+
+def test_size_projection_resets_when_back_under():
+    projection = SizeProjection(input_size=1000, duration=100, confirmations=2)
+    assert not projection.update(20, 400)
+    assert not projection.update(40, 200)  # 500 byte previsti: si ricomincia
+    assert not projection.update(50, 600)
+    assert projection.update(60, 700)
+
+
+def test_size_projection_without_data():
+    projection = SizeProjection(input_size=1000, duration=None)
+    assert not projection.update(10, 100)
+    assert not SizeProjection(1000, 100).update(None, 100)
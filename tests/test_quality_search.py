@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+
+from moduli.engine import ConversionEngine, ConversionJob, ConversionOptions
+
+from moduli.quality_search import MAX_CANDIDATES, QualitySearch, parse_score
+from moduli.sampling import SEARCH_BUDGET, SampleEncoder
+
+
+def make_sampler(duration, samples=3, length=4):
+    options = SimpleNamespace(
+        quality_samples=samples,
+        quality_sample_length=length,
+        quality_mode="crf",
+        quality_metric="ssim",
+        quality_target=0.98,
+    )
+    utls = SimpleNamespace(get_dynamic_crf=lambda width, height, low, high: 23)
+    engine = SimpleNamespace(options=options, utls=utls)
+    job = SimpleNamespace(
+        duration=duration, input_path="a.mkv", encoder="libx264", stopped=False
+    )
+    return SampleEncoder(engine, job, 1280, 720)
+
+
+def test_cost_counts_candidates_and_compare_passes():
+    sampler = make_sampler(120)
+    assert sampler.cost() == 12
+    # Il confronto decodifica soltanto: un quarto di una codifica
+    assert sampler.cost(candidates=4, compare=True) == 60
+
+
+def test_worthwhile_uses_the_real_cost():
+    # Stima della dimensione: 12 s di campioni, serve almeno 240 s di video
+    assert not make_sampler(120).worthwhile()
+    assert make_sampler(240).worthwhile()
+    assert not make_sampler(None).worthwhile()
+
+
+def test_affordable_candidates_for_the_search():
+    counts = [
+        make_sampler(duration).affordable(compare=True, budget=SEARCH_BUDGET)
+        for duration in (30, 60, 120, 240)
+    ]
+    assert counts == [0, 1, 2, 4]
+
+
+def test_search_skips_very_short_files():
+    search = QualitySearch(make_sampler(30))
+    search.measure = lambda value: 1.0
+    assert search.search() is None
+    assert search.reason.startswith("video troppo corto (30 s)")
+
+
+def test_search_narrows_around_the_guess_on_short_files():
+    search = QualitySearch(make_sampler(120))  # Due candidati
+    measured = []
+
+    def measure(value):
+        measured.append(value)
+        return 0.99
+
+    search.measure = measure
+    assert search.search() == (24, 0.99)
+    assert measured == [23, 24]
+
+
+class ListLogger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+
+
+def test_skipped_search_is_logged():
+    options = ConversionOptions(codec="libx264", auto_quality=True, quality_value=25)
+    engine = ConversionEngine("ffmpeg", "ffprobe", options, ListLogger())
+    job = ConversionJob("clip.mp4", "clip_nw.mp4")
+    job.duration, job.encoder = 30, "libx264"
+    assert engine._pick_quality(SampleEncoder(engine, job, 1280, 720)) == 25
+    ((level, message),) = engine.logger.messages
+    assert message.startswith(
+        "Ricerca automatica della qualità saltata per clip.mp4: video troppo corto"
+    )
+    assert message.endswith("si usa il valore 25.")
+
+
+def test_search_measures_at_most_max_candidates():
+    search = QualitySearch(make_sampler(7200))
+    measured = []
+
+    def measure(value):
+        measured.append(value)
+        return 0.99 if value <= 26 else 0.95
+
+    search.measure = measure
+    value, score = search.search()
+    assert len(measured) <= MAX_CANDIDATES
+    assert measured[0] == 23
+    assert value <= 26 and score == 0.99
+
+
+class DictCache:
+    def __init__(self):
+        self.decisions = {}
+
+    def get(self, key):
+        return self.decisions.get(key)
+
+    def put(self, key, value, score):
+        self.decisions[key] = (value, score)
+
+
+def test_search_without_a_passing_value_uses_the_settings(tmp_path):
+    video = tmp_path / "a.mkv"
+    video.write_bytes(b"video")
+    sampler = make_sampler(7200)
+    sampler.job.input_path = str(video)
+    cache = DictCache()
+    search = QualitySearch(sampler, cache)
+    search.measure = lambda value: 0.9 - value / 1000
+    assert search.search() is None
+    assert search.reason.startswith("nessun valore raggiunge SSIM 0.98 (massimo 0.8")
+    assert cache.decisions == {}
+
+
+def test_search_caches_measured_decisions(tmp_path):
+    video = tmp_path / "a.mkv"
+    video.write_bytes(b"video")
+    sampler = make_sampler(7200)
+    sampler.job.input_path = str(video)
+    cache = DictCache()
+    search = QualitySearch(sampler, cache)
+    search.measure = lambda value: 0.99
+    result = search.search()
+    assert list(cache.decisions.values()) == [result]
+
+
+def test_parse_score_ssim_and_psnr():
+    ssim = "[Parsed_ssim_1 @ 0x1] SSIM Y:0.990 U:0.995 V:0.996 All:0.992139 (21.05)"
+    assert parse_score("ssim", ssim) == 0.992139
+    psnr = "[Parsed_psnr_1 @ 0x1] PSNR y:41.2 u:45.0 v:45.3 average:42.470589 min:38 max:50"
+    assert parse_score("psnr", psnr) == 42.470589
+    assert parse_score("psnr", "PSNR y:inf average:inf min:inf") == float("inf")
+    assert parse_score("ssim", "nessun risultato") is None
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from moduli.scanner import VideoScanner, parse_patterns
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+
+
+def scan(root, **kwargs):
+    return sorted(os.path.relpath(p, root) for p in VideoScanner(**kwargs).scan(str(root)))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in (
+        "a.mp4",
+        "B.MKV",
+        "note.txt",
+        "a_nw.mp4",
+        "a_mediainfo.json",
+        "sub/c.mov",
+        "sub/deep/d.ts",
+        "cache/e.mp4",
+    ):
+        touch(tmp_path / name)
+    return tmp_path
+
+
+def test_extensions_and_default_excludes(tree):
+    assert scan(tree) == [
+        "B.MKV",
+        "a.mp4",
+        os.path.join("cache", "e.mp4"),
+        os.path.join("sub", "c.mov"),
+        os.path.join("sub", "deep", "d.ts"),
+    ]
+
+
+def test_exclude_patterns_match_files_and_folders(tree):
+    exclude = parse_patterns(" cache , *.MOV ,")
+    assert exclude == ("cache", "*.MOV")
+    assert scan(tree, exclude=exclude) == [
+        "B.MKV",
+        "a.mp4",
+        "a_nw.mp4",
+        os.path.join("sub", "deep", "d.ts"),
+    ]
+
+
+def test_max_depth(tree):
+    assert scan(tree, max_depth=0) == ["B.MKV", "a.mp4"]
+    assert os.path.join("sub", "deep", "d.ts") not in scan(tree, max_depth=1)
+
+
+def symlink_or_skip(target, link):
+    try:
+        os.symlink(target, link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("link simbolici non disponibili")
+
+
+def test_symlink_loop_is_visited_once(tmp_path):
+    touch(tmp_path / "sub" / "v.mp4")
+    symlink_or_skip(tmp_path, tmp_path / "sub" / "loop")
+    assert scan(tmp_path, follow_symlinks=True) == [os.path.join("sub", "v.mp4")]
+
+
+def test_symlinks_skipped_by_default(tmp_path):
+    touch(tmp_path / "real" / "v.mp4")
+    (tmp_path / "root").mkdir()
+    symlink_or_skip(tmp_path / "real", tmp_path / "root" / "link")
+    assert scan(tmp_path / "root") == []
+    assert scan(tmp_path / "root", follow_symlinks=True) == [os.path.join("link", "v.mp4")]
+
+
+def test_unreadable_root_reports_error(tmp_path):
+    errors = []
+    found = list(VideoScanner(on_error=errors.append).scan(str(tmp_path / "manca")))
+    assert found == [] and len(errors) == 1
@@ -0,0 +1,117 @@
+import queue
+from types import SimpleNamespace
+
+from moduli.engine import ConversionEngine, ConversionJob, ConversionOptions
+from moduli.probe import MediaProbe
+from moduli.scheduler import JobScheduler, encoder_class
+
+
+def make_job(name, encoder="h264_nvenc", sessions=1):
+    return SimpleNamespace(
+        input_path=f"/non/esiste/{name}.mkv",
+        output_path=f"/non/esiste/{name}.mp4",
+        encoder=encoder,
+        sessions=sessions,
+    )
+
+
+def make_scheduler(hw_sessions=3, max_jobs=4):
+    return JobScheduler(
+        max_jobs,
+        hw_sessions=hw_sessions,
+        encoder_for=lambda job: job.encoder,
+        sessions_for=lambda job: job.sessions,
+    )
+
+
+def queue_of(*jobs):
+    job_queue = queue.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    return job_queue
+
+
+def test_encoder_class():
+    assert encoder_class("h264_nvenc") == "hw:nvenc"
+    assert encoder_class("libx264") == "cpu"
+
+
+def test_segmented_job_reserves_one_session_per_process():
+    scheduler = make_scheduler(hw_sessions=3)
+    segmented = make_job("lungo", sessions=3)
+    other = make_job("corto")
+    cpu = make_job("cpu", encoder="libx264")
+    job_queue = queue_of(segmented, other, cpu)
+    assert scheduler.take(job_queue) is segmented
+    # Le 3 sessioni sono occupate: passa avanti il job CPU
+    assert scheduler.take(job_queue) is cpu
+    scheduler.release(segmented)
+    assert scheduler.take(job_queue) is other
+
+
+def test_sessions_are_capped_at_the_limit():
+    scheduler = make_scheduler(hw_sessions=2)
+    job = make_job("lungo", sessions=4)
+    assert scheduler._requirements(job) == {"hw:nvenc": (2, 2)}
+    assert scheduler.take(queue_of(job)) is job
+
+
+def test_no_hardware_limit():
+    scheduler = make_scheduler(hw_sessions=0)
+    jobs = [make_job(str(i), sessions=4) for i in range(3)]
+    job_queue = queue_of(*jobs)
+    assert [scheduler.take(job_queue) for _ in jobs] == jobs
+
+
+def test_release_frees_sessions_and_end_of_queue():
+    scheduler = make_scheduler(hw_sessions=1)
+    first, second = make_job("a"), make_job("b")
+    job_queue = queue_of(first, second, None)
+    assert scheduler.take(job_queue) is first
+    scheduler.release(first)
+    assert scheduler.take(job_queue) is second
+    scheduler.release(second)
+    assert scheduler.take(job_queue) is None
+
+
+class NullLogger:
+    def log(self, message, level="info"):
+        pass
+
+
+def make_probe(codec):
+    streams = [
+        {
+            "codec_type": "video",
+            "codec_name": codec,
+            "width": 1280,
+            "height": 720,
+            "pix_fmt": "yuv420p",
+            "bit_rate": "1000000",
+        }
+    ]
+    return MediaProbe("a.mkv", duration=60, streams=streams)
+
+
+def test_engine_reserves_sessions_for_the_planned_encoder(tmp_path):
+    capabilities = SimpleNamespace(
+        chain=lambda codec: ["h264_nvenc", "libx264"], encoders={}
+    )
+    engine = ConversionEngine(
+        "ffmpeg",
+        "ffprobe",
+        ConversionOptions(codec="h264_nvenc", hw_sessions=1, disk_jobs=4),
+        NullLogger(),
+        capabilities=capabilities,
+    )
+    remux = ConversionJob(str(tmp_path / "a.mkv"), str(tmp_path / "a.mp4"), make_probe("h264"))
+    encode = ConversionJob(str(tmp_path / "b.mkv"), str(tmp_path / "b.mp4"), make_probe("hevc"))
+    assert engine.planned_encoder(remux) == "copy"
+    assert engine.planned_encoder(encode) == "h264_nvenc"
+    assert "hw:nvenc" not in engine.scheduler._requirements(remux)
+    assert engine.scheduler._requirements(encode)["hw:nvenc"] == (1, 1)
+
+    # Encoder hardware già fallito per questo file: ripiego CPU, niente GPU
+    encode.failed_encoders.add("h264_nvenc")
+    assert engine.planned_encoder(encode) == "libx264"
+    assert "hw:nvenc" not in engine.scheduler._requirements(encode)
@@ -0,0 +1,68 @@
+import subprocess
+from types import SimpleNamespace
+
+from moduli import segmented
+from moduli.probe import MediaProbe
+from moduli.segmented import SegmentedEncode, parse_keyframes
+
+
+def test_parse_keyframes_skips_non_keyframes():
+    output = "10.010000,K_\n20.500000,__\nN/A,K_\n30.030000,K_\n"
+    assert parse_keyframes(output) == [10.01, 30.03]
+
+
+def test_parse_keyframes_subtracts_start_time():
+    output = "11.400000,K_\n21.400000,K_\n"
+    assert parse_keyframes(output, start_time=1.4) == [10.0, 20.0]
+
+
+def test_probe_reads_start_time():
+    info = {
+        "format": {"duration": "60.0", "start_time": "1.400000"},
+        "streams": [{"codec_type": "video", "start_time": "1.500000"}],
+    }
+    assert MediaProbe.from_ffprobe("a.ts", info, size=1).start_time == 1.4
+    info["format"].pop("start_time")
+    assert MediaProbe.from_ffprobe("a.ts", info, size=1).start_time == 1.5
+
+
+def make_encode(start_time, duration=60.0, segment_length=20):
+    probe = MediaProbe("a.ts", duration=duration, start_time=start_time)
+    job = SimpleNamespace(
+        input_path="a.ts", output_path="a.mp4", duration=duration, probe=probe
+    )
+    engine = SimpleNamespace(
+        ffprobe_path="ffprobe",
+        creationflags=0,
+        startupinfo=None,
+        options=SimpleNamespace(segment_length=segment_length),
+        size_projection=lambda job: None,
+        segment_workers=lambda job: 2,
+    )
+    return SegmentedEncode(engine, job, 1280, 720)
+
+
+def test_boundaries_with_nonzero_start_time(monkeypatch):
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command)
+        # Keyframe assoluti: 1.4 s di start_time più i tempi relativi
+        return subprocess.CompletedProcess(
+            command, 0, "21.400000,K_\n41.400000,K_\n", ""
+        )
+
+    monkeypatch.setattr(segmented.subprocess, "run", fake_run)
+    assert make_encode(1.4).boundaries() == [0.0, 20.0, 40.0, 60.0]
+    intervals = commands[0][commands[0].index("-read_intervals") + 1]
+    assert intervals == "21.400%+#1,41.400%+#1"
+
+
+def test_boundaries_without_probe_start_time(monkeypatch):
+    def fake_run(command, **kwargs):
+        return subprocess.CompletedProcess(
+            command, 0, "20.020000,K_\n40.040000,K_\n", ""
+        )
+
+    monkeypatch.setattr(segmented.subprocess, "run", fake_run)
+    assert make_encode(None).boundaries() == [0.0, 20.02, 40.04, 60.0]
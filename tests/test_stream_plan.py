@@ -0,0 +1,131 @@
+import os
+
+from moduli.engine import ConversionEngine, ConversionJob, ConversionOptions
+from moduli.probe import MediaProbe
+from moduli.stream_plan import COPY_BITRATE_MAX, plan_streams
+
+
+class NullLogger:
+    def log(self, message, level="info"):
+        pass
+
+
+def make_probe(codec="h264", width=1280, height=720, kbps=3000, audio="aac"):
+    streams = [
+        {
+            "codec_type": "video",
+            "codec_name": codec,
+            "width": width,
+            "height": height,
+            "pix_fmt": "yuv420p",
+            "bit_rate": str(kbps * 1000),
+        }
+    ]
+    if audio:
+        streams.append(
+            {"codec_type": "audio", "codec_name": audio, "bit_rate": "128000"}
+        )
+    return MediaProbe("a.mp4", duration=60, streams=streams)
+
+
+def test_plan_copies_conforming_streams():
+    plan = plan_streams(make_probe(), "h264", 4000)
+    assert plan.copy_video and plan.copy_audio
+
+
+def test_plan_reencodes_above_the_limit_or_other_codec():
+    assert not plan_streams(make_probe(kbps=5000), "h264", 4000).copy_video
+    assert not plan_streams(make_probe(codec="hevc"), "h264", 4000).copy_video
+    full_hd = make_probe(width=1920, height=1080)
+    assert not plan_streams(full_hd, "h264", 4000).copy_video
+    assert not plan_streams(make_probe(), "h264", 0).copy_video
+
+
+def test_plan_copies_audio_without_video_copy():
+    plan = plan_streams(make_probe(codec="mpeg2video"), "h264", 4000)
+    assert not plan.copy_video and plan.copy_audio
+
+
+def make_engine(**options):
+    return ConversionEngine(
+        "ffmpeg", "ffprobe", ConversionOptions(codec="libx264", **options), NullLogger()
+    )
+
+
+def test_copy_limit_default_is_capped_at_bitrate_max():
+    # 720p H.264 a 2000 kbps supera la soglia di 1500: va compresso, non rimuxato
+    engine = make_engine(bitrate_max=1500)
+    job = ConversionJob("a.mp4", "a_nw.mp4", make_probe(kbps=2000))
+    assert engine.copy_bitrate_max() == 1500
+    assert not engine.stream_plan(job).copy_video
+    engine.options.bitrate_max = 3500  # Override successivo (es. --bitrate-max)
+    assert engine.copy_bitrate_max() == COPY_BITRATE_MAX
+    assert engine.stream_plan(job).copy_video
+
+
+def test_copy_limit_without_bitrate_filter():
+    engine = make_engine(bitrate_max=0)
+    assert engine.copy_bitrate_max() == COPY_BITRATE_MAX
+    job = ConversionJob("a.ts", "a_nw.mp4", make_probe(kbps=2000))
+    assert engine.stream_plan(job).copy_video
+
+
+def test_remux_only_below_the_bitrate_threshold():
+    engine = make_engine(bitrate_max=2500)
+    probe = make_probe(kbps=2000)
+    assert engine.remux_only(ConversionJob("a.ts", "a_nw.mp4", probe))
+    # Già MP4: niente da guadagnare, il file resta saltato
+    assert not engine.remux_only(ConversionJob("a.mp4", "a_nw.mp4", probe))
+    hevc = make_probe(codec="hevc", kbps=2000)
+    assert not engine.remux_only(ConversionJob("a.ts", "a_nw.mp4", hevc))
+
+
+def run_batch(fake_ffmpeg, videos, **options):
+    ffmpeg_path, ffprobe_path, configure = fake_ffmpeg
+    configure(video_codec="h264", width=1280, height=720, bit_rate=2000000)
+    engine = ConversionEngine(
+        ffmpeg_path,
+        ffprobe_path,
+        ConversionOptions(
+            codec="libx264", overwrite=False, max_jobs=2, disk_jobs=2, **options
+        ),
+        NullLogger(),
+    )
+    engine.run(str(videos))
+    jobs, _ = engine.snapshot()
+    return engine, {os.path.basename(job.input_path): job for job in jobs}
+
+
+def test_efficient_camera_dumps_are_remuxed(fake_ffmpeg, videos):
+    # 2000 kbps, sotto bitrate_max: l'MP4 resta saltato, .mkv e .mov rimuxati
+    _, jobs = run_batch(fake_ffmpeg, videos, bitrate_max=2500)
+    assert sorted(jobs) == ["b.mkv", "c.mov"]
+    for job in jobs.values():
+        assert job.encoder == "copy" and job.status == "completato"
+
+
+def test_remux_without_bitrate_filter(fake_ffmpeg, videos):
+    _, jobs = run_batch(fake_ffmpeg, videos, bitrate_max=0)
+    assert sorted(jobs) == ["a.mp4", "b.mkv", "c.mov"]
+    assert {job.encoder for job in jobs.values()} == {"copy"}
+
+
+def test_failed_remux_falls_back_to_encoding(fake_ffmpeg, videos, monkeypatch):
+    encode_single = ConversionEngine._encode_single
+
+    def fail_copy(engine, job, width, height):
+        if job.encoder == "copy":
+            return False
+        return encode_single(engine, job, width, height)
+
+    monkeypatch.setattr(ConversionEngine, "_encode_single", fail_copy)
+    _, jobs = run_batch(fake_ffmpeg, videos, bitrate_max=0)
+    for job in jobs.values():
+        assert job.status == "completato"
+        assert job.encoder == "libx264" and not job.copy_audio
+
+
+def test_explicit_copy_limit():
+    engine = make_engine(bitrate_max=2500, copy_bitrate_max=4000)
+    job = ConversionJob("a.mp4", "a_nw.mp4", make_probe(kbps=3000))
+    assert engine.stream_plan(job).copy_video